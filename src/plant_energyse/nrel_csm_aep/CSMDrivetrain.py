@@ -8,6 +8,7 @@ Copyright (c)  NREL. All rights reserved.
     
 from math import *
 import numpy as np
+from scipy.sparse import diags, csr_matrix, hstack as sparse_hstack
 
 from openmdao.main.api import Component, Assembly, set_as_top, VariableTree
 from openmdao.main.datatypes.api import Int, Bool, Float, Array, VarTree, Instance, Enum
@@ -16,6 +17,71 @@ from commonse.utilities import smooth_abs, smooth_min, hstack
 
 from fusedwind.interface import base, implement_base
 
+# constant, linear and quadratic loss coefficients of each drivetrain type
+drivetrain_coefficients = {'geared': (0.01289, 0.08510, 0.0),
+                           'single_stage': (0.01331, 0.03655, 0.06107),
+                           'multi_drive': (0.01547, 0.04463, 0.05790),
+                           'pm_direct_drive': (0.01007, 0.02000, 0.06899)}
+drivetrain_types = ('geared', 'single_stage', 'multi_drive', 'pm_direct_drive')
+
+def drivetrain_losses(aeroPower, ratedPower, drivetrainType='geared'):
+    """
+    drivetrain losses from NREL cost and scaling model on plain arrays
+
+    Parameters
+    ----------
+    aeroPower : array_like
+       aerodynamic power [kW], any shape
+    ratedPower : array_like
+       rated power [kW], broadcastable against aeroPower (e.g. shape (n_rotors, 1) for (n_rotors, n) power curves)
+    drivetrainType : str or sequence of str
+       one of drivetrain_types, or a sequence of them to evaluate several types in one pass
+
+    Returns
+    -------
+    power : ndarray
+      total power after drivetrain losses [kW] - with a leading axis over the types if drivetrainType is a sequence
+    dP_dPa : ndarray
+      derivative of power with respect to aeroPower (elementwise, i.e. the diagonal of the Jacobian)
+    dP_dPr : ndarray
+      derivative of power with respect to ratedPower (elementwise)
+    """
+
+    aeroPower = np.asarray(aeroPower, dtype=float)
+
+    Pbar0 = aeroPower / ratedPower
+
+    if isinstance(drivetrainType, basestring):
+        constant, linear, quadratic = drivetrain_coefficients[drivetrainType]
+    else:
+        shape = (len(drivetrainType),) + (1,)*np.ndim(Pbar0)
+        constant, linear, quadratic = [c.reshape(shape) for c in \
+                                       np.array([drivetrain_coefficients[t] for t in drivetrainType]).transpose()]
+
+    # handle negative power case (with absolute value)
+    Pbar1, dPbar1_dPbar0 = smooth_abs(Pbar0, dx=0.01)
+
+    # truncate idealized power curve for purposes of efficiency calculation
+    Pbar, dPbar_dPbar1, _ = smooth_min(Pbar1, 1.0, pct_offset=0.01)
+
+    # compute efficiency
+    eff = 1.0 - (constant/Pbar + linear + quadratic*Pbar)
+
+    power = aeroPower * eff
+
+
+    # gradients
+    dPbar_dPa = dPbar_dPbar1*dPbar1_dPbar0/ratedPower
+    dPbar_dPr = -dPbar_dPbar1*dPbar1_dPbar0*aeroPower/ratedPower**2
+
+    deff_dPa = dPbar_dPa*(constant/Pbar**2 - quadratic)
+    deff_dPr = dPbar_dPr*(constant/Pbar**2 - quadratic)
+
+    dP_dPa = eff + aeroPower*deff_dPa
+    dP_dPr = aeroPower*deff_dPr
+
+    return power, dP_dPa, dP_dPr
+
 @base
 class DrivetrainLossesBase(Component):
     """base component for drivetrain efficiency losses"""
@@ -37,72 +103,55 @@ class CSMDrivetrain(Component):
     aeroThrust = Array(iotype='in', units='N', desc='aerodynamic thrust')
     ratedPower = Float(iotype='in', units='kW', desc='rated power')
 
+    all_types = Bool(False, iotype='in', desc='also evaluate the power curve of every drivetrain type')
+
     power = Array(iotype='out', units='kW', desc='total power after drivetrain losses')
+    power_by_type = Array(iotype='out', units='kW', desc='power after drivetrain losses for each of drivetrain_types (when all_types is set)')
 
     missing_deriv_policy = 'assume_zero'
 
     def execute(self):
 
-        drivetrainType = self.drivetrainType
-        aeroPower = self.aeroPower
-        ratedPower = self.ratedPower
-
-
-        if drivetrainType == 'geared':
-            constant = 0.01289
-            linear = 0.08510
-            quadratic = 0.0
+        if self.all_types:
+            power, dP_dPa, dP_dPr = drivetrain_losses(self.aeroPower, self.ratedPower, drivetrain_types)
+            self.power_by_type = power
+            i = drivetrain_types.index(self.drivetrainType)
+            self.power, self.dP_dPa, self.dP_dPr = power[i], dP_dPa[i], dP_dPr[i]
+        else:
+            self.power, self.dP_dPa, self.dP_dPr = drivetrain_losses(self.aeroPower, self.ratedPower, self.drivetrainType)
 
-        elif drivetrainType == 'single_stage':
-            constant = 0.01331
-            linear = 0.03655
-            quadratic = 0.06107
-
-        elif drivetrainType == 'multi_drive':
-            constant = 0.01547
-            linear = 0.04463
-            quadratic = 0.05790
-
-        elif drivetrainType == 'pm_direct_drive':
-            constant = 0.01007
-            linear = 0.02000
-            quadratic = 0.06899
-
-
-        Pbar0 = aeroPower / ratedPower
-
-        # handle negative power case (with absolute value)
-        Pbar1, dPbar1_dPbar0 = smooth_abs(Pbar0, dx=0.01)
-
-        # truncate idealized power curve for purposes of efficiency calculation
-        Pbar, dPbar_dPbar1, _ = smooth_min(Pbar1, 1.0, pct_offset=0.01)
-
-        # compute efficiency
-        eff = 1.0 - (constant/Pbar + linear + quadratic*Pbar)
-
-        self.power = aeroPower * eff
 
+    def list_deriv_vars(self):
 
-        # gradients
-        dPbar_dPa = dPbar_dPbar1*dPbar1_dPbar0/ratedPower
-        dPbar_dPr = -dPbar_dPbar1*dPbar1_dPbar0*aeroPower/ratedPower**2
+        inputs = ('aeroPower', 'ratedPower')
+        outputs = ('power',)
 
-        deff_dPa = dPbar_dPa*(constant/Pbar**2 - quadratic)
-        deff_dPr = dPbar_dPr*(constant/Pbar**2 - quadratic)
+        return inputs, outputs
 
-        dP_dPa = eff + aeroPower*deff_dPa
-        dP_dPr = aeroPower*deff_dPr
+    def provideJ(self):
+        """ dense Jacobian [dpower/daeroPower, dpower/dratedPower], only built when requested """
 
-        self.J = hstack([np.diag(dP_dPa), dP_dPr])
+        return hstack([np.diag(self.dP_dPa), self.dP_dPr])
 
+    def sparseJ(self):
+        """ Jacobian as a scipy.sparse matrix: the diagonal plus the ratedPower column """
 
-    def list_deriv_vars(self):
+        return sparse_hstack([diags(self.dP_dPa, 0), csr_matrix(self.dP_dPr[:, np.newaxis])]).tocsr()
 
-        inputs = ('aeroPower', 'ratedPower')
-        outputs = ('power',)
+    def apply_deriv(self, arg, result):
+        """ Jacobian-vector product from the diagonal and column """
 
-        return inputs, outputs
+        if 'power' in result:
+            if 'aeroPower' in arg:
+                result['power'] += self.dP_dPa * arg['aeroPower']
+            if 'ratedPower' in arg:
+                result['power'] += self.dP_dPr * arg['ratedPower']
 
-    def provideJ(self):
+    def apply_derivT(self, arg, result):
+        """ transposed Jacobian-vector product from the diagonal and column """
 
-        return self.J
\ No newline at end of file
+        if 'power' in arg:
+            if 'aeroPower' in result:
+                result['aeroPower'] += self.dP_dPa * arg['power']
+            if 'ratedPower' in result:
+                result['ratedPower'] += np.dot(self.dP_dPr, arg['power'])
\ No newline at end of file
@@ -6,13 +6,14 @@ Copyright (c) NREL. All rights reserved.
 """
 
 from openmdao.main.api import Component, Assembly, set_as_top, VariableTree
-from openmdao.main.datatypes.api import Int, Bool, Float, Array, VarTree
+from openmdao.main.datatypes.api import Int, Bool, Float, Array, VarTree, Enum
 
 from fusedwind.plant_flow.comp import BaseAEPAggregator
 from fusedwind.interface import implement_base
 
 from math import *
 import numpy as np
+from scipy.special import gamma as gamma_fn, gammainc, digamma
 
 # ---------------------------------
 
@@ -22,21 +23,177 @@ def weibull(X,K,L):
     
     Parameters
     ----------
-    X : float
+    X : float or ndarray
        wind speed of interest [m/s]
-    K : float
+    K : float or ndarray
        Weibull shape factor for site
-    L : float
+    L : float or ndarray
        Weibull scale factor for site [m/s]
        
     Returns
     -------
-    w : float
-      Weibull pdf value
+    w : float or ndarray
+      Weibull pdf value (broadcast over X, K and L)
     '''
-    w = (K/L) * ((X/L)**(K-1)) * exp(-((X/L)**K))
+    w = (K/L) * ((X/L)**(K-1)) * np.exp(-((X/L)**K))
     return w
 
+def weibull_cdf(X,K,L):
+    '''
+    Return Weibull cumulative probability F(X) and first partial moment G(X) = integral of x*pdf(x) from 0 to X
+    for distribution with k=K, c=L (broadcast over X, K and L)
+    '''
+    Z = (X/L)**K
+    F = 1.0 - np.exp(-Z)
+    G = L * gamma_fn(1.+1./K) * gammainc(1.+1./K, Z)
+    return F, G
+
+# Gauss-Legendre nodes and weights on [-1, 1] for the K derivative of the partial moment
+_gl_nodes, _gl_weights = np.polynomial.legendre.leggauss(20)
+
+def weibull_cdf_partials(X,K,L):
+    '''
+    Return the partial derivatives dF/dK, dG/dK, dF/dL, dG/dL of weibull_cdf() (X increasing and non-negative)
+    '''
+    X = np.asarray(X, dtype=float)
+    Z = (X/L)**K
+    S = np.exp(-Z)
+    pdf = weibull(X, K, L)
+    logXL = np.log(np.where(X > 0.0, X, 1.0)/L)
+    logXL = np.where(X > 0.0, logXL, 0.0)
+
+    dF_dK = S*Z*logXL
+    dF_dL = -X*pdf/L
+    dG_dL = weibull_cdf(X, K, L)[1]/L - X**2*pdf/L
+
+    # G(x) = -x*S(x) + integral of S(t) from 0 to x, so dG/dK = x*S*Z*log(x/L) - integral of S(t)*(t/L)**K*log(t/L),
+    # which has no closed form: integrate it over each interval of X by Gauss-Legendre quadrature and accumulate
+    a = np.concatenate([[0.0], X[:-1]])
+    half = 0.5*(X - a)
+    t = (a + half)[:,np.newaxis] + half[:,np.newaxis]*_gl_nodes
+    t = np.where(t > 0.0, t, 1.0e-300) # a zero-width first interval, where the integrand vanishes
+    Kq = np.asarray(K, dtype=float)[...,np.newaxis]
+    Lq = np.asarray(L, dtype=float)[...,np.newaxis]
+    Zt = (t/Lq)**Kq
+    integrand = np.exp(-Zt)*Zt*np.log(t/Lq)
+    dG_dK = X*dF_dK - np.cumsum(half*np.dot(integrand, _gl_weights), axis=-1)
+
+    return dF_dK, dG_dK, dF_dL, dG_dL
+
+def _interval_weights(wind_curve, F, G):
+    # on [a, b] the power is P_a*(b-v)/h + P_b*(v-a)/h, so each interval contributes
+    # (b*dF - dG)/h to the weight of its left point and (dG - a*dF)/h to the weight of its right point
+    F, G = np.broadcast_arrays(F, G)
+    a = wind_curve[:-1]
+    b = wind_curve[1:]
+    h = b - a
+    dF = F[...,1:] - F[...,:-1]
+    dG = G[...,1:] - G[...,:-1]
+
+    W = np.zeros(F.shape)
+    W[...,:-1] += (b*dF - dG)/h
+    W[...,1:] += (dG - a*dF)/h
+    return W
+
+def weibull_bin_weights(wind_curve, K, L, integration='pdf'):
+    '''
+    Return the weights w[i] such that sum(power_curve * w) is the mean power of a turbine with power_curve
+    at a site with Weibull shape K and scale L. K and L broadcast against the wind curve.
+    
+    integration='pdf' : Weibull pdf at each bin times the bin width taken from the first two wind curve entries
+                        (the original CSM formulation; assumes uniform bins)
+    integration='cdf' : exact integral of the piecewise-linear power curve against the Weibull distribution,
+                        using CDF and partial-moment differences over each interval; any increasing wind curve
+    '''
+
+    wind_curve = np.asarray(wind_curve, dtype=float)
+
+    if integration == 'pdf':
+        ws_inc = wind_curve[1] - wind_curve[0]
+        return weibull(wind_curve, K, L) * ws_inc
+
+    if integration != 'cdf':
+        raise ValueError('unknown integration mode "{:}"'.format(integration))
+
+    F, G = weibull_cdf(wind_curve, K, L)
+    return _interval_weights(wind_curve, F, G)
+
+def weibull_bin_weights_partials(wind_curve, K, L, integration='pdf'):
+    '''
+    Return the partial derivatives of weibull_bin_weights() with respect to K and L
+    '''
+
+    wind_curve = np.asarray(wind_curve, dtype=float)
+
+    if integration == 'cdf':
+        # the weights are linear in F and G
+        dF_dK, dG_dK, dF_dL, dG_dL = weibull_cdf_partials(wind_curve, K, L)
+        return _interval_weights(wind_curve, dF_dK, dG_dK), _interval_weights(wind_curve, dF_dL, dG_dL)
+
+    W = weibull_bin_weights(wind_curve, K, L)
+
+    Z = (wind_curve/L)**K
+    logXL = np.log(np.where(wind_curve > 0.0, wind_curve, 1.0)/L)
+    dW_dK = np.where(wind_curve > 0.0, W * (1./K + logXL*(1. - Z)), 0.0)
+    dW_dL = W * (K/L) * (Z - 1.)
+
+    return dW_dK, dW_dL
+
+def aep_weibull_batch(power_curve, wind_curve, wind_speed_50m, weibull_k, shear_exponent, hub_height, machine_rating, \
+                      soiling_losses=0.0, array_losses=0.06, availability=0.94287630736, turbine_number=100, integration='pdf'):
+    '''
+    Evaluate the AEP Sub-module of the NREL _cost and Scaling Model for many designs and sites in a single NumPy pass
+    
+    Parameters
+    ----------
+    power_curve : array_like
+       power curves after drivetrain losses [kW], shape (n_designs, n_bins) or (n_bins,)
+    wind_curve : array_like
+       wind speeds associated with the power curve bins [m/s], shape (n_bins,)
+    wind_speed_50m : array_like
+       mean annual wind speed at 50 m height for each site [m/s], shape (n_sites,) or scalar
+    weibull_k : array_like
+       Weibull shape factor for each site, shape (n_sites,) or scalar
+    shear_exponent : array_like
+       shear exponent for each site, shape (n_sites,) or scalar
+    hub_height : array_like
+       hub height of wind turbine for each site [m], shape (n_sites,) or scalar
+    machine_rating : array_like
+       machine power rating for each design [kW], shape (n_designs,) or scalar
+    soiling_losses, array_losses, availability, turbine_number : array_like
+       plant loss factors and turbine count, scalars or shape (n_sites,)
+    integration : str
+       'pdf' or 'cdf' - see weibull_bin_weights()
+       
+    Returns
+    -------
+    gross_aep : ndarray
+      gross annual energy production [kWh], shape (n_designs, n_sites)
+    net_aep : ndarray
+      net annual energy production [kWh], shape (n_designs, n_sites)
+    capacity_factor : ndarray
+      plant capacity factor, shape (n_designs, n_sites)
+    '''
+
+    power_curve = np.atleast_2d(np.asarray(power_curve, dtype=float))
+    wind_curve = np.asarray(wind_curve, dtype=float)
+    machine_rating = np.atleast_1d(np.asarray(machine_rating, dtype=float))
+
+    hubHeightWindSpeed = np.atleast_1d((np.asarray(hub_height, dtype=float)/50)**np.asarray(shear_exponent, dtype=float) \
+                                       * np.asarray(wind_speed_50m, dtype=float))
+    K = np.atleast_1d(np.asarray(weibull_k, dtype=float)) * np.ones_like(hubHeightWindSpeed)
+    L = hubHeightWindSpeed / np.exp(np.log(gamma_fn(1.+1./K)))
+
+    # (n_sites, n_bins) weights, contracted against (n_designs, n_bins) power curves
+    W = weibull_bin_weights(wind_curve, K[:,np.newaxis], L[:,np.newaxis], integration)
+    turbine_energy = np.dot(power_curve, W.T)
+
+    gross_aep = turbine_energy * 8760.0 * np.asarray(turbine_number)
+    net_aep = gross_aep * (1.0-np.asarray(soiling_losses)) * (1.0-np.asarray(array_losses)) * np.asarray(availability)
+    capacity_factor = net_aep / (8760 * machine_rating[:,np.newaxis])
+
+    return gross_aep, net_aep, capacity_factor
+
 # ---------------------------
 @implement_base(BaseAEPAggregator)
 class aep_csm_component(Component):
@@ -55,6 +212,7 @@ class aep_csm_component(Component):
     array_losses = Float(0.06, iotype='in', desc = 'energy losses due to turbine interactions - across entire plant')
     availability = Float(0.94287630736, iotype='in', desc = 'average annual availbility of wind turbines at plant')
     turbine_number = Int(100, iotype='in', desc = 'total number of wind turbines at the plant')
+    integration = Enum('pdf', ('pdf', 'cdf'), iotype='in', desc = 'power curve integration: pdf (pdf times uniform bin width) or cdf (exact for piecewise-linear power, any bin spacing)')
 
     # Output
     gross_aep = Float(iotype='out', desc='Gross Annual Energy Production before availability and loss impacts', unit='kWh')
@@ -62,6 +220,8 @@ class aep_csm_component(Component):
     power_array = Array(iotype='out', units='kW', desc='total power after drivetrain losses')
     capacity_factor = Float(iotype='out', desc='plant capacity factor')
 
+    missing_deriv_policy = 'assume_zero'
+
     def execute(self):
         """
         Executes AEP Sub-module of the NREL _cost and Scaling Model by convolving a wind turbine power curve with a weibull distribution.  
@@ -70,20 +230,76 @@ class aep_csm_component(Component):
 
         self.power_array = [self.wind_curve, self.power_curve]
 
-        hubHeightWindSpeed = ((self.hub_height/50)**self.shear_exponent)*self.wind_speed_50m
-        K = self.weibull_k
-        L = hubHeightWindSpeed / exp(log(gamma(1.+1./K)))
+        gross_aep, net_aep, capacity_factor = aep_weibull_batch(self.power_curve, self.wind_curve, \
+                  self.wind_speed_50m, self.weibull_k, self.shear_exponent, self.hub_height, self.machine_rating, \
+                  self.soiling_losses, self.array_losses, self.availability, self.turbine_number, self.integration)
+
+        self.gross_aep = gross_aep[0,0]
+        self.net_aep = net_aep[0,0]
+        self.capacity_factor = capacity_factor[0,0]
+
+        # gradients
+        self.J = aep_weibull_jacobian(self.power_curve, self.wind_curve, self.wind_speed_50m, self.weibull_k, \
+                  self.shear_exponent, self.hub_height, self.machine_rating, \
+                  self.soiling_losses, self.array_losses, self.availability, self.turbine_number, self.integration)
+
+    def list_deriv_vars(self):
+
+        inputs = ('power_curve', 'wind_speed_50m', 'weibull_k', 'shear_exponent', 'hub_height', 'machine_rating', \
+                  'soiling_losses', 'array_losses', 'availability')
+        outputs = ('gross_aep', 'net_aep', 'capacity_factor')
+
+        return inputs, outputs
+
+    def provideJ(self):
+
+        return self.J
+
+# ---------------------------
+
+def aep_weibull_jacobian(power_curve, wind_curve, wind_speed_50m, weibull_k, shear_exponent, hub_height, machine_rating, \
+                         soiling_losses, array_losses, availability, turbine_number, integration='pdf'):
+    '''
+    Analytic partial derivatives of the AEP Sub-module for a single design and site
+    
+    Inputs (columns) are ordered as the power curve bins followed by wind_speed_50m, weibull_k, shear_exponent,
+    hub_height, machine_rating, soiling_losses, array_losses and availability; outputs (rows) are gross_aep,
+    net_aep and capacity_factor.
+    '''
+
+    power_curve = np.asarray(power_curve, dtype=float)
+    K = float(weibull_k)
+
+    hubHeightWindSpeed = ((hub_height/50.)**shear_exponent)*wind_speed_50m
+    L = hubHeightWindSpeed / exp(log(gamma(1.+1./K)))
+
+    # scale factor partials: L depends on K through the gamma function and on the site through hub height wind speed
+    dL_dK = L * digamma(1.+1./K) / K**2
+    dL_dV = L / wind_speed_50m
+    dL_dalpha = L * log(hub_height/50.)
+    dL_dh = L * shear_exponent / hub_height
+
+    W = weibull_bin_weights(wind_curve, K, L, integration)
+    dW_dK, dW_dL = weibull_bin_weights_partials(wind_curve, K, L, integration)
+
+    scale = 8760.0 * turbine_number
+    gross_aep = scale * np.dot(power_curve, W)
+    dgross_dL = scale * np.dot(power_curve, dW_dL)
+    dgross_dK = scale * np.dot(power_curve, dW_dK) + dgross_dL * dL_dK
+
+    dgross = np.concatenate([scale * W, [dgross_dL * dL_dV, dgross_dK, dgross_dL * dL_dalpha, dgross_dL * dL_dh, 0.0, 0.0, 0.0, 0.0]])
+
+    loss_factor = (1.0-soiling_losses) * (1.0-array_losses) * availability
+    dnet = dgross * loss_factor
+    dnet[-3] = -gross_aep * (1.0-array_losses) * availability
+    dnet[-2] = -gross_aep * (1.0-soiling_losses) * availability
+    dnet[-1] = gross_aep * (1.0-soiling_losses) * (1.0-array_losses)
 
-        turbine_energy = 0.0
-        for i in xrange(0,self.power_array.shape[1]):
-           X = self.power_array[0,i]
-           result = self.power_array[1,i] * weibull(X, K, L)
-           turbine_energy += result
+    capacity_factor = gross_aep * loss_factor / (8760 * machine_rating)
+    dcf = dnet / (8760 * machine_rating)
+    dcf[-4] = -capacity_factor / machine_rating
 
-        ws_inc = self.power_array[0,1] - self.power_array[0,0]
-        self.gross_aep = turbine_energy * 8760.0 * self.turbine_number * ws_inc
-        self.net_aep = self.gross_aep * (1.0-self.soiling_losses)* (1.0-self.array_losses) * self.availability
-        self.capacity_factor = self.net_aep / (8760 * self.machine_rating)
+    return np.vstack([dgross, dnet, dcf])
 
 def example():
 
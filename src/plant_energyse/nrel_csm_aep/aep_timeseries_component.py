@@ -0,0 +1,297 @@
+"""
+aep_timeseries_component.py
+
+Copyright (c) NREL. All rights reserved.
+"""
+
+from openmdao.main.api import Component
+from openmdao.main.datatypes.api import Int, Float, Array, Str
+
+from itertools import islice
+import numpy as np
+
+# ---------------------------------
+
+def read_wind_series(source, chunk_size=100000, time_column=0, speed_column=1, delimiter=','):
+    '''
+    Generator yielding (times, speeds) chunks of at most chunk_size records from a wind speed time series
+
+    Parameters
+    ----------
+    source : str or ndarray or tuple
+       path to a CSV/text file (one record per line: timestamp and wind speed), path to a .npy file
+       (memory-mapped; shape (n, 2) with epoch seconds and wind speed, or shape (n,) with wind speeds only),
+       an in-memory array of the same layouts, or a (times, speeds) tuple of arrays
+    chunk_size : int
+       number of records held in memory at once
+    time_column, speed_column : int
+       columns of the timestamp and the wind speed in CSV files
+    delimiter : str
+       field delimiter of CSV files
+
+    Timestamps in CSV files may be ISO 8601 strings ('2014-01-01 10:00') or epoch seconds.
+    Lines that cannot be parsed (e.g. headers) are skipped; missing speeds are returned as NaN.
+
+    Returns
+    -------
+    times : ndarray of datetime64[s] or None
+      timestamps of the records (None if the source has no timestamps)
+    speeds : ndarray
+      wind speeds of the records [m/s]
+    '''
+
+    if isinstance(source, tuple):
+        times = np.asarray(source[0])
+        speeds = np.asarray(source[1], dtype=float)
+        for i in xrange(0, len(speeds), chunk_size):
+            yield _as_datetime(times[i:i+chunk_size]), speeds[i:i+chunk_size]
+        return
+
+    if isinstance(source, basestring) and not source.lower().endswith('.npy'):
+        fh = open(source, 'r')
+        try:
+            while True:
+                lines = list(islice(fh, chunk_size))
+                if len(lines) == 0:
+                    break
+                times, speeds = _parse_lines(lines, time_column, speed_column, delimiter)
+                if len(speeds) > 0:
+                    yield times, speeds
+        finally:
+            fh.close()
+        return
+
+    if isinstance(source, basestring):
+        data = np.load(source, mmap_mode='r')
+    else:
+        data = np.asarray(source)
+
+    for i in xrange(0, data.shape[0], chunk_size):
+        block = np.array(data[i:i+chunk_size], dtype=float)
+        if block.ndim == 1:
+            yield None, block
+        else:
+            yield _as_datetime(block[:,0]), block[:,1]
+
+def _as_datetime(times):
+    ''' convert timestamps (datetime64, ISO strings or epoch seconds) to datetime64[s] '''
+
+    times = np.asarray(times)
+    if times.dtype.kind in 'fiu':
+        return times.astype('int64').astype('datetime64[s]')
+    return times.astype('datetime64[s]')
+
+def _parse_lines(lines, time_column, speed_column, delimiter):
+    ''' parse a block of CSV lines into timestamps and speeds, skipping lines that do not parse '''
+
+    fields = [line.split(delimiter) for line in lines]
+    fields = [f for f in fields if len(f) > max(time_column, speed_column)]
+
+    # fast path: every line of the block is a record
+    try:
+        return _parse_stamps([f[time_column].strip() for f in fields]), \
+               np.array([f[speed_column] for f in fields], dtype=float)
+    except ValueError:
+        pass
+
+    stamps = []
+    values = []
+    for f in fields:
+        try:
+            _parse_stamps([f[time_column].strip()])
+        except ValueError:
+            continue # header or comment line
+        try:
+            value = float(f[speed_column])
+        except ValueError:
+            value = np.nan
+        stamps.append(f[time_column].strip())
+        values.append(value)
+
+    return _parse_stamps(stamps), np.array(values, dtype=float)
+
+def _parse_stamps(stamps):
+    ''' convert a list of ISO 8601 or epoch-second strings to datetime64[s] '''
+
+    if len(stamps) > 0 and '-' in stamps[0][1:]:
+        return np.array(stamps, dtype='datetime64[s]')
+    return np.array(stamps, dtype=float).astype('int64').astype('datetime64[s]')
+
+# ---------------------------------
+
+def aep_timeseries(power_curve, wind_curve, source, hub_height, measurement_height=None, shear_exponent=0.0, \
+                   time_step=None, machine_rating=None, soiling_losses=0.0, array_losses=0.06, availability=0.94287630736, \
+                   turbine_number=100, chunk_size=100000, **kwargs):
+    '''
+    Stream a wind speed time series through a power curve and accumulate annual energy production
+
+    Parameters
+    ----------
+    power_curve : array_like
+       turbine power after drivetrain losses [kW]
+    wind_curve : array_like
+       wind speeds associated with power_curve [m/s]
+    source : str or ndarray or tuple
+       wind speed series (see read_wind_series())
+    hub_height : float
+       hub height of wind turbine [m]
+    measurement_height : float
+       height of the wind speed measurements [m]; defaults to hub_height (no shear extrapolation)
+    shear_exponent : float
+       power-law shear exponent used to extrapolate speeds to hub height
+    time_step : float
+       duration of one record [h]; inferred from the timestamps if not given
+    machine_rating : float
+       machine power rating [kW], needed for the capacity factor
+    soiling_losses, array_losses, availability, turbine_number :
+       plant loss factors and turbine count (as in aep_csm_component)
+    chunk_size : int
+       number of records held in memory at once
+    kwargs :
+       passed to read_wind_series()
+
+    Returns
+    -------
+    results : dict
+      gross_aep, net_aep [kWh/yr] and capacity_factor, annualized over the valid hours of the record,
+      hours (valid hours in the record), monthly_net_energy[12] and diurnal_net_energy[24] (net energy in the
+      record by calendar month and by hour of day [kWh]) and monthly_hours[12], diurnal_hours[24]
+    '''
+
+    power_curve = np.asarray(power_curve, dtype=float)
+    wind_curve = np.asarray(wind_curve, dtype=float)
+    if measurement_height is None:
+        measurement_height = hub_height
+    shear_factor = (float(hub_height)/measurement_height)**shear_exponent
+    loss_factor = (1.0-soiling_losses) * (1.0-array_losses) * availability
+
+    gross_energy = 0.0
+    hours = 0.0
+    monthly_energy = np.zeros(12)
+    diurnal_energy = np.zeros(24)
+    monthly_hours = np.zeros(12)
+    diurnal_hours = np.zeros(24)
+
+    for times, speeds in read_wind_series(source, chunk_size=chunk_size, **kwargs):
+
+        if time_step is None:
+            if times is None or len(times) < 2:
+                raise ValueError('aep_timeseries: time_step must be given for series without timestamps')
+            time_step = np.median(np.diff(times).astype(float)) / 3600.
+
+        valid = np.isfinite(speeds)
+        power = np.interp(speeds[valid] * shear_factor, wind_curve, power_curve, left=0.0, right=0.0)
+        energy = power * time_step * turbine_number
+
+        gross_energy += np.sum(energy)
+        hours += np.count_nonzero(valid) * time_step
+
+        if times is not None:
+            times = times[valid]
+            month = times.astype('datetime64[M]').astype(int) % 12
+            hour = times.astype('datetime64[h]').astype(int) % 24
+            monthly_energy += np.bincount(month, weights=energy, minlength=12)
+            diurnal_energy += np.bincount(hour, weights=energy, minlength=24)
+            monthly_hours += np.bincount(month, minlength=12) * time_step
+            diurnal_hours += np.bincount(hour, minlength=24) * time_step
+
+    if hours <= 0.0:
+        raise ValueError('aep_timeseries: no valid wind speed records')
+
+    results = {}
+    results['hours'] = hours
+    results['gross_aep'] = gross_energy * 8760.0 / hours
+    results['net_aep'] = results['gross_aep'] * loss_factor
+    if machine_rating is not None:
+        results['capacity_factor'] = results['net_aep'] / (8760 * machine_rating)
+    results['monthly_net_energy'] = monthly_energy * loss_factor
+    results['diurnal_net_energy'] = diurnal_energy * loss_factor
+    results['monthly_hours'] = monthly_hours
+    results['diurnal_hours'] = diurnal_hours
+
+    return results
+
+# ---------------------------------
+
+class aep_timeseries_component(Component):
+
+    # Variables
+    power_curve = Array(iotype='in', units='kW', desc='total power after drivetrain losses')
+    wind_curve = Array(iotype='in', units='m/s', desc='wind curve associated with power curve')
+    hub_height = Float(iotype='in', units = 'm', desc='hub height of wind turbine above ground / sea level')
+    measurement_height = Float(50.0, iotype='in', units = 'm', desc='height of the wind speed measurements')
+    shear_exponent = Float(iotype='in', desc= 'shear exponent for wind plant')
+    wind_file = Str(iotype='in', desc='CSV or .npy file with the wind speed time series (see read_wind_series)')
+    time_step = Float(0.0, iotype='in', units='h', desc='duration of one record - 0.0 infers it from the timestamps')
+    machine_rating = Float(iotype='in', units='kW', desc='machine power rating')
+
+    # Parameters
+    soiling_losses = Float(0.0, iotype='in', desc = 'energy losses due to blade soiling for the wind plant - average across turbines')
+    array_losses = Float(0.06, iotype='in', desc = 'energy losses due to turbine interactions - across entire plant')
+    availability = Float(0.94287630736, iotype='in', desc = 'average annual availbility of wind turbines at plant')
+    turbine_number = Int(100, iotype='in', desc = 'total number of wind turbines at the plant')
+    chunk_size = Int(100000, iotype='in', desc = 'number of records held in memory at once')
+
+    # Output
+    gross_aep = Float(iotype='out', desc='Gross Annual Energy Production before availability and loss impacts', unit='kWh')
+    net_aep = Float(units= 'kW * h', iotype='out', desc='Annual energy production in kWh')
+    capacity_factor = Float(iotype='out', desc='plant capacity factor')
+    hours = Float(iotype='out', units='h', desc='valid hours in the wind speed record')
+    monthly_net_energy = Array(iotype='out', units='kW * h', desc='net energy in the record by calendar month')
+    diurnal_net_energy = Array(iotype='out', units='kW * h', desc='net energy in the record by hour of day')
+
+    def execute(self):
+        """
+        Executes AEP Sub-module of the NREL _cost and Scaling Model by streaming a wind speed time series through the power curve.
+        It then discounts the resulting AEP for availability, plant and soiling losses.
+        """
+
+        time_step = self.time_step if self.time_step > 0.0 else None
+
+        results = aep_timeseries(self.power_curve, self.wind_curve, self.wind_file, self.hub_height, \
+                                 self.measurement_height, self.shear_exponent, time_step, self.machine_rating, \
+                                 self.soiling_losses, self.array_losses, self.availability, self.turbine_number, \
+                                 self.chunk_size)
+
+        self.gross_aep = results['gross_aep']
+        self.net_aep = results['net_aep']
+        self.capacity_factor = results['capacity_factor']
+        self.hours = results['hours']
+        self.monthly_net_energy = results['monthly_net_energy']
+        self.diurnal_net_energy = results['diurnal_net_energy']
+
+def example():
+
+    import os
+    import shutil
+    import tempfile
+
+    aeptest = aep_timeseries_component()
+
+    aeptest.power_curve = [0.0, 0.0, 0.0, 0.0, 187.0, 350.0, 658.30, 1087.4, 1658.3, 2391.5, 3307.0, \
+                          4415.70, 5000.0, 5000.0, 5000.0, 5000.0, 5000.0, 5000.0, 5000.0, 5000.0, 5000.0, 5000.0, \
+                          5000.0, 5000.0, 5000.0, 5000.0, 0.0]
+    aeptest.wind_curve = [0.0, 1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0, 9.0, 10.0, \
+                           11.0, 12.0, 13.0, 14.0, 15.0, 16.0, 17.0, 18.0, 19.0, 20.0, 21.0, 22.0, 23.0, 24.0, 25.0, 26.0]
+    aeptest.hub_height = 90.0
+    aeptest.shear_exponent = 0.1
+    aeptest.machine_rating = 5000.0
+
+    # one synthetic year of hourly Weibull wind speeds at 50 m
+    times = np.arange(8760) * 3600 + 1388534400 # 2014-01-01
+    speeds = 9.0 * np.random.weibull(2.1, 8760)
+    tmpdir = tempfile.mkdtemp()
+    try:
+        aeptest.wind_file = os.path.join(tmpdir, 'example_wind.npy')
+        np.save(aeptest.wind_file, np.array([times, speeds]).transpose())
+
+        aeptest.run()
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    print "AEP output: {0}".format(aeptest.net_aep)
+    print "Monthly net energy: {0}".format(aeptest.monthly_net_energy)
+
+if __name__=="__main__":
+
+    example()
@@ -0,0 +1,255 @@
+"""
+aep_uncertainty.py
+
+Copyright (c) NREL. All rights reserved.
+"""
+
+from openmdao.main.api import Component
+from openmdao.main.datatypes.api import Int, Float, Array, Enum
+
+import numpy as np
+from multiprocessing import Pool
+
+from aep_csm_component import aep_weibull_batch
+
+# inputs of the AEP sub-module that can be sampled, with the bounds samples are clipped to
+sampled_inputs = ('wind_speed_50m', 'weibull_k', 'shear_exponent', 'soiling_losses', 'array_losses', 'availability')
+sample_bounds = {'wind_speed_50m': (1.0e-3, np.inf), 'weibull_k': (0.1, np.inf), 'shear_exponent': (-np.inf, np.inf), \
+                 'soiling_losses': (0.0, 1.0), 'array_losses': (0.0, 1.0), 'availability': (0.0, 1.0)}
+
+# ---------------------------------
+
+def sample_aep_inputs(nominal, uncertainty, n, seed, chunk=0):
+    '''
+    Draw normally distributed samples of the AEP sub-module inputs
+
+    Each (seed, chunk, input) triple has its own random stream, so a chunk is reproduced exactly
+    regardless of which process evaluates it, and adding or removing an uncertain input does not
+    change the samples of the others.
+
+    Parameters
+    ----------
+    nominal : dict
+       nominal (mean) value of every name in sampled_inputs
+    uncertainty : dict
+       standard deviation of the inputs to sample; inputs not listed are held at their nominal value
+    n : int
+       number of samples
+    seed : int
+       seed of the study
+    chunk : int
+       index of the chunk of samples
+
+    Returns
+    -------
+    samples : dict
+      arrays of n samples for the uncertain inputs, nominal values for the others
+    '''
+
+    samples = {}
+    for i, name in enumerate(sampled_inputs):
+        std = uncertainty.get(name, 0.0)
+        if std > 0.0:
+            rng = np.random.RandomState([seed, chunk, i])
+            lower, upper = sample_bounds[name]
+            samples[name] = np.clip(rng.normal(nominal[name], std, n), lower, upper)
+        else:
+            samples[name] = nominal[name]
+
+    return samples
+
+def _evaluate_chunk(args):
+    ''' net AEP of one chunk of samples - module level so that it can be sent to a process pool '''
+
+    power_curve, wind_curve, hub_height, machine_rating, turbine_number, nominal, uncertainty, n, seed, chunk, integration = args
+
+    s = sample_aep_inputs(nominal, uncertainty, n, seed, chunk)
+    _, net_aep, _ = aep_weibull_batch(power_curve, wind_curve, s['wind_speed_50m'] * np.ones(n), s['weibull_k'], \
+                                      s['shear_exponent'], hub_height, machine_rating, s['soiling_losses'], \
+                                      s['array_losses'], s['availability'], turbine_number, integration)
+
+    return net_aep[0]
+
+def aep_monte_carlo(power_curve, wind_curve, machine_rating, hub_height, wind_speed_50m, weibull_k, shear_exponent, \
+                    soiling_losses=0.0, array_losses=0.06, availability=0.94287630736, turbine_number=100, \
+                    uncertainty=None, n_samples=10000, seed=0, chunk_size=1000, processes=None, integration='pdf', \
+                    exceedance=(50, 75, 90, 99)):
+    '''
+    Monte Carlo estimate of the net AEP exceedance levels for a fixed (precomputed) power curve
+
+    Every chunk of samples is evaluated in a single aep_weibull_batch() call, with the samples as sites.
+
+    Parameters
+    ----------
+    power_curve : array_like
+       turbine power after drivetrain losses [kW]
+    wind_curve : array_like
+       wind speeds associated with power_curve [m/s]
+    machine_rating : float
+       machine power rating [kW]
+    hub_height : float
+       hub height of wind turbine [m]
+    wind_speed_50m, weibull_k, shear_exponent, soiling_losses, array_losses, availability : float
+       nominal values of the AEP sub-module inputs
+    turbine_number : int
+       total number of wind turbines at the plant
+    uncertainty : dict
+       standard deviation (normal distribution) of any of sampled_inputs, e.g. {'wind_speed_50m': 0.4}
+    n_samples : int
+       number of samples, rounded up to a whole number of chunks
+    seed : int
+       seed of the random streams - results are reproducible for a given seed and chunk_size
+    chunk_size : int
+       samples per batched evaluation (and per task when a process pool is used)
+    processes : int
+       size of the process pool - None or 1 evaluates the chunks in this process
+    integration : str
+       'pdf' or 'cdf' - see weibull_bin_weights()
+    exceedance : sequence of int
+       exceedance probabilities [%] to report - P90 is the net AEP exceeded in 90% of samples
+
+    Returns
+    -------
+    results : dict
+      'P50', 'P90', ... net AEP at each exceedance level [kWh/yr], 'mean' and 'std' of net AEP,
+      'P50_std_error', ... batch-means standard error of each level (NaN for a single chunk),
+      'history' (n_chunks, n_levels) running estimate of the levels after each chunk,
+      'net_aep' the samples and 'n_samples'
+    '''
+
+    if uncertainty is None:
+        uncertainty = {}
+    for name in uncertainty:
+        if name not in sampled_inputs:
+            raise ValueError('aep_monte_carlo: cannot sample {0} - must be one of {1}'.format(name, sampled_inputs))
+
+    nominal = {'wind_speed_50m': wind_speed_50m, 'weibull_k': weibull_k, 'shear_exponent': shear_exponent, \
+               'soiling_losses': soiling_losses, 'array_losses': array_losses, 'availability': availability}
+
+    power_curve = np.asarray(power_curve, dtype=float)
+    wind_curve = np.asarray(wind_curve, dtype=float)
+    chunk_size = max(1, min(chunk_size, n_samples))
+    n_chunks = max(1, int(np.ceil(float(n_samples) / chunk_size)))
+    tasks = [(power_curve, wind_curve, hub_height, machine_rating, turbine_number, nominal, uncertainty, \
+              chunk_size, seed, chunk, integration) for chunk in xrange(n_chunks)]
+
+    if processes is None or processes <= 1:
+        chunks = map(_evaluate_chunk, tasks)
+    else:
+        pool = Pool(processes)
+        try:
+            chunks = pool.map(_evaluate_chunk, tasks)
+        finally:
+            pool.close()
+            pool.join()
+
+    net_aep = np.concatenate(chunks)
+    percentiles = [100 - level for level in exceedance]
+
+    results = {}
+    results['net_aep'] = net_aep
+    results['n_samples'] = len(net_aep)
+    results['mean'] = np.mean(net_aep)
+    results['std'] = np.std(net_aep)
+
+    levels = np.percentile(net_aep, percentiles)
+    chunk_levels = np.array([np.percentile(c, percentiles) for c in chunks])
+    if n_chunks > 1:
+        std_error = np.std(chunk_levels, axis=0, ddof=1) / np.sqrt(n_chunks)
+    else:
+        std_error = np.nan * np.ones(len(exceedance))
+    for level, value, error in zip(exceedance, levels, std_error):
+        results['P{0}'.format(level)] = value
+        results['P{0}_std_error'.format(level)] = error
+
+    results['history'] = np.array([np.percentile(net_aep[:(i+1)*chunk_size], percentiles) for i in xrange(n_chunks)])
+
+    return results
+
+# ---------------------------------
+
+class aep_uncertainty_component(Component):
+
+    # Variables
+    power_curve = Array(iotype='in', units='kW', desc='total power after drivetrain losses')
+    wind_curve = Array(iotype='in', units='m/s', desc='wind curve associated with power curve')
+    hub_height = Float(iotype='in', units = 'm', desc='hub height of wind turbine above ground / sea level')
+    shear_exponent = Float(iotype='in', desc= 'shear exponent for wind plant')
+    wind_speed_50m = Float(iotype='in', units = 'm/s', desc='mean annual wind speed at 50 m height')
+    weibull_k= Float(iotype='in', desc = 'weibull shape factor for annual wind speed distribution')
+    machine_rating = Float(iotype='in', units='kW', desc='machine power rating')
+
+    # Parameters
+    soiling_losses = Float(0.0, iotype='in', desc = 'energy losses due to blade soiling for the wind plant - average across turbines')
+    array_losses = Float(0.06, iotype='in', desc = 'energy losses due to turbine interactions - across entire plant')
+    availability = Float(0.94287630736, iotype='in', desc = 'average annual availbility of wind turbines at plant')
+    turbine_number = Int(100, iotype='in', desc = 'total number of wind turbines at the plant')
+    integration = Enum('pdf', ('pdf', 'cdf'), iotype='in', desc = 'power curve integration (see aep_csm_component)')
+
+    # Uncertainty (standard deviations)
+    wind_speed_50m_std = Float(0.0, iotype='in', units = 'm/s', desc='standard deviation of the mean annual wind speed')
+    weibull_k_std = Float(0.0, iotype='in', desc='standard deviation of the weibull shape factor')
+    shear_exponent_std = Float(0.0, iotype='in', desc='standard deviation of the shear exponent')
+    soiling_losses_std = Float(0.0, iotype='in', desc='standard deviation of the soiling losses')
+    array_losses_std = Float(0.0, iotype='in', desc='standard deviation of the array losses')
+    availability_std = Float(0.0, iotype='in', desc='standard deviation of the availability')
+    n_samples = Int(10000, iotype='in', desc='number of Monte Carlo samples')
+    seed = Int(0, iotype='in', desc='seed of the random streams')
+    processes = Int(1, iotype='in', desc='size of the process pool used to evaluate the samples')
+
+    # Output
+    P50 = Float(iotype='out', units='kW * h', desc='net AEP exceeded with 50% probability')
+    P75 = Float(iotype='out', units='kW * h', desc='net AEP exceeded with 75% probability')
+    P90 = Float(iotype='out', units='kW * h', desc='net AEP exceeded with 90% probability')
+    P99 = Float(iotype='out', units='kW * h', desc='net AEP exceeded with 99% probability')
+    mean_net_aep = Float(iotype='out', units='kW * h', desc='mean net AEP of the samples')
+    std_net_aep = Float(iotype='out', units='kW * h', desc='standard deviation of net AEP of the samples')
+    P90_std_error = Float(iotype='out', units='kW * h', desc='standard error of the P90 estimate')
+
+    def execute(self):
+        """
+        Samples the uncertain plant inputs of the AEP Sub-module of the NREL _cost and Scaling Model and reports the exceedance levels of net AEP.
+        """
+
+        uncertainty = dict((name, getattr(self, name + '_std')) for name in sampled_inputs)
+
+        results = aep_monte_carlo(self.power_curve, self.wind_curve, self.machine_rating, self.hub_height, \
+                                  self.wind_speed_50m, self.weibull_k, self.shear_exponent, self.soiling_losses, \
+                                  self.array_losses, self.availability, self.turbine_number, uncertainty, \
+                                  self.n_samples, self.seed, processes=self.processes, integration=self.integration)
+
+        self.P50 = results['P50']
+        self.P75 = results['P75']
+        self.P90 = results['P90']
+        self.P99 = results['P99']
+        self.mean_net_aep = results['mean']
+        self.std_net_aep = results['std']
+        self.P90_std_error = results['P90_std_error']
+
+def example():
+
+    uncertaintytest = aep_uncertainty_component()
+
+    uncertaintytest.power_curve = [0.0, 0.0, 0.0, 0.0, 187.0, 350.0, 658.30, 1087.4, 1658.3, 2391.5, 3307.0, \
+                          4415.70, 5000.0, 5000.0, 5000.0, 5000.0, 5000.0, 5000.0, 5000.0, 5000.0, 5000.0, 5000.0, \
+                          5000.0, 5000.0, 5000.0, 5000.0, 0.0]
+    uncertaintytest.wind_curve = [0.0, 1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0, 9.0, 10.0, \
+                           11.0, 12.0, 13.0, 14.0, 15.0, 16.0, 17.0, 18.0, 19.0, 20.0, 21.0, 22.0, 23.0, 24.0, 25.0, 26.0]
+    uncertaintytest.machine_rating = 5000.0
+    uncertaintytest.hub_height = 90.0
+    uncertaintytest.wind_speed_50m = 8.02
+    uncertaintytest.weibull_k = 2.15
+    uncertaintytest.shear_exponent = 0.1
+    uncertaintytest.wind_speed_50m_std = 0.4
+    uncertaintytest.weibull_k_std = 0.1
+    uncertaintytest.availability_std = 0.02
+    uncertaintytest.array_losses_std = 0.02
+
+    uncertaintytest.run()
+
+    print "P50 net AEP: {0:.1f} kWh".format(uncertaintytest.P50)
+    print "P90 net AEP: {0:.1f} kWh (standard error {1:.1f} kWh)".format(uncertaintytest.P90, uncertaintytest.P90_std_error)
+
+if __name__=="__main__":
+
+    example()
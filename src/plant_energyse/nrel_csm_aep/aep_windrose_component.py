@@ -0,0 +1,157 @@
+"""
+aep_windrose_component.py
+
+Copyright (c) NREL. All rights reserved.
+"""
+
+from openmdao.main.api import Component
+from openmdao.main.datatypes.api import Int, Float, Array, Enum
+
+import numpy as np
+
+from aep_csm_component import weibull_bin_weights
+
+# ---------------------------------
+
+def aep_wind_rose(power_curve, wind_curve, frequency, weibull_k, weibull_scale, shear_exponent, hub_height, machine_rating, \
+                  measurement_height=50.0, soiling_losses=0.0, array_losses=0.06, availability=0.94287630736, \
+                  turbine_number=100, integration='pdf'):
+    '''
+    Evaluate the AEP Sub-module of the NREL _cost and Scaling Model for a sector-wise Weibull wind rose
+
+    All sectors are integrated against the power curve in a single weibull_bin_weights() call.
+
+    Parameters
+    ----------
+    power_curve : array_like
+       power curve after drivetrain losses [kW], shape (n_bins,)
+    wind_curve : array_like
+       wind speeds associated with the power curve bins [m/s], shape (n_bins,)
+    frequency : array_like
+       probability of the wind coming from each sector, shape (n_sectors,) - normalized to sum to one
+    weibull_k : array_like
+       Weibull shape factor of each sector, shape (n_sectors,) or scalar
+    weibull_scale : array_like
+       Weibull scale factor of each sector at measurement_height [m/s], shape (n_sectors,) or scalar
+    shear_exponent : float
+       shear exponent used to extrapolate the scale factors to hub height
+    hub_height : float
+       hub height of wind turbine [m]
+    machine_rating : float
+       machine power rating [kW]
+    measurement_height : float
+       height of the wind rose [m]
+    soiling_losses, availability, turbine_number : float
+       plant loss factors and turbine count (as in aep_csm_component)
+    array_losses : array_like
+       energy losses due to turbine interactions in each sector, shape (n_sectors,) or scalar
+    integration : str
+       'pdf' or 'cdf' - see weibull_bin_weights()
+
+    Returns
+    -------
+    gross_aep : float
+      gross annual energy production [kWh]
+    net_aep : float
+      net annual energy production [kWh]
+    capacity_factor : float
+      plant capacity factor
+    sector_net_aep : ndarray
+      contribution of each sector to net_aep [kWh], shape (n_sectors,)
+    '''
+
+    power_curve = np.asarray(power_curve, dtype=float)
+    frequency = np.atleast_1d(np.asarray(frequency, dtype=float))
+    if np.any(frequency < 0.0) or np.sum(frequency) <= 0.0:
+        raise ValueError('aep_wind_rose: sector frequencies must be non-negative with a positive sum')
+    frequency = frequency / np.sum(frequency)
+
+    K = np.asarray(weibull_k, dtype=float) * np.ones_like(frequency)
+    L = np.asarray(weibull_scale, dtype=float) * np.ones_like(frequency) * (float(hub_height)/measurement_height)**shear_exponent
+
+    # (n_sectors, n_bins) weights - the mean turbine power for wind from each sector
+    W = weibull_bin_weights(wind_curve, K[:,np.newaxis], L[:,np.newaxis], integration)
+    sector_gross_aep = frequency * np.dot(W, power_curve) * 8760.0 * turbine_number
+    sector_net_aep = sector_gross_aep * (1.0-np.asarray(array_losses, dtype=float)) * (1.0-soiling_losses) * availability
+
+    gross_aep = np.sum(sector_gross_aep)
+    net_aep = np.sum(sector_net_aep)
+    capacity_factor = net_aep / (8760 * machine_rating)
+
+    return gross_aep, net_aep, capacity_factor, sector_net_aep
+
+# ---------------------------------
+
+class aep_windrose_component(Component):
+
+    # Variables
+    power_curve = Array(iotype='in', units='kW', desc='total power after drivetrain losses')
+    wind_curve = Array(iotype='in', units='m/s', desc='wind curve associated with power curve')
+    hub_height = Float(iotype='in', units = 'm', desc='hub height of wind turbine above ground / sea level')
+    shear_exponent = Float(iotype='in', desc= 'shear exponent for wind plant')
+    measurement_height = Float(50.0, iotype='in', units = 'm', desc='height of the wind rose')
+    wind_directions = Array(iotype='in', units='deg', desc='center direction of each sector (optional) - labels sector_net_aep')
+    sector_frequency = Array(iotype='in', desc='probability of the wind coming from each sector')
+    sector_weibull_k = Array(iotype='in', desc='weibull shape factor of each sector')
+    sector_weibull_scale = Array(iotype='in', units='m/s', desc='weibull scale factor of each sector at measurement height')
+    machine_rating = Float(iotype='in', units='kW', desc='machine power rating')
+
+    # Parameters
+    soiling_losses = Float(0.0, iotype='in', desc = 'energy losses due to blade soiling for the wind plant - average across turbines')
+    sector_array_losses = Array(np.array([0.06]), iotype='in', desc = 'energy losses due to turbine interactions in each sector (or one value for all sectors)')
+    availability = Float(0.94287630736, iotype='in', desc = 'average annual availbility of wind turbines at plant')
+    turbine_number = Int(100, iotype='in', desc = 'total number of wind turbines at the plant')
+    integration = Enum('pdf', ('pdf', 'cdf'), iotype='in', desc = 'power curve integration (see aep_csm_component)')
+
+    # Output
+    gross_aep = Float(iotype='out', desc='Gross Annual Energy Production before availability and loss impacts', unit='kWh')
+    net_aep = Float(units= 'kW * h', iotype='out', desc='Annual energy production in kWh')
+    capacity_factor = Float(iotype='out', desc='plant capacity factor')
+    sector_net_aep = Array(iotype='out', units='kW * h', desc='contribution of each sector to net AEP')
+
+    def execute(self):
+        """
+        Executes AEP Sub-module of the NREL _cost and Scaling Model by convolving a wind turbine power curve with the weibull distribution of every wind rose sector.
+        It then discounts the resulting AEP for availability, plant and soiling losses.
+        """
+
+        if len(self.wind_directions) > 0 and len(self.wind_directions) != len(self.sector_frequency):
+            raise ValueError('aep_windrose_component: {:d} wind_directions for {:d} sectors'.format(len(self.wind_directions), \
+                             len(self.sector_frequency)))
+
+        self.gross_aep, self.net_aep, self.capacity_factor, self.sector_net_aep = \
+            aep_wind_rose(self.power_curve, self.wind_curve, self.sector_frequency, self.sector_weibull_k, \
+                          self.sector_weibull_scale, self.shear_exponent, self.hub_height, self.machine_rating, \
+                          self.measurement_height, self.soiling_losses, self.sector_array_losses, self.availability, \
+                          self.turbine_number, self.integration)
+
+def example():
+
+    aeptest = aep_windrose_component()
+
+    aeptest.power_curve = [0.0, 0.0, 0.0, 0.0, 187.0, 350.0, 658.30, 1087.4, 1658.3, 2391.5, 3307.0, \
+                          4415.70, 5000.0, 5000.0, 5000.0, 5000.0, 5000.0, 5000.0, 5000.0, 5000.0, 5000.0, 5000.0, \
+                          5000.0, 5000.0, 5000.0, 5000.0, 0.0]
+    aeptest.wind_curve = [0.0, 1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0, 9.0, 10.0, \
+                           11.0, 12.0, 13.0, 14.0, 15.0, 16.0, 17.0, 18.0, 19.0, 20.0, 21.0, 22.0, 23.0, 24.0, 25.0, 26.0]
+    aeptest.hub_height = 90.0
+    aeptest.shear_exponent = 0.1
+    aeptest.machine_rating = 5000.0
+
+    # 12 sector rose with prevailing south-westerly winds
+    aeptest.wind_directions = np.arange(0.0, 360.0, 30.0)
+    aeptest.sector_frequency = [0.05, 0.04, 0.05, 0.06, 0.07, 0.09, 0.12, 0.15, 0.13, 0.10, 0.08, 0.06]
+    aeptest.sector_weibull_k = [2.0, 1.9, 2.0, 2.1, 2.2, 2.3, 2.3, 2.4, 2.3, 2.2, 2.1, 2.0]
+    aeptest.sector_weibull_scale = [7.5, 7.0, 7.4, 8.0, 8.6, 9.1, 9.6, 10.2, 9.8, 9.2, 8.5, 7.9]
+    aeptest.sector_array_losses = [0.08, 0.07, 0.06, 0.05, 0.06, 0.09, 0.12, 0.14, 0.11, 0.08, 0.06, 0.07]
+
+    aeptest.run()
+
+    print "AEP output: {0}".format(aeptest.net_aep)
+    print "AEP by sector:"
+    for direction, sector_aep in zip(aeptest.wind_directions, aeptest.sector_net_aep):
+        print "  {0:5.1f} deg: {1:.4g}".format(direction, sector_aep)
+
+if __name__=="__main__":
+
+    example()
@@ -35,6 +35,8 @@ class aero_csm_component(Component):
     power_curve = Array(iotype='out', units='kW', desc='total power before drivetrain losses')
     wind_curve = Array(iotype='out', units='m/s', desc='wind curve associated with power curve')
 
+    missing_deriv_policy = 'assume_zero'
+
     def __init__(self):
         """
         OpenMDAO component to wrap Aerodynamics module of the NREL _cost and Scaling Model (csmAero.py)
@@ -60,118 +62,274 @@ class aero_csm_component(Component):
         self.cutOutWS   = self.cut_out_wind_speed
         self.altitude   = self.altitude
 
-        if self.air_density == 0.0:      
-            # Compute air density 
-            ssl_pa     = 101300  # std sea-level pressure in Pa
-            gas_const  = 287.15  # gas constant for air in J/kg/K
-            gravity    = 9.80665 # standard gravity in m/sec/sec
-            lapse_rate = 0.0065  # temp lapse rate in K/m
-            ssl_temp   = 288.15  # std sea-level temp in K
-        
-            air_density = (ssl_pa * (1-((lapse_rate*(self.altitude + self.hubHt))/ssl_temp))**(gravity/(lapse_rate*gas_const))) / \
-              (gas_const*(ssl_temp-lapse_rate*(self.altitude + self.hubHt)))
-        else:
-        		air_density = self.air_density
+        wind_curve, power_curve, rated_wind_speed, rated_rotor_speed, rotor_thrust, rotor_torque = \
+            aero_csm_batch(self.machine_rating, self.max_tip_speed, self.rotor_diameter, self.max_power_coefficient, \
+                           self.opt_tsr, self.cut_in_wind_speed, self.cut_out_wind_speed, self.hub_height, \
+                           self.altitude, self.air_density, self.max_efficiency, self.thrust_coefficient)
 
-        # determine power curve inputs
-        self.reg2pt5slope  = 0.05
-        
-        #self.max_efficiency = self.drivetrain.getMaxEfficiency()
         self.ratedHubPower = self.ratedPower / self.max_efficiency  # RatedHubPower
-
-        self.omegaM = self.maxTipSpd/(self.rotorDiam/2.)  # Omega M - rated rotor speed
-        omega0 = self.omegaM/(1+self.reg2pt5slope)       # Omega 0 - rotor speed at which region 2 hits zero torque
-        Tm = self.ratedHubPower*1000/self.omegaM         # Tm - rated torque
-
-        # compute rated rotor speed
-        self.ratedRPM = (30./pi) * self.omegaM
-        
-        # compute variable-speed torque constant k
-        kTorque = (air_density*pi*self.rotorDiam**5*self.maxCp)/(64*self.maxTipSpdRatio**3) # k
-        
-        b = -Tm/(self.omegaM-omega0)                       # b - quadratic formula values to determine omegaT
-        c = (Tm*omega0)/(self.omegaM-omega0)               # c
-        
-        # omegaT is rotor speed at which regions 2 and 2.5 intersect
-        # add check for feasibility of omegaT calculation 09/20/2012
-        omegaTflag = True
-        if (b**2-4*kTorque*c) > 0:
-           omegaT = -(b/(2*kTorque))-(np.sqrt(b**2-4*kTorque*c)/(2*kTorque))  # Omega T
-           #print [kTorque, b, c, omegaT]
-        
-           windOmegaT = (omegaT*self.rotorDiam)/(2*self.maxTipSpdRatio) # Wind  at omegaT (M25)
-           pwrOmegaT  = kTorque*omegaT**3/1000                                # Power at ometaT (M26)
-
-        else:
-           omegaTflag = False
-           windOmegaT = self.ratedRPM
-           pwrOmegaT = self.ratedPower
-
-        # compute rated wind speed
-        d = air_density*np.pi*self.rotorDiam**2.*0.25*self.maxCp
-        self.ratedWindSpeed = \
-           0.33*( (2.*self.ratedHubPower*1000.      / (    d))**(1./3.) ) + \
-           0.67*( (((self.ratedHubPower-pwrOmegaT)*1000.) / (1.5*d*windOmegaT**2.))  + windOmegaT )
-
-        # set up for idealized power curve
-        n = 161 # number of wind speed bins
-        itp = [None] * n
-        ws_inc = 0.25  # size of wind speed bins for integrating power curve
-        Wind = []
-        Wval = 0.0
-        Wind.append(Wval)
-        for i in xrange(1,n):
-           Wval += ws_inc
-           Wind.append(Wval)
-
-        # determine idealized power curve 
-        self.idealPowerCurve (Wind, itp, kTorque, windOmegaT, pwrOmegaT, n , omegaTflag)
-
-        # add a fix for rated wind speed calculation inaccuracies kld 9/21/2012
-        ratedWSflag = False
-        # determine power curve after losses
-        mtp = [None] * n
-        for i in xrange(0,n):
-           mtp[i] = itp[i] #* self.drivetrain.getDrivetrainEfficiency(itp[i],self.ratedHubPower)
-           #print [Wind[i],itp[i],self.drivetrain.getDrivetrainEfficiency(itp[i],self.ratedHubPower),mtp[i]] # for testing
-           if (mtp[i] > self.ratedPower):
-              if not ratedWSflag:
-                ratedWSflag = True
-              mtp[i] = self.ratedPower
+        self.ratedWindSpeed = rated_wind_speed[0]
+        self.ratedRPM = rated_rotor_speed[0]
 
         self.rated_wind_speed = self.ratedWindSpeed
         self.rated_rotor_speed = self.ratedRPM
-        self.power_curve = mtp
-        self.wind_curve = Wind
+        self.power_curve = power_curve[0]
+        self.wind_curve = wind_curve
 
         # compute turbine load outputs
-        self.rotor_torque = self.ratedHubPower/(self.ratedRPM*(pi/30.))*1000.
-        self.rotor_thrust  = air_density * self.thrust_coefficient * pi * self.rotor_diameter**2 * (self.ratedWindSpeed**2) / 8.
+        self.rotor_torque = rotor_torque[0]
+        self.rotor_thrust  = rotor_thrust[0]
+
+        # gradients
+        self.J = aero_csm_jacobian(self.machine_rating, self.max_tip_speed, self.rotor_diameter, self.max_power_coefficient, \
+                                   self.opt_tsr, self.cut_in_wind_speed, self.cut_out_wind_speed, self.hub_height, \
+                                   self.altitude, self.air_density, self.max_efficiency, self.thrust_coefficient, wind_curve)
+
+    def list_deriv_vars(self):
+
+        inputs = ('rotor_diameter', 'machine_rating', 'max_tip_speed', 'max_power_coefficient', 'opt_tsr', 'hub_height', 'air_density')
+        outputs = ('power_curve', 'rated_wind_speed', 'rated_rotor_speed', 'rotor_thrust', 'rotor_torque')
+
+        return inputs, outputs
+
+    def provideJ(self):
+
+        return self.J
 
     def idealPowerCurve( self, Wind, ITP, kTorque, windOmegaT, pwrOmegaT, n , omegaTflag):
         """
         Determine the ITP (idealized turbine power) array
         """
-       
-        idealPwr = 0.0
-
-        for i in xrange(0,n):
-            if (Wind[i] >= self.cutOutWS ) or (Wind[i] <= self.cutInWS):
-                idealPwr = 0.0  # cut out
-            else:
-                if omegaTflag:
-                    if ( Wind[i] > windOmegaT ):
-                       idealPwr = (self.ratedHubPower-pwrOmegaT)/(self.ratedWindSpeed-windOmegaT) * (Wind[i]-windOmegaT) + pwrOmegaT # region 2.5
-                    else:
-                       idealPwr = kTorque * (Wind[i]*self.maxTipSpdRatio/(self.rotorDiam/2.0))**3 / 1000.0 # region 2             
-                else:
-                    idealPwr = kTorque * (Wind[i]*self.maxTipSpdRatio/(self.rotorDiam/2.0))**3 / 1000.0 # region 2
-
-            ITP[i] = idealPwr
-            #print [Wind[i],ITP[i]]
+
+        ITP[:n] = ideal_power_curve(np.asarray(Wind[:n]), self.cutInWS, self.cutOutWS, kTorque, windOmegaT, pwrOmegaT, \
+                                    self.ratedHubPower, self.ratedWindSpeed, self.maxTipSpdRatio, self.rotorDiam, omegaTflag).tolist()
         
         return
 
+# ---------------------------------
+
+def ideal_power_curve(Wind, cutInWS, cutOutWS, kTorque, windOmegaT, pwrOmegaT, ratedHubPower, ratedWindSpeed, \
+                      maxTipSpdRatio, rotorDiam, omegaTflag):
+    '''
+    Return the ITP (idealized turbine power) [kW] at the wind speeds in Wind
+    
+    All rotor parameters may be scalars or column vectors of shape (n_rotors, 1), in which case
+    the result has shape (n_rotors, n_bins).
+    '''
+
+    Wind = np.asarray(Wind, dtype=float)
+
+    region2 = kTorque * (Wind*maxTipSpdRatio/(rotorDiam/2.0))**3 / 1000.0
+    region2pt5 = (ratedHubPower-pwrOmegaT)/(ratedWindSpeed-windOmegaT) * (Wind-windOmegaT) + pwrOmegaT
+
+    idealPwr = np.where(np.logical_and(omegaTflag, Wind > windOmegaT), region2pt5, region2)
+    idealPwr = np.where(np.logical_or(Wind >= cutOutWS, Wind <= cutInWS), 0.0, idealPwr) # cut in / cut out
+
+    return idealPwr
+
+def aero_csm_batch(machine_rating, max_tip_speed, rotor_diameter, max_power_coefficient, opt_tsr, \
+                   cut_in_wind_speed, cut_out_wind_speed, hub_height, altitude, air_density, max_efficiency, thrust_coefficient, \
+                   n=161, ws_inc=0.25):
+    '''
+    Evaluate the Aerodynamics Sub-module of the NREL _cost and Scaling Model for many rotors at once
+    
+    Every input may be a scalar or an array of shape (n_rotors,); inputs are broadcast against each other.
+    An air_density of 0.0 forces the air density to be computed from altitude and hub height.
+    
+    Returns
+    -------
+    wind_curve : ndarray
+      wind speed bins [m/s], shape (n,)
+    power_curve : ndarray
+      power curve clipped at rated power [kW], shape (n_rotors, n)
+    rated_wind_speed : ndarray
+      wind speed for rated power [m/s], shape (n_rotors,)
+    rated_rotor_speed : ndarray
+      rotor speed at rated power [rpm], shape (n_rotors,)
+    rotor_thrust : ndarray
+      maximum thrust from rotor [N], shape (n_rotors,)
+    rotor_torque : ndarray
+      torque from rotor at rated power [N*m], shape (n_rotors,)
+    '''
+
+    ratedPower, maxTipSpd, rotorDiam, maxCp, maxTipSpdRatio, cutInWS, cutOutWS, hubHt, altitude, air_density, \
+      max_efficiency, thrust_coefficient = \
+        [np.atleast_1d(np.asarray(v, dtype=float)) for v in np.broadcast_arrays(machine_rating, max_tip_speed, rotor_diameter, \
+          max_power_coefficient, opt_tsr, cut_in_wind_speed, cut_out_wind_speed, hub_height, altitude, air_density, \
+          max_efficiency, thrust_coefficient)]
+
+    # Compute air density where it is not given
+    ssl_pa     = 101300  # std sea-level pressure in Pa
+    gas_const  = 287.15  # gas constant for air in J/kg/K
+    gravity    = 9.80665 # standard gravity in m/sec/sec
+    lapse_rate = 0.0065  # temp lapse rate in K/m
+    ssl_temp   = 288.15  # std sea-level temp in K
+
+    air_density = np.where(air_density == 0.0, \
+      (ssl_pa * (1-((lapse_rate*(altitude + hubHt))/ssl_temp))**(gravity/(lapse_rate*gas_const))) / \
+      (gas_const*(ssl_temp-lapse_rate*(altitude + hubHt))), air_density)
+
+    # determine power curve inputs
+    reg2pt5slope  = 0.05
+
+    ratedHubPower = ratedPower / max_efficiency  # RatedHubPower
+
+    omegaM = maxTipSpd/(rotorDiam/2.)  # Omega M - rated rotor speed
+    omega0 = omegaM/(1+reg2pt5slope)   # Omega 0 - rotor speed at which region 2 hits zero torque
+    Tm = ratedHubPower*1000/omegaM     # Tm - rated torque
+
+    # compute rated rotor speed
+    ratedRPM = (30./pi) * omegaM
+
+    # compute variable-speed torque constant k
+    kTorque = (air_density*pi*rotorDiam**5*maxCp)/(64*maxTipSpdRatio**3) # k
+
+    b = -Tm/(omegaM-omega0)            # b - quadratic formula values to determine omegaT
+    c = (Tm*omega0)/(omegaM-omega0)    # c
+
+    # omegaT is rotor speed at which regions 2 and 2.5 intersect
+    # add check for feasibility of omegaT calculation 09/20/2012
+    omegaTflag = (b**2-4*kTorque*c) > 0
+    omegaT = -(b/(2*kTorque))-(np.sqrt(np.where(omegaTflag, b**2-4*kTorque*c, 0.0))/(2*kTorque))  # Omega T
+
+    windOmegaT = np.where(omegaTflag, (omegaT*rotorDiam)/(2*maxTipSpdRatio), ratedRPM) # Wind  at omegaT (M25)
+    pwrOmegaT  = np.where(omegaTflag, kTorque*omegaT**3/1000, ratedPower)              # Power at ometaT (M26)
+
+    # compute rated wind speed
+    d = air_density*np.pi*rotorDiam**2.*0.25*maxCp
+    ratedWindSpeed = \
+       0.33*( (2.*ratedHubPower*1000.      / (    d))**(1./3.) ) + \
+       0.67*( (((ratedHubPower-pwrOmegaT)*1000.) / (1.5*d*windOmegaT**2.))  + windOmegaT )
+
+    # idealized power curve on n wind speed bins of size ws_inc
+    Wind = np.arange(n) * ws_inc
+    col = lambda v: v[:,np.newaxis]
+    itp = ideal_power_curve(Wind, col(cutInWS), col(cutOutWS), col(kTorque), col(windOmegaT), col(pwrOmegaT), \
+                            col(ratedHubPower), col(ratedWindSpeed), col(maxTipSpdRatio), col(rotorDiam), col(omegaTflag))
+
+    # determine power curve after losses (clip at rated power)
+    mtp = np.minimum(itp, col(ratedPower))
+
+    # compute turbine load outputs
+    rotor_torque = ratedHubPower/(ratedRPM*(pi/30.))*1000.
+    rotor_thrust  = air_density * thrust_coefficient * pi * rotorDiam**2 * (ratedWindSpeed**2) / 8.
+
+    return Wind, mtp, ratedWindSpeed, ratedRPM, rotor_thrust, rotor_torque
+
+def aero_csm_jacobian(machine_rating, max_tip_speed, rotor_diameter, max_power_coefficient, opt_tsr, \
+                      cut_in_wind_speed, cut_out_wind_speed, hub_height, altitude, air_density, max_efficiency, thrust_coefficient, \
+                      wind_curve):
+    '''
+    Analytic partial derivatives of the Aerodynamics Sub-module for a single rotor
+    
+    Inputs (columns) are ordered as rotor_diameter, machine_rating, max_tip_speed, max_power_coefficient, opt_tsr,
+    hub_height, air_density; outputs (rows) are the power curve bins followed by rated_wind_speed, rated_rotor_speed,
+    rotor_thrust and rotor_torque.
+    '''
+
+    rotorDiam = float(rotor_diameter)
+    ratedPower = float(machine_rating)
+    maxTipSpd = float(max_tip_speed)
+    maxCp = float(max_power_coefficient)
+    maxTipSpdRatio = float(opt_tsr)
+    hubHt = float(hub_height)
+    Wind = np.asarray(wind_curve, dtype=float)
+
+    # each d* is the gradient of a quantity with respect to the 7 inputs
+    dD, dPr, dVtip, dCp, dTSR, dHt, dRho = np.eye(7)
+
+    if air_density == 0.0:
+        ssl_pa     = 101300  # std sea-level pressure in Pa
+        gas_const  = 287.15  # gas constant for air in J/kg/K
+        gravity    = 9.80665 # standard gravity in m/sec/sec
+        lapse_rate = 0.0065  # temp lapse rate in K/m
+        ssl_temp   = 288.15  # std sea-level temp in K
+
+        z = altitude + hubHt
+        e = gravity/(lapse_rate*gas_const)
+        num = ssl_pa * (1-((lapse_rate*z)/ssl_temp))**e
+        den = gas_const*(ssl_temp-lapse_rate*z)
+        rho = num / den
+        dnum_dz = -num*e*(lapse_rate/ssl_temp)/(1-((lapse_rate*z)/ssl_temp))
+        dden_dz = -gas_const*lapse_rate
+        drho = (dnum_dz/den - num*dden_dz/den**2) * dHt
+    else:
+        rho = float(air_density)
+        drho = dRho
+
+    reg2pt5slope = 0.05
+
+    ratedHubPower = ratedPower / max_efficiency
+    dPh = dPr / max_efficiency
+
+    omegaM = maxTipSpd/(rotorDiam/2.)
+    domegaM = 2.*dVtip/rotorDiam - 2.*maxTipSpd*dD/rotorDiam**2
+    omega0 = omegaM/(1+reg2pt5slope)
+    domega0 = domegaM/(1+reg2pt5slope)
+    Tm = ratedHubPower*1000/omegaM
+    dTm = 1000.*(dPh/omegaM - ratedHubPower*domegaM/omegaM**2)
+
+    ratedRPM = (30./pi) * omegaM
+    dRPM = (30./pi) * domegaM
+
+    kTorque = (rho*pi*rotorDiam**5*maxCp)/(64*maxTipSpdRatio**3)
+    dk = kTorque*(drho/rho + 5.*dD/rotorDiam + dCp/maxCp - 3.*dTSR/maxTipSpdRatio)
+
+    dOmega = omegaM - omega0
+    ddOmega = domegaM - domega0
+    b = -Tm/dOmega
+    db = -dTm/dOmega + Tm*ddOmega/dOmega**2
+    c = (Tm*omega0)/dOmega
+    dc = (dTm*omega0 + Tm*domega0)/dOmega - Tm*omega0*ddOmega/dOmega**2
+
+    disc = b**2-4*kTorque*c
+    omegaTflag = disc > 0
+    if omegaTflag:
+        ddisc = 2.*b*db - 4.*(dk*c + kTorque*dc)
+        sq = np.sqrt(disc)
+        dsq = ddisc/(2.*sq)
+        omegaT = -(b/(2*kTorque))-(sq/(2*kTorque))
+        domegaT = -(db + dsq)/(2*kTorque) + (b + sq)*dk/(2*kTorque**2)
+
+        windOmegaT = (omegaT*rotorDiam)/(2*maxTipSpdRatio)
+        dWindOmegaT = (domegaT*rotorDiam + omegaT*dD)/(2*maxTipSpdRatio) - windOmegaT*dTSR/maxTipSpdRatio
+        pwrOmegaT  = kTorque*omegaT**3/1000
+        dPwrOmegaT = (dk*omegaT**3 + 3.*kTorque*omegaT**2*domegaT)/1000
+    else:
+        windOmegaT = ratedRPM
+        dWindOmegaT = dRPM
+        pwrOmegaT = ratedPower
+        dPwrOmegaT = dPr
+
+    d = rho*np.pi*rotorDiam**2.*0.25*maxCp
+    dd = d*(drho/rho + 2.*dD/rotorDiam + dCp/maxCp)
+    t1 = (2.*ratedHubPower*1000./d)**(1./3.)
+    dt1 = t1/3.*(dPh/ratedHubPower - dd/d)
+    t2 = ((ratedHubPower-pwrOmegaT)*1000.) / (1.5*d*windOmegaT**2.)
+    dt2 = 1000.*(dPh - dPwrOmegaT)/(1.5*d*windOmegaT**2.) - t2*(dd/d + 2.*dWindOmegaT/windOmegaT)
+    ratedWindSpeed = 0.33*t1 + 0.67*(t2 + windOmegaT)
+    dRatedWindSpeed = 0.33*dt1 + 0.67*(dt2 + dWindOmegaT)
+
+    # power curve bins
+    itp = ideal_power_curve(Wind, cut_in_wind_speed, cut_out_wind_speed, kTorque, windOmegaT, pwrOmegaT, \
+                            ratedHubPower, ratedWindSpeed, maxTipSpdRatio, rotorDiam, omegaTflag)
+    region2 = kTorque * (Wind*maxTipSpdRatio/(rotorDiam/2.0))**3 / 1000.0
+    dRegion2 = region2[:,np.newaxis] * (dk/kTorque + 3.*dTSR/maxTipSpdRatio - 3.*dD/rotorDiam)
+    slope = (ratedHubPower-pwrOmegaT)/(ratedWindSpeed-windOmegaT)
+    dslope = (dPh - dPwrOmegaT)/(ratedWindSpeed-windOmegaT) - slope*(dRatedWindSpeed - dWindOmegaT)/(ratedWindSpeed-windOmegaT)
+    dRegion2pt5 = np.outer(Wind-windOmegaT, dslope) - slope*dWindOmegaT + dPwrOmegaT
+
+    dPower = np.where((np.logical_and(omegaTflag, Wind > windOmegaT))[:,np.newaxis], dRegion2pt5, dRegion2)
+    dPower[np.logical_or(Wind >= cut_out_wind_speed, Wind <= cut_in_wind_speed)] = 0.0
+    dPower[itp > ratedPower] = dPr
+
+    # turbine load outputs
+    rotor_thrust  = rho * thrust_coefficient * pi * rotorDiam**2 * (ratedWindSpeed**2) / 8.
+    dThrust = rotor_thrust*(drho/rho + 2.*dD/rotorDiam + 2.*dRatedWindSpeed/ratedWindSpeed)
+    dTorque = 1000.*(dPh/omegaM - ratedHubPower*domegaM/omegaM**2)
+
+    return np.vstack([dPower, dRatedWindSpeed, dRPM, dThrust, dTorque])
+
 def example():
   
     aerotest = aero_csm_component()
@@ -5,7 +5,9 @@ Created by NWTC Systems Engineering Sub-Task on 2012-08-01.
 Copyright (c) NREL. All rights reserved.
 """
 
+import sys
 import numpy as np
+import time
 
 from openmdao.main.api import Component, Assembly, set_as_top, VariableTree
 from openmdao.main.datatypes.api import Int, Bool, Float, Array, VarTree, Enum
@@ -13,9 +15,10 @@ from openmdao.main.datatypes.api import Int, Bool, Float, Array, VarTree, Enum
 from fusedwind.plant_flow.asym import BaseAEPModel
 from fusedwind.interface import implement_base
 
-from CSMDrivetrain import CSMDrivetrain
-from aero_csm_component import aero_csm_component
-from aep_csm_component import aep_csm_component
+from CSMDrivetrain import CSMDrivetrain, drivetrain_losses
+from aero_csm_component import aero_csm_component, aero_csm_batch
+from aep_csm_component import aep_csm_component, aep_weibull_batch
+from power_curve_cache import PowerCurveCache, cached_power_curve_component
 
 @implement_base(BaseAEPModel)
 class aep_csm_assembly(Assembly):
@@ -52,10 +55,28 @@ class aep_csm_assembly(Assembly):
     gross_aep = Float(0.0, iotype='out', desc='Gross Annual Energy Production before availability and loss impacts', unit='kWh')
     net_aep = Float(0.0, units= 'kW * h', iotype='out', desc='Annual energy production in kWh')  # use PhysicalUnits to set units='kWh'
     capacity_factor = Float(iotype='out', desc='plant capacity factor')
+
+    def __init__(self, power_curve_cache=None):
+        """
+        OpenMDAO assembly for the NREL _cost and Scaling Model AEP chain
+        
+        power_curve_cache : PowerCurveCache, optional
+          when given, the aero and drive components are replaced by one cached_power_curve_component (named
+          'power') that looks the post-drivetrain power curve up by turbine inputs and drivetrain type, so that
+          only the AEP sub-module is evaluated for turbines that are already in the cache
+        """
+
+        self.power_curve_cache = power_curve_cache
+
+        super(aep_csm_assembly, self).__init__()
                 
     def configure(self):
         ''' configures assembly by adding components, creating the workflow, and connecting the component i/o within the workflow '''
 
+        if self.power_curve_cache is not None:
+            self.configure_cached()
+            return
+
         self.add('drive', CSMDrivetrain())
         self.add('aero',aero_csm_component())
         self.add('aep',aep_csm_component())
@@ -104,8 +125,139 @@ class aep_csm_assembly(Assembly):
         self.connect('aep.capacity_factor', 'capacity_factor')
         #self.create_passthrough('aep.aep_per_turbine')
 
+    def configure_cached(self):
+        ''' configures the assembly with a cached_power_curve_component ('power') in place of the aero and drive components '''
+
+        self.add('power', cached_power_curve_component(self.power_curve_cache))
+        self.add('aep',aep_csm_component())
+
+        self.driver.workflow.add(['power', 'aep'])
+
+        # connect inputs to component inputs
+        self.connect('machine_rating', ['power.machine_rating', 'aep.machine_rating'])
+        self.connect('hub_height', ['power.hub_height', 'aep.hub_height'])
+
+        # connect i/o between components
+        self.connect('power.power_curve', 'aep.power_curve')
+        self.connect('power.wind_curve', 'aep.wind_curve')
+        self.connect('aep.power_array','power_curve')
+
+        # turbine
+        for name in PowerCurveCache.turbine_inputs:
+            if name not in ('machine_rating', 'hub_height'):
+                self.connect(name, 'power.' + name)
+        self.connect('drivetrain_design','power.drivetrain_design')
+        # plant
+        self.connect('shear_exponent','aep.shear_exponent')
+        self.connect('weibull_k','aep.weibull_k')
+        self.connect('wind_speed_50m', 'aep.wind_speed_50m')
+        self.connect('soiling_losses','aep.soiling_losses')
+        self.connect('array_losses','aep.array_losses')
+        self.connect('availability', 'aep.availability')
+        self.connect('turbine_number','aep.turbine_number')
+
+        # connect outputs
+        self.connect('power.rated_rotor_speed','rated_rotor_speed')
+        self.connect('power.rated_wind_speed', 'rated_wind_speed')
+        self.connect('power.rotor_thrust','rotor_thrust')
+        self.connect('power.rotor_torque','rotor_torque')
+        self.connect('aep.gross_aep', 'gross_aep')
+        self.connect('aep.net_aep', 'net_aep')
+        self.connect('aep.capacity_factor', 'capacity_factor')
+
+# ---------------------------------
+
+def aep_csm_fast(machine_rating, max_tip_speed, rotor_diameter, max_power_coefficient, opt_tsr, cut_in_wind_speed, \
+                 cut_out_wind_speed, hub_height, altitude, air_density, drivetrain_design, shear_exponent, wind_speed_50m, \
+                 weibull_k, soiling_losses, array_losses, availability, turbine_number, thrust_coefficient, max_efficiency, \
+                 integration='pdf'):
+    '''
+    Framework-free evaluation of the aero -> drive -> aep chain of aep_csm_assembly on plain floats
+
+    The arguments have the names, units and meaning of the aep_csm_assembly inputs; integration is
+    the aep_csm_component option. No OpenMDAO components are created or run.
+
+    Returns
+    -------
+    outputs : dict
+      rated_wind_speed, rated_rotor_speed, rotor_thrust, rotor_torque, power_curve ([wind_curve, power]),
+      gross_aep, net_aep and capacity_factor, as the aep_csm_assembly outputs
+    '''
+
+    wind_curve, aero_power, rated_wind_speed, rated_rotor_speed, rotor_thrust, rotor_torque = \
+        aero_csm_batch(machine_rating, max_tip_speed, rotor_diameter, max_power_coefficient, opt_tsr, \
+                       cut_in_wind_speed, cut_out_wind_speed, hub_height, altitude, air_density, max_efficiency, \
+                       thrust_coefficient)
+
+    power, _, _ = drivetrain_losses(aero_power[0], machine_rating, drivetrain_design)
+
+    gross_aep, net_aep, capacity_factor = aep_weibull_batch(power, wind_curve, wind_speed_50m, weibull_k, \
+              shear_exponent, hub_height, machine_rating, soiling_losses, array_losses, availability, turbine_number, \
+              integration)
+
+    outputs = {}
+    outputs['rated_wind_speed'] = rated_wind_speed[0]
+    outputs['rated_rotor_speed'] = rated_rotor_speed[0]
+    outputs['rotor_thrust'] = rotor_thrust[0]
+    outputs['rotor_torque'] = rotor_torque[0]
+    outputs['power_curve'] = np.array([wind_curve, power])
+    outputs['gross_aep'] = gross_aep[0,0]
+    outputs['net_aep'] = net_aep[0,0]
+    outputs['capacity_factor'] = capacity_factor[0,0]
+
+    return outputs
+
+def benchmark(n=200):
+    '''
+    Time one evaluation of aep_csm_assembly.run() against aep_csm_fast() for the example 5 MW plant
+
+    Returns
+    -------
+    assembly_time, fast_time : float
+      mean wall time per evaluation [s]
+    '''
+
+    inputs = dict(machine_rating=5000.0, max_tip_speed=80.0, rotor_diameter=126.0, max_power_coefficient=0.488, \
+                  opt_tsr=7.525, cut_in_wind_speed=3.0, cut_out_wind_speed=25.0, hub_height=90.0, altitude=0.0, \
+                  air_density=0.0, drivetrain_design='geared', shear_exponent=0.1, wind_speed_50m=8.02, weibull_k=2.15, \
+                  soiling_losses=0.0, array_losses=0.10, availability=0.941, turbine_number=100, \
+                  thrust_coefficient=0.50, max_efficiency=0.902)
+
+    aepA = aep_csm_assembly()
+    for name, value in inputs.items():
+        setattr(aepA, name, value)
+
+    # vary the rotor diameter so that every assembly run executes the whole workflow
+    diameters = 126.0 + 1.0e-3 * np.arange(n)
+
+    t0 = time.time()
+    for D in diameters:
+        aepA.rotor_diameter = D
+        aepA.run()
+    assembly_time = (time.time() - t0) / n
+
+    t0 = time.time()
+    for D in diameters:
+        inputs['rotor_diameter'] = D
+        outputs = aep_csm_fast(**inputs)
+    fast_time = (time.time() - t0) / n
+
+    print "aep_csm_assembly.run(): {0:.3f} ms per evaluation".format(1e3*assembly_time)
+    print "aep_csm_fast(): {0:.3f} ms per evaluation ({1:.1f}x faster)".format(1e3*fast_time, assembly_time/fast_time)
+    print "net AEP difference at the last point: {0:.3e} kWh".format(outputs['net_aep'] - aepA.net_aep)
+
+    return assembly_time, fast_time
+
 def example():
 
+    run_benchmark = False
+    for arg in sys.argv[1:]:
+        if arg == '-benchmark':
+            run_benchmark = True
+        if arg == '-help':
+            sys.stderr.write('USAGE: python nrel_csm_aep.py [-benchmark]\n')
+            exit()
+
     aepA = aep_csm_assembly()
 
     aepA.machine_rating = 5000.0 # Float(units = 'kW', iotype='in', desc= 'rated machine power in kW')
@@ -138,6 +290,9 @@ def example():
     print "Rated rotor speed: {0:.2f} rpm".format(aepA.rated_rotor_speed)
     print "Rated wind speed: {0:.2f} m/s".format(aepA.rated_wind_speed)
 
+    if run_benchmark:
+        benchmark()
+
 if __name__=="__main__":
 
     example()
\ No newline at end of file
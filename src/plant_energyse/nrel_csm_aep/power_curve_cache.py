@@ -0,0 +1,166 @@
+"""
+power_curve_cache.py
+
+Copyright (c) NREL. All rights reserved.
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+
+from openmdao.main.api import Component
+from openmdao.main.datatypes.api import Float, Array, Enum
+
+from aero_csm_component import aero_csm_batch
+from CSMDrivetrain import drivetrain_losses
+
+# ---------------------------------
+
+class PowerCurveCache(object):
+    ''' 
+    Bounded least-recently-used cache of post-drivetrain power curves and rated quantities
+    
+    Entries are keyed on the turbine inputs of aep_csm_assembly (quantized to a number of significant
+    digits) plus the drivetrain type, so that runs which only change the site inputs can skip the
+    aerodynamic and drivetrain sub-modules.
+    
+    Parameters
+    ----------
+    maxsize : int
+       maximum number of power curves held; the least recently used entry is dropped beyond this
+    digits : int
+       number of significant digits kept when quantizing the turbine inputs
+    '''
+
+    turbine_inputs = ('machine_rating', 'max_tip_speed', 'rotor_diameter', 'max_power_coefficient', 'opt_tsr', \
+                      'cut_in_wind_speed', 'cut_out_wind_speed', 'hub_height', 'altitude', 'air_density', \
+                      'thrust_coefficient', 'max_efficiency')
+
+    def __init__(self, maxsize=128, digits=10):
+
+        self.maxsize = maxsize
+        self.digits = digits
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def make_key(self, drivetrain_design, **turbine):
+        ''' Return the cache key for a set of turbine inputs (keyword arguments named as in turbine_inputs) '''
+
+        values = tuple(float('{0:.{1}g}'.format(float(turbine[name]), self.digits)) for name in self.turbine_inputs)
+        return values + (drivetrain_design,)
+
+    def get(self, key):
+        ''' Return the cached entry for key (and mark it most recently used), or None '''
+
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries[key] = entry
+        self.hits += 1
+        return entry
+
+    def put(self, key, wind_curve, power_curve, rated_wind_speed, rated_rotor_speed, rotor_thrust, rotor_torque):
+        ''' Store a post-drivetrain power curve and the rated quantities of a turbine, and return the new entry '''
+
+        entry = {'wind_curve' : np.array(wind_curve, dtype=float),
+                 'power_curve' : np.array(power_curve, dtype=float),
+                 'rated_wind_speed' : rated_wind_speed,
+                 'rated_rotor_speed' : rated_rotor_speed,
+                 'rotor_thrust' : rotor_thrust,
+                 'rotor_torque' : rotor_torque}
+        self._entries.pop(key, None)
+        self._entries[key] = entry
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        ''' Drop all entries and reset the hit/miss counters '''
+
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+
+        return len(self._entries)
+
+    def __contains__(self, key):
+
+        return key in self._entries
+
+    def __str__(self):
+
+        return 'PowerCurveCache: {:d} of {:d} entries, {:d} hits, {:d} misses'.format(len(self._entries), self.maxsize, self.hits, self.misses)
+
+# ---------------------------------
+
+class cached_power_curve_component(Component):
+    '''
+    Aerodynamics and drivetrain sub-modules of the NREL _cost and Scaling Model in one component, whose
+    post-drivetrain power curve and rated quantities are taken from a PowerCurveCache when the turbine
+    has been seen before - aep_csm_assembly uses it in place of its aero and drive components when it
+    is given a cache. It has no analytic derivatives.
+    '''
+
+    # Variables
+    machine_rating = Float(units = 'kW', iotype='in', desc= 'rated machine power in kW')
+    max_tip_speed = Float(units = 'm/s', iotype='in', desc= 'maximum allowable tip speed for the rotor')
+    rotor_diameter = Float(units = 'm', iotype='in', desc= 'rotor diameter of the machine') 
+    max_power_coefficient = Float(iotype='in', desc= 'maximum power coefficient of rotor for operation in region 2')
+    opt_tsr = Float(iotype='in', desc= 'optimum tip speed ratio for operation in region 2')
+    cut_in_wind_speed = Float(units = 'm/s', iotype='in', desc= 'cut in wind speed for the wind turbine')
+    cut_out_wind_speed = Float(units = 'm/s', iotype='in', desc= 'cut out wind speed for the wind turbine')
+    hub_height = Float(units = 'm', iotype='in', desc= 'hub height of wind turbine above ground / sea level')
+    altitude = Float(units = 'm', iotype='in', desc= 'altitude of wind plant')
+    air_density = Float(units = 'kg / (m * m * m)', iotype='in', desc= 'air density at wind plant site')
+    max_efficiency = Float(iotype='in', desc = 'maximum efficiency of rotor and drivetrain - at rated power') 
+    thrust_coefficient = Float(iotype='in', desc='thrust coefficient at rated power')
+    drivetrain_design = Enum('geared', ('geared', 'single_stage', 'multi_drive', 'pm_direct_drive'), iotype='in')
+
+    # Outputs
+    rated_wind_speed = Float(units = 'm / s', iotype='out', desc='wind speed for rated power')
+    rated_rotor_speed = Float(units = 'rpm', iotype='out', desc = 'rotor speed at rated power')
+    rotor_thrust = Float(iotype='out', units='N', desc='maximum thrust from rotor')    
+    rotor_torque = Float(iotype='out', units='N * m', desc = 'torque from rotor at rated power')    
+    power_curve = Array(iotype='out', units='kW', desc='total power after drivetrain losses')
+    wind_curve = Array(iotype='out', units='m/s', desc='wind curve associated with power curve')
+
+    def __init__(self, cache=None):
+        """
+        cache : PowerCurveCache, optional
+          the cache that is consulted and filled (default: a new one)
+        """
+
+        if cache is None:
+            cache = PowerCurveCache()
+        self.cache = cache
+
+        super(cached_power_curve_component, self).__init__()
+
+    def execute(self):
+        """
+        Looks the turbine up in the cache, and runs the aerodynamic and drivetrain sub-modules only if it isn't there
+        """
+
+        turbine = dict((name, getattr(self, name)) for name in PowerCurveCache.turbine_inputs)
+        key = self.cache.make_key(self.drivetrain_design, **turbine)
+        entry = self.cache.get(key)
+
+        if entry is None:
+            wind_curve, aero_power, rated_wind_speed, rated_rotor_speed, rotor_thrust, rotor_torque = \
+                aero_csm_batch(self.machine_rating, self.max_tip_speed, self.rotor_diameter, self.max_power_coefficient, \
+                               self.opt_tsr, self.cut_in_wind_speed, self.cut_out_wind_speed, self.hub_height, \
+                               self.altitude, self.air_density, self.max_efficiency, self.thrust_coefficient)
+            power, _, _ = drivetrain_losses(aero_power[0], self.machine_rating, self.drivetrain_design)
+            entry = self.cache.put(key, wind_curve, power, rated_wind_speed[0], rated_rotor_speed[0], rotor_thrust[0], \
+                                   rotor_torque[0])
+
+        self.wind_curve = entry['wind_curve']
+        self.power_curve = entry['power_curve']
+        self.rated_wind_speed = entry['rated_wind_speed']
+        self.rated_rotor_speed = entry['rated_rotor_speed']
+        self.rotor_thrust = entry['rotor_thrust']
+        self.rotor_torque = entry['rotor_torque']
@@ -49,6 +49,9 @@ class OWACcomp(Component):
         Args:
            owExe (str): full path to OpenWind executable
            scriptFile (str): path to XML script that OpenWind will run
+           timeout (float): seconds to wait for the results of one evaluation (None: no limit)
+           max_retries (int): number of times a failed evaluation is retried, restarting OpenWind
+           backoff (float): delay before the first retry [s] - doubled for each further retry
 
      """
 
@@ -67,7 +70,8 @@ class OWACcomp(Component):
     #array_efficiency = Float(0.0, iotype='out', desc='Array Efficiency')
     #array_losses     = Float(0.0, iotype='out', desc='Array losses')
     
-    def __init__(self, owExe, scriptFile=None, debug=False, stopOW=True, start_once=False, opt_log=False):
+    def __init__(self, owExe, scriptFile=None, debug=False, stopOW=True, start_once=False, opt_log=False,
+                 timeout=None, max_retries=2, backoff=1.0):
         """ Constructor for the OWACwrapped component """
 
         self.debug = debug
@@ -91,6 +95,10 @@ class OWACcomp(Component):
         self.start_once = start_once
         self.replace_turbine = False
         self.opt_log = opt_log
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.reportCache = utils.ReportCache(maxsize=4) # checkReport() reads a report once per change
         
         self.resname = '' # start with empty string
         
@@ -126,7 +134,12 @@ class OWACcomp(Component):
         #  ... other params ....
         
         # Try starting OpenWind here (if self.start_once is True)
+        self.proc = None # OpenWind is started by execute_async(), unless start_once
+        self.pid = None
+        self.firstRun = None
         if self.start_once:
+            # the first evaluation waits for the run OpenWind makes with the workbook positions
+            self.firstRun = acutils.sharedWatcher().expect(self.resname, acutils.resultsStamp(self.resname))
             self.proc = subprocess.Popen(self.command)
             self.pid = self.proc.pid
             if self.debug:
@@ -204,12 +217,31 @@ class OWACcomp(Component):
     def execute(self):
         """ Executes our component. """
 
+        run = self.execute_async()
+        if run is None:
+            return False
+        return self.finish_execute(run)
+
+    #------------------ 
+    
+    def execute_async(self, watcher=None):
+        """ Starts an evaluation without waiting for OpenWind and returns it as an acutils.ExtOptRun
+              - starts OpenWind (unless start_once) and writes the positions and notify files as
+                soon as OpenWind is ready for them
+              - call finish_execute(run) to wait for the results and set the outputs
+            Components with different workbook directories can be evaluated at the same time:
+              runs = dict((ow.execute_async(), ow) for ow in comps)
+              for run in acutils.as_completed(runs):
+                  runs[run].finish_execute(run)
+            Returns None if the evaluation can't be started
+        """
+
         if self.debug:
             sys.stderr.write("  In {0}.execute() {1}...\n".format(self.__class__, self.script_file))
         
         if (len(self.resname) < 1):
             sys.stderr.write('\n*** ERROR: OWAcomp results file name not assigned! (problem with script file?)\n\n')
-            return False
+            return None
 
         # Prepare input file here
         #   - write a new script file?
@@ -223,7 +255,7 @@ class OWACcomp(Component):
         if self.replace_turbine:
             if len(self.wt_layout.wt_list) < 1:
                 sys.stderr.write('\n*** ERROR ***  OWACcomp::execute(): no turbines in wt_layout!\n\n')
-                return False
+                return None
             if self.debug:
                 sys.stderr.write('Replacement turbine parameters:\n')
                 #sys.stderr.write('{:}\n'.format(turbfuncs.wtpc_dump(self.wt_layout.wt_list[0])))
@@ -244,61 +276,50 @@ class OWACcomp(Component):
             else:
                 sys.stderr.write('*** NO new turbine file written\n')
             
-        # Execute the component and save process ID
-        if not self.start_once:
-            self.proc = subprocess.Popen(self.command)
-            self.pid = self.proc.pid
-            if self.debug:
-                sys.stderr.write('Started OpenWind with pid {:}\n'.format(self.pid))
-                sys.stderr.write('  OWACComp: dummyVbl {:}\n'.format(self.dummyVbl))
-                #sys.stderr.write('Report Path: {:}\n'.format(self.rptpath))
-
-            # Watch for 'results.txt', meaning that OW has run once with the default locations 
-            
-            if self.debug:
-                sys.stderr.write('OWACComp waiting for {:} (first run -  positions unchanged)\n'.format(self.resname))
-            acutils.waitForNotify(watchFile=self.resname, path=self.dname, debug=False, callback=self.getCBvalue)
-
-        # Now OWac is waiting for a new position file
-        # Write new positions and notify file - this time it should use updated positions
+        # Start OpenWind (it runs once with the positions in the workbook), then write the new
+        #   positions and notify file when it is ready - results.txt is written to the same
+        #   directory as the *blb file
+        if self.start_once:
+            run = acutils.ExtOptRun(self.wt_layout.wt_positions, self.dname, proc=self.proc, ready=self.firstRun,
+                                    watcher=watcher, debug=self.debug)
+            self.firstRun = None
+            return run
+        if self.debug:
+            sys.stderr.write('OWACComp waiting for {:} (first run -  positions unchanged)\n'.format(self.resname))
+        return acutils.ExtOptRun(self.wt_layout.wt_positions, self.dname, launch=self.launchOW,
+                                 watcher=watcher, debug=self.debug)
 
-        acutils.writePositionFile(self.wt_layout.wt_positions, path=self.dname, debug=self.debug)
-        
-        # see if results.txt is there already
-        if os.path.exists(self.resname):
-            resmtime = os.path.getmtime(self.resname)
-            if self.debug:
-                sys.stderr.write('ModTime({:}): {:}\n'.format(self.resname, time.asctime(time.localtime(resmtime))))
-        else:
-            if self.debug:
-                sys.stderr.write('{:} does not exist yet\n'.format(self.resname))
-            
-        acutils.writeNotify(path=self.dname, debug=self.debug) # tell OW that we're ready for the next (only) iteration
+    #------------------ 
+    
+    def launchOW(self):
+        ''' Start the OpenWind process and save its process ID '''
         
-        # 'results.txt' is in the same directory as the *blb file
-        if os.path.exists(self.resname):
-            resNewmtime = os.path.getmtime(self.resname)
-            if resNewmtime > resmtime: # file has changed
-                if self.debug:
-                    sys.stderr.write('results.txt already updated')
-            else:
-                acutils.waitForNotify(watchFile=self.resname, path=self.dname, callback=self.getCBvalue, debug=self.debug)
-        else:
-            if self.debug:
-                sys.stderr.write('OWACComp waiting for {:} (modified positions)\n'.format(self.resname))
-            acutils.waitForNotify(watchFile=self.resname, path=self.dname, callback=self.getCBvalue, debug=self.debug)
+        self.proc = subprocess.Popen(self.command)
+        self.pid = self.proc.pid
+        if self.debug:
+            sys.stderr.write('Started OpenWind with pid {:}\n'.format(self.pid))
+            sys.stderr.write('  OWACComp: dummyVbl {:}\n'.format(self.dummyVbl))
+        return self.proc
 
+    #------------------ 
+    
+    def finish_execute(self, run, timeout=None):
+        """ Waits for an evaluation started by execute_async() and sets the outputs """
+        
         # Parse output file 
         #    Enterprise OW writes the report file specified in the script BUT
         #    Academic OW writes 'results.txt' (which doesn't have as much information)
         
-        netEnergy, netNRGturb, grossNRGturb = acutils.parseACresults(fname=self.resname)
-        if netEnergy is None:
-            sys.stderr.write("Error reading results file\n")
-            if self.debug:
-                sys.stderr.write('Stopping OpenWind with pid {:}\n'.format(self.pid))
-            self.proc.terminate()
-            return False
+        # A run that times out or whose OpenWind exits is retried with a new OpenWind process,
+        #   after a delay that doubles with each attempt
+        if timeout is None:
+            timeout = self.timeout
+        def restart(failed):
+            return acutils.ExtOptRun(failed.wt_positions, self.dname, launch=self.launchOW,
+                                     watcher=failed.watcher, debug=self.debug)
+        result = acutils.retryRun(run, restart, self.terminateOW, timeout=timeout, max_retries=self.max_retries,
+                                  backoff=self.backoff, debug=self.debug)
+        netEnergy, netNRGturb, grossNRGturb = result
         
         # Set the output variables
         #   - array_aep is not available from Academic 'results.txt' file
@@ -311,7 +332,7 @@ class OWACcomp(Component):
         # Log optimization values
         if self.opt_log:
             self.olfh.write('{:3d} G {:.4f} N {:.4f} XY '.format(self.exec_count, self.gross_aep, self.net_aep))
-            for ii in range(len(wt_positions)):
+            for ii in range(len(self.wt_layout.wt_positions)):
                 self.olfh.write('{:8.1f} {:9.1f} '.format(self.wt_layout.wt_positions[ii][0], self.wt_layout.wt_positions[ii][1]))
             self.olfh.write('\n')
                 
@@ -349,10 +370,10 @@ class OWACcomp(Component):
     #------------------ 
     
     def terminateOW(self):
-        ''' Terminate the OpenWind process '''
+        ''' Terminate the OpenWind process (killing it if it doesn't respond) '''
         if self.debug:
             sys.stderr.write('Stopping OpenWind with pid {:}\n'.format(self.pid))
-        self.proc.terminate()
+        acutils.killProcess(self.proc)
 
     #------------------ 
     
@@ -362,15 +383,16 @@ class OWACcomp(Component):
         fname = self.scriptDict['rptpath']
         if self.debug:
             sys.stderr.write('checkReport : {:}\n'.format(fname))
-        fh = open(fname, 'r')
-        for line in fh.readlines():
+        # an unchanged report is not read again (see utils.ReportCache)
+        result = utils.rdReportTable(fname, cache=self.reportCache)
+        if result is None:
+            return
+        for line in result[3].errors:
             if line.startswith('Failed to find and replace turbine type'):
                 sys.stderr.write('\n*** ERROR: turbine replacement operation failed\n')
                 sys.stderr.write('    Replace {:}\n'.format(self.scriptDict['replturbname']))
                 sys.stderr.write('    with    {:}\n'.format(self.scriptDict['replturbpath']))
                 sys.stderr.write('\n')
-                
-        fh.close()
         
 #------------------------------------------------------------------
 
@@ -11,6 +11,14 @@
     - owIniSet(): get/set value of ExternalOptimiser in *.ini file
     
     - class MyNotifyMLHandler(FileSystemEventHandler) - watch for changes in file
+    - class ResultsWatcher(FileSystemEventHandler) - long-lived watcher for results files
+    - class ResultsWaiter(object) - one pending results file
+    - class ExtOptRun(object) - one asynchronous evaluation (future)
+    - class CachedRun(object) - an evaluation whose results were already known (e.g. in a LayoutCache)
+    - as_completed(runs, timeout=None) - collect asynchronous evaluations as they finish
+    - killProcess(proc, grace=5.0) - terminate (then kill) an OpenWind process
+    - class OWRunError(RuntimeError) - an evaluation failed (with timing data)
+    - retryRun(run, restart, stop, ...) - wait for an ExtOptRun, retrying it if it fails
     - class WTPosFile(WEFileIO) - read turbine positions from text file
     - class WTWkbkFile(object)  - read turbine positions from OpenWind workbook
     
@@ -19,9 +27,20 @@
     2015 05 22 : watchdog is no longer part of the OpenMDAO distribution so you'll
       need to install it separately
       
+    2026 10 18 : added ResultsWatcher - one observer for all workbook directories, instead
+      of a new Observer thread for every waitForNotify() call
+    2026 10 18 : added ExtOptRun and as_completed() for asynchronous evaluations
+    2026 10 18 : added OWRunError and killProcess() - ExtOptRun records timing and failure reason
+    2026 10 18 : added CachedRun
+    2026 10 18 : ExtOptRun(ready=waiter) - positions for an OpenWind that was started elsewhere
+      are written once its current run is done
+      
 '''
 
 import sys, os, time
+import atexit
+import threading
+import Queue
 import numpy as np
 
 # Use watchdog from the OpenMDAO environment
@@ -33,9 +52,12 @@ if vepath is None:
     exit()
     
 from watchdog.observers import Observer
+from watchdog.observers.polling import PollingObserver
 from watchdog.events import FileSystemEventHandler
 
 import plant_energyse.openwind.getworkbookvals as gwb
+import plant_energyse.openwind.openWindUtils as utils
+from plant_energyse.openwind.owFollow import parseACtext
 
 # FUSED-Wind imports
 
@@ -62,7 +84,6 @@ class MyNotifyMLHandler(FileSystemEventHandler):
         self.callback = callback
         
     def on_modified(self, event):
-        print event.src_path
         if os.path.basename(event.src_path) == os.path.basename(self.watchFile):
             if self.debug:
                 sys.stderr.write('on_modified: Detected modified {:} file\n'.format(self.watchFile))
@@ -111,28 +132,538 @@ class MyNotifyMLHandler(FileSystemEventHandler):
     #    if event.src_path.endswith('notifyML.txt'):
     #        print 'Deleted notifyML.txt file!'
 
-def waitForNotify(watchFile='notifyML.txt', path='.', callback=None, debug=False):
+#---------------------------------------------
+
+# The watcher observes each directory once (inotify where available, polling otherwise) and
+#   wakes the waiters for a file when it changes. Waiters also re-check the file every 'poll'
+#   seconds, so a missed or coalesced event only costs one polling interval.
+
+class ResultsWaiter(object):
+    ''' a results file that is expected to change
+          fname    : path of the results file
+          oldStamp : (size, mtime) stamp of the file before the change (None if it didn't exist)
+        The file counts as changed once its stamp differs from oldStamp and it parses
+          as a complete results file (see owFollow.parseACtext())
+    '''
+    
+    def __init__(self, fname, oldStamp=None, poll=1.0):
+        self.fname = fname
+        self.oldStamp = oldStamp
+        self.poll = poll
+        self.result = None # (netEnergy, netNRG, grossNRG) once done
+        self.event = threading.Event()
+        self.lastSeen = None
+        self.lock = threading.Lock()
+        self.callbacks = []
+        self.cancelled = False
+        
+    def check(self):
+        ''' read the file if its stamp has changed - returns True if the results are complete '''
+        
+        with self.lock:
+            if self.event.is_set():
+                return not self.cancelled
+            newStamp = resultsStamp(self.fname)
+            if newStamp is not None and newStamp != self.oldStamp:
+                try:
+                    fh = open(self.fname, 'r')
+                    text = fh.read()
+                    fh.close()
+                except IOError:
+                    text = ''
+                # a missing last newline is accepted once the file has stopped changing
+                self.result = parseACtext(text, unterminated=(newStamp == self.lastSeen))
+            self.lastSeen = newStamp
+            if self.result is None:
+                return False
+            self.event.set()
+            callbacks = self.callbacks
+            self.callbacks = []
+            
+        # callbacks run outside the lock (they may expect other files)
+        for callback in callbacks:
+            callback(self)
+        return True
+    
+    def done(self):
+        return self.event.is_set()
+    
+    def cancel(self):
+        ''' stop waiting - callbacks that haven't run are dropped and wait() returns None '''
+        
+        with self.lock:
+            self.cancelled = True
+            self.callbacks = []
+            self.event.set()
+    
+    def add_done_callback(self, callback):
+        ''' call callback(waiter) when the results are complete (at once, if they already are)
+            Callbacks run in the thread that detects the change - usually the watcher's
+        '''
+        
+        with self.lock:
+            if not self.event.is_set():
+                self.callbacks.append(callback)
+                return
+        callback(self)
+    
+    def wait(self, timeout=None):
+        ''' wait for the results - returns (netEnergy, netNRG, grossNRG), or None on timeout '''
+        
+        t0 = time.time()
+        while not self.check():
+            if self.cancelled:
+                return None
+            remaining = self.poll
+            if timeout is not None:
+                remaining = min(remaining, t0 + timeout - time.time())
+                if remaining <= 0:
+                    return None
+            self.event.wait(remaining)
+        return self.result
+
+class ResultsWatcher(FileSystemEventHandler):
+    ''' long-lived watcher for OpenWind results files in any number of directories
+    
+          waiter = watcher.expect(resname, oldStamp) # before telling OpenWind to run
+          ...
+          netEnergy, netNRG, grossNRG = waiter.wait(timeout)
+          
+        Each directory is scheduled with the observer once, the first time a file in it is expected.
+        If inotify can't watch a directory (e.g. the watch limit is reached), that directory is polled.
+        polling=True polls all directories.
+        A sweeper thread re-checks pending waiters every 'poll' seconds, so done callbacks run
+        even if an event is missed and nobody is blocked in wait().
+    '''
+    
+    def __init__(self, polling=False, poll=1.0, debug=False):
+        self.polling = polling
+        self.poll = poll
+        self.debug = debug
+        self.observer = None
+        self.pollingObserver = None
+        self.watched = {} # directory : (observer, watch, inode)
+        self.waiters = {} # absolute path : list of ResultsWaiter
+        self.lock = threading.Lock()
+        self.sweeper = None
+        self.stopped = threading.Event()
+        
+    def _observer(self, polling):
+        if polling:
+            if self.pollingObserver is None:
+                self.pollingObserver = PollingObserver(timeout=self.poll)
+                self.pollingObserver.start()
+            return self.pollingObserver
+        if self.observer is None:
+            self.observer = Observer()
+            self.observer.start()
+        return self.observer
+        
+    def watch(self, path):
+        ''' start observing directory path (does nothing if it is already observed)
+            A directory that has been deleted and re-created since it was scheduled is scheduled again
+        '''
+        
+        path = os.path.abspath(path)
+        inode = os.stat(path).st_ino
+        with self.lock:
+            if path in self.watched:
+                observer, watch, oldInode = self.watched[path]
+                if inode == oldInode:
+                    return
+                try:
+                    observer.unschedule(watch)
+                except (KeyError, OSError):
+                    pass
+            try:
+                observer = self._observer(self.polling)
+                watch = observer.schedule(self, path=path, recursive=False)
+            except OSError:
+                sys.stderr.write('\n*** WARNING: ResultsWatcher polling {:} - it cannot be watched for events\n'.format(path))
+                observer = self._observer(True)
+                watch = observer.schedule(self, path=path, recursive=False)
+            self.watched[path] = (observer, watch, inode)
+        if self.debug:
+            sys.stderr.write('ResultsWatcher: watching {:}\n'.format(path))
+    
+    def expect(self, fname, oldStamp=None):
+        ''' register a results file that is about to change and return its ResultsWaiter
+              oldStamp : stamp of the file before the change (see resultsStamp())
+        '''
+        
+        fname = os.path.abspath(fname)
+        self.watch(os.path.dirname(fname))
+        waiter = ResultsWaiter(fname, oldStamp, poll=self.poll)
+        with self.lock:
+            self.waiters.setdefault(fname, []).append(waiter)
+            if self.sweeper is None:
+                self.stopped.clear()
+                self.sweeper = threading.Thread(target=self._sweep, name='ResultsWatcher sweeper')
+                self.sweeper.daemon = True
+                self.sweeper.start()
+        waiter.check() # the file may have changed before it was registered
+        return waiter
+        
+    def _pending(self, path=None):
+        # pending waiters for path (all paths if None) - drops finished waiters
+        with self.lock:
+            paths = self.waiters.keys() if path is None else [path]
+            pending = []
+            for p in paths:
+                waiters = self.waiters.get(p)
+                if waiters is None:
+                    continue
+                waiters[:] = [waiter for waiter in waiters if not waiter.done()]
+                if len(waiters) == 0:
+                    del self.waiters[p]
+                pending.extend(waiters)
+        return pending
+        
+    def _sweep(self):
+        while not self.stopped.wait(self.poll):
+            for waiter in self._pending():
+                waiter.check()
+        
+    def on_any_event(self, event):
+        if event.is_directory and event.event_type == 'deleted':
+            # a watched directory was removed - its watch has stopped, so reschedule it if it is re-created
+            path = os.path.abspath(event.src_path)
+            with self.lock:
+                if path in self.watched:
+                    observer, watch, inode = self.watched[path]
+                    self.watched[path] = (observer, watch, None)
+            return
+        for path in (event.src_path, getattr(event, 'dest_path', None)):
+            if path is None:
+                continue
+            for waiter in self._pending(os.path.abspath(path)):
+                waiter.check()
+                
+    def stop(self):
+        ''' stop the observer and sweeper threads '''
+        
+        self.stopped.set()
+        if self.sweeper is not None:
+            self.sweeper.join()
+            self.sweeper = None
+        for observer in (self.observer, self.pollingObserver):
+            if observer is not None:
+                try:
+                    observer.stop()
+                    observer.join()
+                except OSError:
+                    pass # inotify already closed (e.g. at interpreter exit)
+        self.observer = None
+        self.pollingObserver = None
+        self.watched = {}
+
+_watcher = None
+
+def sharedWatcher():
+    ''' the ResultsWatcher shared by waitForNotify() and the OpenWind components (started on first use) '''
+    
+    global _watcher
+    if _watcher is None:
+        _watcher = ResultsWatcher()
+        atexit.register(_watcher.stop)
+    return _watcher
+
+def resultsStamp(fname):
+    ''' (size, mtime) stamp of a results file, or None if it doesn't exist '''
+    
+    try:
+        return utils.fileStamp(fname)
+    except OSError:
+        return None
+
+def waitForNotify(watchFile='notifyML.txt', path='.', callback=None, debug=False, oldStamp='current', timeout=None):
     ''' wait for Openwind to write 'notifyML.txt' (or other watchFile)
     
         2014 04 10: OW doesn't write notifyML.txt, so usually we watch for 'results.txt'
                   : added path argument so we can watch folder that contains workbook
+        2026 10 18: uses the shared ResultsWatcher instead of starting an Observer
+                  : waits until the stamp of watchFile differs from oldStamp and it is a complete
+                    results file. oldStamp is the stamp from resultsStamp() taken before OpenWind
+                    was told to run ('current': the stamp when waitForNotify() is called)
+                  : returns netEnergy (None on timeout) - callback(netEnergy) is called as before
     '''
     
-    observer = Observer()
-    event_handler = MyNotifyMLHandler(observer, watchFile, callback=callback, debug=debug)
-    observer.schedule(event_handler, path=path, recursive=False)
-    observer.start()
+    if os.path.dirname(watchFile) == '':
+        watchFile = os.path.join(path, watchFile)
+    if oldStamp == 'current':
+        oldStamp = resultsStamp(watchFile)
 
     if debug:
-        sys.stderr.write('\nwaitForNotify: waiting for {:} in {:}\n  Hit Cntl-C to break\n'.format(watchFile, path))
+        sys.stderr.write('\nwaitForNotify: waiting for {:} in {:}\n'.format(watchFile, path))
     
-    # What was the purpose of this loop in example code? Works fine without it
-    #try:
-    #    while True:
-    #        time.sleep(1)
-    #except KeyboardInterrupt:
-    #    observer.stop()
-    observer.join()
+    result = sharedWatcher().expect(watchFile, oldStamp).wait(timeout)
+    if result is None:
+        return None
+    netEnergy = result[0]
+    if debug:
+        sys.stderr.write('{:} : {:} turbines - {:.1f} kWh\n'.format(os.path.basename(watchFile), len(result[1]), netEnergy))
+    if callback is not None:
+        callback(netEnergy)
+    return netEnergy
+
+#--------------
+
+# Asynchronous evaluations: Python 2 has no asyncio, so an evaluation is a future whose steps
+#   run as done callbacks of ResultsWaiters. One controller thread can start evaluations in many
+#   workbook directories and collect them with as_completed(), without a thread per run.
+
+class ExtOptRun(object):
+    ''' one evaluation of wt_positions by OpenWind in external optimiser mode, in directory dname
+
+          launch : optional function that starts OpenWind and returns its Popen object -
+                   the positions are written once OpenWind has written the results of its first run.
+                   If None, OpenWind is already running (proc is then used only to check that it is
+                   still alive) and is waiting for positions, or will be once the ResultsWaiter
+                   'ready' of the run it is carrying out is done
+          
+          done(), result(timeout=None) -> (netEnergy, netNRG, grossNRG) or None on timeout,
+          add_done_callback(callback) -> callback(run)
+          
+        If the positions or the notify file can't be written, the run is done at once with
+          failure 'error' (the exception is kept in 'error')
+    '''
+    
+    def __init__(self, wt_positions, dname, launch=None, proc=None, ready=None, watcher=None, debug=False):
+        self.wt_positions = wt_positions
+        self.dname = dname
+        self.resname = os.path.join(dname, 'results.txt')
+        self.proc = proc
+        self.debug = debug
+        if watcher is None:
+            watcher = sharedWatcher()
+        self.watcher = watcher
+        
+        self.waiter = None
+        self.event = threading.Event()
+        self.lock = threading.Lock()
+        self.callbacks = []
+        self.netEnergy = self.netNRG = self.grossNRG = None
+        
+        # timing and failure data
+        self.t_start = time.time()
+        self.t_ready = None # OpenWind was ready for the positions
+        self.t_done = None
+        self.failure = None # 'exited', 'timeout' or 'error' if result() failed
+        self.error = None   # exception raised while writing the positions
+        self.cancelled = False
+        
+        if launch is None and ready is None:
+            self._notify(None)
+        elif launch is None:
+            self.waiter = ready
+            ready.add_done_callback(self._notify)
+        else:
+            oldStamp = resultsStamp(self.resname)
+            self.proc = launch()
+            self.waiter = watcher.expect(self.resname, oldStamp)
+            self.waiter.add_done_callback(self._notify)
+        
+    def _notify(self, firstRun):
+        # OpenWind is waiting for positions - write them and the notify file
+        if self.cancelled:
+            return
+        self.t_ready = time.time()
+        try:
+            writePositionFile(self.wt_positions, path=self.dname, debug=self.debug)
+            oldStamp = resultsStamp(self.resname)
+            writeNotify(path=self.dname, debug=self.debug)
+            self.waiter = self.watcher.expect(self.resname, oldStamp)
+        except Exception as e:
+            # this may run on the watcher's thread, where nobody would see the exception
+            sys.stderr.write('ExtOptRun: could not start the evaluation in {:}: {:}\n'.format(self.dname, e))
+            self.failure = 'error'
+            self.error = e
+            self._finish()
+            return
+        if self.cancelled: # cancelled while the files were written
+            self.waiter.cancel()
+        self.waiter.add_done_callback(self._done)
+        
+    def _done(self, waiter):
+        self.netEnergy, self.netNRG, self.grossNRG = waiter.result
+        self._finish()
+        
+    def _finish(self):
+        self.t_done = time.time()
+        with self.lock:
+            self.event.set()
+            callbacks = self.callbacks
+            self.callbacks = []
+        for callback in callbacks:
+            callback(self)
+    
+    def done(self):
+        return self.event.is_set()
+        
+    def cancel(self):
+        ''' abandon the evaluation (e.g. before retrying it with a new OpenWind process), so that
+              a later results file doesn't trigger its remaining steps '''
+        self.cancelled = True
+        if self.waiter is not None:
+            self.waiter.cancel()
+        
+    def running(self):
+        ''' False if the OpenWind process has exited '''
+        return self.proc is None or self.proc.poll() is None
+        
+    def elapsed(self):
+        ''' seconds since the evaluation started (until it finished, if it has) '''
+        if self.t_done is not None:
+            return self.t_done - self.t_start
+        return time.time() - self.t_start
+        
+    def returncode(self):
+        if self.proc is None:
+            return None
+        return self.proc.poll()
+        
+    def add_done_callback(self, callback):
+        with self.lock:
+            if not self.event.is_set():
+                self.callbacks.append(callback)
+                return
+        callback(self)
+        
+    def result(self, timeout=None):
+        ''' wait for the evaluation - returns (netEnergy, netNRG, grossNRG), or None on timeout
+              or if OpenWind exits without writing results or the positions can't be written '''
+        
+        t0 = time.time()
+        while not self.event.is_set():
+            running = self.running() # before the check, so results written just before exiting are seen
+            if self.waiter is not None:
+                self.waiter.check()
+            if self.event.is_set():
+                break
+            if not running:
+                self.failure = 'exited'
+                return None
+            wait = self.watcher.poll
+            if timeout is not None:
+                wait = min(wait, t0 + timeout - time.time())
+                if wait <= 0:
+                    self.failure = 'timeout'
+                    return None
+            self.event.wait(wait)
+        if self.failure == 'error':
+            return None
+        return self.netEnergy, self.netNRG, self.grossNRG
+
+class OWRunError(RuntimeError):
+    ''' an OpenWind evaluation failed on every attempt
+          reason   : 'timeout', 'exited' or 'error' (of the last attempt)
+          resname  : results file that was expected
+          attempts : list of (reason, elapsed seconds, OpenWind return code) for every attempt
+          elapsed  : total seconds, including backoff delays
+    '''
+    
+    def __init__(self, resname, attempts, elapsed):
+        self.resname = resname
+        self.attempts = attempts
+        self.elapsed = elapsed
+        self.reason = attempts[-1][0] if len(attempts) > 0 else None
+        msg = 'OpenWind evaluation for {:} failed after {:d} attempt(s) in {:.1f} s: '.format(resname, len(attempts), elapsed)
+        msg += ', '.join(['{:} after {:.1f} s (return code {:})'.format(*a) for a in attempts])
+        super(OWRunError, self).__init__(msg)
+
+def retryRun(run, restart, stop, timeout=None, max_retries=0, backoff=1.0, debug=False):
+    ''' wait for ExtOptRun run and return its result (netEnergy, netNRG, grossNRG)
+        A run that times out, whose OpenWind exits or that fails is cancelled and stop() is called
+          to end its OpenWind. It is then retried, after a delay of backoff seconds that doubles with
+          each attempt, with the run returned by restart(run) - at most max_retries times.
+        Raises OWRunError if every attempt fails (its elapsed time counts from the start of 'run')
+    '''
+    
+    t0 = run.t_start
+    attempts = []
+    while True:
+        result = run.result(timeout)
+        if result is not None:
+            return result
+        run.cancel()
+        attempts.append((run.failure, run.elapsed(), run.returncode()))
+        sys.stderr.write('\n*** ERROR: OpenWind in {:} {:} after {:.1f} s (attempt {:d} of {:d})\n'.format(run.dname,
+            {'timeout' : 'timed out', 'error' : 'failed'}.get(run.failure, 'exited'), run.elapsed(), len(attempts), max_retries+1))
+        stop()
+        if len(attempts) > max_retries:
+            raise OWRunError(run.resname, attempts, time.time() - t0)
+        delay = backoff * 2**(len(attempts)-1)
+        if debug:
+            sys.stderr.write('Restarting OpenWind in {:.1f} s\n'.format(delay))
+        time.sleep(delay)
+        run = restart(run)
+
+def killProcess(proc, grace=5.0):
+    ''' terminate proc, and kill it if it hasn't exited after 'grace' seconds
+        (a hung OpenWind may ignore terminate()) '''
+    
+    if proc is None or proc.poll() is not None:
+        return
+    try:
+        proc.terminate()
+        t0 = time.time()
+        while proc.poll() is None and time.time() - t0 < grace:
+            time.sleep(0.05)
+        if proc.poll() is None:
+            proc.kill()
+        proc.wait()
+    except OSError:
+        pass # already gone
+
+class CachedRun(object):
+    ''' an evaluation of wt_positions that is done before it starts: results are
+          (netEnergy, netNRG, grossNRG) from a cache. No OpenWind process is involved, but it can
+          be used wherever an ExtOptRun is (as_completed(), finish_execute())
+    '''
+    
+    def __init__(self, wt_positions, results):
+        self.wt_positions = wt_positions
+        self.netEnergy, self.netNRG, self.grossNRG = results
+        self.proc = None
+        self.t_start = self.t_ready = self.t_done = time.time()
+        self.failure = None
+        
+    def done(self):
+        return True
+        
+    def cancel(self):
+        pass
+        
+    def running(self):
+        return True
+        
+    def elapsed(self):
+        return 0.0
+        
+    def returncode(self):
+        return None
+        
+    def add_done_callback(self, callback):
+        callback(self)
+        
+    def result(self, timeout=None):
+        return self.netEnergy, self.netNRG, self.grossNRG
+
+def as_completed(runs, timeout=None):
+    ''' yield ExtOptRuns (or any objects with add_done_callback()) as they complete
+        Returns after 'timeout' seconds without a completion, or when all runs are done
+    '''
+    
+    finished = Queue.Queue()
+    runs = list(runs)
+    for run in runs:
+        run.add_done_callback(finished.put)
+    for i in range(len(runs)):
+        try:
+            # a timeout on get() keeps Cntl-C working
+            yield finished.get(True, 1.0e6 if timeout is None else timeout)
+        except Queue.Empty:
+            return
 
 #--------------
     
@@ -213,14 +744,18 @@ def writeNotify(path=None, debug=False):
     
 #--------------
     
-def parseACresults(fname='results.txt', debug=False):
+def parseACresults(fname='results.txt', debug=False, cache=None):
     # read/parse OpenWind optimization output file
     # returns:
     #   netEnergy : scalar value in kWh
     #   netNRGturb[] : net energy by turbine
     #   grossNRGturb[] : gross energy by turbine
     # debug=True : dumps contents of fname to STDOUT
+    # cache : optional openWindUtils.ReportCache - an unchanged file is only parsed once
       
+    if cache is not None:
+        return cache.get(fname, parseACresults, debug=debug)
+    
     try:
         fh = open(fname,'r')
     except:
@@ -411,7 +946,7 @@ def main():
     sys.stderr.write('Should have created empty owNotify.txt\n')
     
     sys.stderr.write('\nTesting waitForNotify\n')
-    sys.stderr.write("*** When 'Enter Cntl-C to break' message appears,\n enter 'touch notifyML.txt' from another command shell\n")
+    sys.stderr.write("*** When the 'waiting' message appears, copy an OpenWind results.txt file\n to notifyML.txt from another command shell\n")
     waitForNotify(debug=True)
     
     wtp = WTPosFile(filename='positions.txt')
@@ -89,8 +89,8 @@ class OWwrapped(ExternalCode):
         dscr = rdScript(self.command[1], debug=self.debug) # get output file name from script
         rptpath = dscr['rptpath']
         
-        self.gross_aep, self.array_aep, self.net_aep, owTurbs = utils.rdReport(rptpath, debug=self.debug) 
-        self.turbine_number = len(owTurbs)
+        self.gross_aep, self.array_aep, self.net_aep, owTable = utils.rdReportTable(rptpath, debug=self.debug) 
+        self.turbine_number = len(owTable)
         
         # Set the output variables
         self.array_efficiency = self.array_aep / self.gross_aep        
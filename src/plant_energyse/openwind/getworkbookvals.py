@@ -15,6 +15,7 @@
 # (should have more error checking)
 
 # 2014 10 03 : returning ttypes from getTurbPos()
+# 2026 10 18 : getTurbPos() reads positions and types from a TurbineResultTable
 
 import sys, os
 import openWindUtils
@@ -52,14 +53,9 @@ def getTurbPos(workbook, owexe, delFiles=True):
     
     # Parse output and return
     
-    gross_aep, array_aep, net_aep, owTrbs = openWindUtils.rdReport(rpath)
-    nturb = len(owTrbs)
-    xy = [[0,0] for i in range(nturb)]
-    ttypes = ['none' for i in range(nturb)]
-    for i in range(nturb):
-        xy[i][0] = owTrbs[i].x
-        xy[i][1] = owTrbs[i].y
-        ttypes[i] = owTrbs[i].ttype
+    gross_aep, array_aep, net_aep, owTable = openWindUtils.rdReportTable(rpath)
+    xy = owTable.xy().tolist()
+    ttypes = owTable.ttypes()
 
     if delFiles:
         try:
@@ -92,7 +88,7 @@ def getEC(workbook, owexe, delFiles=True):
     
     # Parse output and return
     
-    gross_aep, array_aep, net_aep, owTrbs = openWindUtils.rdReport(rpath)
+    gross_aep, array_aep, net_aep, owTable = openWindUtils.rdReportTable(rpath)
     
     if delFiles:
         try:
@@ -26,6 +26,12 @@
     
   example() runs OWcomp.execute() 3 times, moving and modifying the turbines each time
   
+  2026 10 18: optional cache (an owLayoutCache.LayoutCache) - execute() returns the cached
+    results of a layout that has been evaluated before without running OpenWind
+    (execute_async() returns an acutils.CachedRun for it, which finish_execute() accepts)
+  2026 10 18: optional constraints (an owConstraints.LayoutConstraints) - layouts that violate
+    them are rejected (or repaired, with repair=True) before any files are written
+  
 '''
 
 import os.path
@@ -36,6 +42,8 @@ from lxml import etree
 
 import academic.owAcademicUtils as acutils
 import plant_energyse.openwind.openWindUtils as utils
+import plant_energyse.openwind.owLayoutCache as owLayoutCache
+import plant_energyse.openwind.owConstraints as owConstraints
 import plant_energyse.openwind.rwScriptXML as rwScriptXML
 import plant_energyse.openwind.rwTurbXML as rwTurbXML
 import plant_energyse.openwind.turbfuncs as turbfuncs
@@ -59,6 +67,13 @@ class OWcomp(Component):
         Args:
            owExe (str): full path to OpenWind executable
            scriptFile (str): path to XML script that OpenWind will run
+           timeout (float): seconds to wait for the results of one evaluation (None: no limit)
+           max_retries (int): number of times a failed evaluation is retried, restarting OpenWind
+           backoff (float): delay before the first retry [s] - doubled for each further retry
+           cache (LayoutCache): optional cache of layout evaluations, keyed on the positions (rounded),
+                                the script and the replacement turbine
+           constraints (LayoutConstraints): optional spacing/boundary/exclusion constraints on wt_positions
+           repair (bool): move turbines to satisfy the constraints, instead of raising LayoutConstraintError
 
      """
 
@@ -78,7 +93,8 @@ class OWcomp(Component):
     #array_losses     = Float(0.0, iotype='out', desc='Array losses')
     
     def __init__(self, owExe, scriptFile=None, extOpt=False, debug=False, 
-      stopOW=True, start_once=False, opt_log=False):
+      stopOW=True, start_once=False, opt_log=False, timeout=None, max_retries=2, backoff=1.0, cache=None,
+      constraints=None, repair=False):
 
         """ Constructor for the OWwrapped component """
 
@@ -103,7 +119,16 @@ class OWcomp(Component):
         self.start_once = start_once
         self.replace_turbine = False
         self.opt_log = opt_log
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.reportCache = utils.ReportCache(maxsize=4) # checkReport() reads a report once per change
         self.extOpt = extOpt
+        self.cache = cache
+        self.constraints = constraints
+        self.repair = repair
+        self.cacheTag = None
+        self.netNRGturb = self.grossNRGturb = None
         
         self.resname = '' # start with empty string
         
@@ -122,6 +147,8 @@ class OWcomp(Component):
                 sys.stderr.write('Script File Contents:\n')
                 for k in self.scriptDict.keys():
                     sys.stderr.write('  {:12s} {:}\n'.format(k,self.scriptDict[k]))
+            if self.cache is not None:
+                self.cacheTag = owLayoutCache.scriptTag(self.script_file)
         
         # Log all optimization settings?
         if self.opt_log:
@@ -139,7 +166,12 @@ class OWcomp(Component):
         #  ... other params ....
         
         # Try starting OpenWind here (if self.start_once is True)
+        self.proc = None # OpenWind is started by execute_async(), unless start_once
+        self.pid = None
+        self.firstRun = None
         if self.start_once:
+            # the first evaluation waits for the run OpenWind makes with the workbook positions
+            self.firstRun = acutils.sharedWatcher().expect(self.resname, acutils.resultsStamp(self.resname))
             self.proc = subprocess.Popen(self.command)
             self.pid = self.proc.pid
             if self.debug:
@@ -217,12 +249,76 @@ class OWcomp(Component):
     def execute(self):
         """ Executes our component. """
 
+        run = self.execute_async()
+        if run is None:
+            return False
+        self.finish_execute(run)
+
+    #------------------
+    
+    def check_layout(self):
+        """ Applies the constraints to wt_layout.wt_positions - raises owConstraints.LayoutConstraintError
+              for a layout that violates them, or moves its turbines if self.repair is set """
+        
+        if self.constraints is None:
+            return
+        msgs = self.constraints.violations(self.wt_layout.wt_positions)
+        if len(msgs) == 0:
+            return
+        if not self.repair:
+            raise owConstraints.LayoutConstraintError(msgs)
+        if self.debug:
+            sys.stderr.write('OWcomp: repairing layout ({:d} violations)\n'.format(len(msgs)))
+        self.wt_layout.wt_positions = self.constraints.repair(self.wt_layout.wt_positions)
+    
+    def cache_key(self, wt_positions=None):
+        """ LayoutCache key of wt_positions (default: the current positions) and the replacement turbine """
+        
+        if wt_positions is None:
+            wt_positions = self.wt_layout.wt_positions
+        parts = [self.cacheTag]
+        if self.replace_turbine and len(self.wt_layout.wt_list) > 0:
+            parts.append(self.replacement_turbine_xml())
+        return self.cache.key(wt_positions, *parts)
+
+    def replacement_turbine_xml(self):
+        """ OWTG file contents for the first turbine in wt_layout """
+        
+        return turbfuncs.wtpc_to_owtg(self.wt_layout.wt_list[0], 
+                                      trbname='ReplTurb', 
+                                      desc='OWcomp replacement turbine')
+
+    #------------------ 
+    
+    def execute_async(self, watcher=None):
+        """ Starts an evaluation without waiting for OpenWind and returns it as an acutils.ExtOptRun
+              - starts OpenWind (unless start_once) and writes the positions and notify files as
+                soon as OpenWind is ready for them
+              - call finish_execute(run) to wait for the results and set the outputs
+            Components with different workbook directories can be evaluated at the same time:
+              runs = dict((ow.execute_async(), ow) for ow in comps)
+              for run in acutils.as_completed(runs):
+                  runs[run].finish_execute(run)
+            With a cache, a layout that has been evaluated before returns an acutils.CachedRun
+              without starting OpenWind
+            Returns None if the evaluation can't be started
+        """
+
         if self.debug:
             sys.stderr.write("In {0}.execute() {1}...\n".format(self.__class__, self.script_file))
         
+        self.check_layout()
         if (len(self.resname) < 1):
             sys.stderr.write('\n*** ERROR: OWcomp results file name not assigned! (problem with script file?)\n\n')
-            return False
+            return None
+
+        if self.cache is not None:
+            key = self.cache_key()
+            cached = self.cache.get(key)
+            if cached is not None:
+                if self.debug:
+                    sys.stderr.write('OWcomp: cached results for layout {:}\n'.format(key))
+                return acutils.CachedRun(self.wt_layout.wt_positions, cached)
 
         # Prepare input file here
         #   - write a new script file?
@@ -236,16 +332,14 @@ class OWcomp(Component):
         if self.replace_turbine:
             if len(self.wt_layout.wt_list) < 1:
                 sys.stderr.write('\n*** ERROR ***  OWcomp::execute(): no turbines in wt_layout!\n\n')
-                return False
+                return None
             if self.debug:
                 sys.stderr.write('Replacement turbine parameters:\n')
                 #sys.stderr.write('{:}\n'.format(turbfuncs.wtpc_dump(self.wt_layout.wt_list[0])))
                 sys.stderr.write('{:}\n'.format(turbfuncs.wtpc_dump(self.wt_layout.wt_list[0], shortFmt=True)))
                 #sys.stderr.write('{:}\n'.format(wtlDump(self.wt_layout.wt_list[0])))
                 
-            newXML = turbfuncs.wtpc_to_owtg(self.wt_layout.wt_list[0], 
-                                            trbname='ReplTurb', 
-                                            desc='OWcomp replacement turbine')
+            newXML = self.replacement_turbine_xml()
             if len(newXML) > 50:
                 tfname = self.scriptDict['replturbpath'] # this is the file that will be overwritten with new turbine parameters
                 tfh = open(tfname, 'w')
@@ -257,64 +351,76 @@ class OWcomp(Component):
             else:
                 sys.stderr.write('*** NO new turbine file written\n')
             
-        # Execute the component and save process ID
-        if not self.start_once:
-            self.proc = subprocess.Popen(self.command)
-            self.pid = self.proc.pid
-            if self.debug:
-                sys.stderr.write('Started OpenWind with pid {:}\n'.format(self.pid))
-                sys.stderr.write('  OWComp: dummyVbl {:}\n'.format(self.dummyVbl))
-                #sys.stderr.write('Report Path: {:}\n'.format(self.rptpath))
-
-            # Watch for 'results.txt', meaning that OW has run once with the default locations 
-            
-            if self.debug:
-                sys.stderr.write('OWComp waiting for {:} (first run -  positions unchanged)\n'.format(self.resname))
-            acutils.waitForNotify(watchFile=self.resname, path=self.dname, debug=False, callback=self.getCBvalue)
-
-        # Now OW is waiting for a new position file
-        # Write new positions and notify file - this time it should use updated positions
+        # Start OpenWind (it runs once with the positions in the workbook), then write the new
+        #   positions and notify file when it is ready - results.txt is written to the same
+        #   directory as the *blb file
+        if self.start_once:
+            run = acutils.ExtOptRun(self.wt_layout.wt_positions, self.dname, proc=self.proc, ready=self.firstRun,
+                                    watcher=watcher, debug=self.debug)
+            self.firstRun = None
+            return run
+        if self.debug:
+            sys.stderr.write('OWComp waiting for {:} (first run -  positions unchanged)\n'.format(self.resname))
+        return acutils.ExtOptRun(self.wt_layout.wt_positions, self.dname, launch=self.launchOW,
+                                 watcher=watcher, debug=self.debug)
 
-        acutils.writePositionFile(self.wt_layout.wt_positions, path=self.dname, debug=self.debug)
-        
-        # see if results.txt is there already
-        if os.path.exists(self.resname):
-            resmtime = os.path.getmtime(self.resname)
-            if self.debug:
-                sys.stderr.write('ModTime({:}): {:}\n'.format(self.resname, time.asctime(time.localtime(resmtime))))
-        else:
-            if self.debug:
-                sys.stderr.write('{:} does not exist yet\n'.format(self.resname))
-            
-        acutils.writeNotify(path=self.dname, debug=self.debug) # tell OW that we're ready for the next (only) iteration
+    #------------------ 
+    
+    def launchOW(self):
+        ''' Start the OpenWind process and save its process ID '''
         
-        # 'results.txt' is in the same directory as the *blb file
-        if os.path.exists(self.resname):
-            resNewmtime = os.path.getmtime(self.resname)
-            if resNewmtime > resmtime: # file has changed
-                if self.debug:
-                    sys.stderr.write('results.txt already updated')
-            else:
-                acutils.waitForNotify(watchFile=self.resname, path=self.dname, callback=self.getCBvalue, debug=self.debug)
-        else:
-            if self.debug:
-                sys.stderr.write('OWComp waiting for {:} (modified positions)\n'.format(self.resname))
-            acutils.waitForNotify(watchFile=self.resname, path=self.dname, callback=self.getCBvalue, debug=self.debug)
+        self.proc = subprocess.Popen(self.command)
+        self.pid = self.proc.pid
+        if self.debug:
+            sys.stderr.write('Started OpenWind with pid {:}\n'.format(self.pid))
+            sys.stderr.write('  OWComp: dummyVbl {:}\n'.format(self.dummyVbl))
+        return self.proc
 
+    #------------------ 
+    
+    def finish_execute(self, run, timeout=None):
+        """ Waits for an evaluation started by execute_async() and sets the outputs """
+        
         # Parse output file 
         #    Enterprise OW writes the report file specified in the script BUT
         #    Academic OW writes 'results.txt' (which doesn't have as much information)
         
-        netEnergy, netNRGturb, grossNRGturb = acutils.parseACresults(fname=self.resname)
-        if netEnergy is None:
-            sys.stderr.write("Error reading results file\n")
+        if isinstance(run, acutils.CachedRun):
+            self.set_results(*run.result())
+            return
+        
+        # A run that times out or whose OpenWind exits is retried with a new OpenWind process,
+        #   after a delay that doubles with each attempt
+        if timeout is None:
+            timeout = self.timeout
+        def restart(failed):
+            return acutils.ExtOptRun(failed.wt_positions, self.dname, launch=self.launchOW,
+                                     watcher=failed.watcher, debug=self.debug)
+        result = acutils.retryRun(run, restart, self.terminateOW, timeout=timeout, max_retries=self.max_retries,
+                                  backoff=self.backoff, debug=self.debug)
+        self.set_results(*result)
+        if self.cache is not None:
+            self.cache.put(self.cache_key(run.wt_positions), *result)
+                
+        if not self.start_once and self.stopOW:
             if self.debug:
                 sys.stderr.write('Stopping OpenWind with pid {:}\n'.format(self.pid))
             self.proc.terminate()
-            return False
+            
+        self.checkReport() # check for execution errors
+
+        if self.debug:
+            sys.stderr.write("Leaving {0}.execute() {1}...\n\n".format(self.__class__, self.script_file))
+
+    #------------------ 
+    
+    def set_results(self, netEnergy, netNRGturb, grossNRGturb):
+        """ Sets the outputs from the contents of results.txt (or a cached evaluation) """
         
         # Set the output variables
         #   - array_aep is not available from Academic 'results.txt' file
+        self.netNRGturb = netNRGturb
+        self.grossNRGturb = grossNRGturb
         self.nTurbs = len(netNRGturb)
         self.net_aep = netEnergy
         self.gross_aep = sum(grossNRGturb)
@@ -324,20 +430,10 @@ class OWcomp(Component):
         # Log optimization values
         if self.opt_log:
             self.olfh.write('{:3d} G {:.4f} N {:.4f} XY '.format(self.exec_count, self.gross_aep, self.net_aep))
-            for ii in range(len(wt_positions)):
+            for ii in range(len(self.wt_layout.wt_positions)):
                 self.olfh.write('{:8.1f} {:9.1f} '.format(self.wt_layout.wt_positions[ii][0], self.wt_layout.wt_positions[ii][1]))
             self.olfh.write('\n')
-                
-        if not self.start_once and self.stopOW:
-            if self.debug:
-                sys.stderr.write('Stopping OpenWind with pid {:}\n'.format(self.pid))
-            self.proc.terminate()
-            
-        self.checkReport() # check for execution errors
-
-        if self.debug:
-            sys.stderr.write("Leaving {0}.execute() {1}...\n\n".format(self.__class__, self.script_file))
-
+    
     #------------------ 
     
     def parse_results_no_extopt():
@@ -382,10 +478,10 @@ class OWcomp(Component):
     #------------------ 
     
     def terminateOW(self):
-        ''' Terminate the OpenWind process '''
+        ''' Terminate the OpenWind process (killing it if it doesn't respond) '''
         if self.debug:
             sys.stderr.write('Stopping OpenWind with pid {:}\n'.format(self.pid))
-        self.proc.terminate()
+        acutils.killProcess(self.proc)
 
     #------------------ 
     
@@ -395,15 +491,16 @@ class OWcomp(Component):
         fname = self.scriptDict['rptpath']
         if self.debug:
             sys.stderr.write('checkReport : {:}\n'.format(fname))
-        fh = open(fname, 'r')
-        for line in fh.readlines():
+        # an unchanged report is not read again (see utils.ReportCache)
+        result = utils.rdReportTable(fname, cache=self.reportCache)
+        if result is None:
+            return
+        for line in result[3].errors:
             if line.startswith('Failed to find and replace turbine type'):
                 sys.stderr.write('\n*** ERROR: turbine replacement operation failed\n')
                 sys.stderr.write('    Replace {:}\n'.format(self.scriptDict['replturbname']))
                 sys.stderr.write('    with    {:}\n'.format(self.scriptDict['replturbpath']))
                 sys.stderr.write('\n')
-                
-        fh.close()
         
 #------------------------------------------------------------------
 
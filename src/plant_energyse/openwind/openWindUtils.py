@@ -3,7 +3,11 @@
 '''
   Utilities to help run OpenWind from openMDAO
     rdReport(rptpath, debug=False):
+    rdReportTable(rptpath, debug=False):
     class owWindTurbine()
+    class TurbineResultTable()
+    class ReportCache()
+    rdSidecar(rptpath) / wrtSidecar(...)
     rdOWTG(fname)
     
   For reading/writing OpenWind scripts, see rwScriptXML.py
@@ -17,9 +21,24 @@
      somewhere in the last few OpenWind updates, Nick changed the units
      on Array Efficiency and TI from '%%' to '%'
    
+   2026 10 18: added rdReportTable() - columnar parsing of the turbine table into a
+     NumPy structured array (report_dtype); rdReport() now builds its owWindTurbine
+     list from that table
+   2026 10 18: rdReportTable() returns a TurbineResultTable (column arrays with
+     __slots__ row views) instead of a structured array
+   2026 10 18: added ReportCache - parsed reports keyed on file identity; rdReport() and
+     rdReportTable() take an optional cache
+   2026 10 18: binary sidecar (rptpath.bin columns + rptpath.json header) written and read by
+     rdReport(sidecar=True) while its stamp matches the report
+   2026 10 18: sidecar columns stored one after another in rptpath.bin, so that each is
+     memory-mapped as a contiguous array and TurbineResultTable uses it without a copy
+   
 '''
 
 import sys, os
+import json
+import hashlib
+from collections import OrderedDict
 import numpy as np
 from lxml import etree
 
@@ -41,8 +60,24 @@ class owWindTurbine():
         self.aeff = -9999.9
         self.freeWS = -9999.9
         self.meanWS = -9999.9
+        self.TI = -9999.9
         self.ttype = 'none'
     
+    @classmethod
+    def fromRecord(cls, rec, type_names):
+        # create an owWindTurbine from one row of an rdReportTable() table
+        #   fields missing from the report (NaN in the table) keep their default (invalid) values
+        
+        trb = cls()
+        if rec['index'] >= 0:
+            trb.tIndex = int(rec['index'])
+        for name in ('x', 'y', 'gross', 'net', 'aeff', 'freeWS', 'meanWS', 'TI'):
+            if not np.isnan(rec[name]):
+                setattr(trb, name, float(rec[name]))
+        if rec['ttype'] >= 0:
+            trb.ttype = type_names[rec['ttype']]
+        return trb
+    
     def parseLine(self, line, hdrs):
         # parse line from an OpenWind energy capture report and set variables
         # hdrs[] must be  list of the variable names from the report line immediately
@@ -84,7 +119,119 @@ class owWindTurbine():
           
 # -------------------
 
-def rdReport(rptpath, debug=False):
+class TurbineResult(object):
+    ''' lightweight view of one row of a TurbineResultTable, with the attribute names of owWindTurbine '''
+    
+    __slots__ = ('table', 'row')
+    
+    aliases = {'tIndex' : 'index'}
+    
+    def __init__(self, table, row):
+        self.table = table
+        self.row = row
+    
+    def __getattr__(self, name):
+        if name in TurbineResult.__slots__:
+            raise AttributeError(name)
+        if name == 'ttype':
+            code = self.table.columns['ttype'][self.row]
+            return self.table.type_names[code] if code >= 0 else 'none'
+        try:
+            return self.table.columns[self.aliases.get(name, name)][self.row]
+        except KeyError:
+            raise AttributeError(name)
+    
+    def __str__(self):
+        return '{:3d} {:9.1f} {:9.1f} {:9.3f} {:9.3f} {:6.2f} {:5.2f} {:5.2f} {:}'.format(self.tIndex, 
+          self.x, self.y, self.gross * 0.001, self.net * 0.001, self.aeff, 
+          self.freeWS, self.meanWS, self.ttype)
+
+class TurbineResultTable(object):
+    ''' turbine results from OpenWind reports, stored column-wise in contiguous NumPy arrays
+    
+        table['x']             zero-copy column access
+        table[mask], table[i:j] new table with the selected rows (boolean mask, slice or index array)
+        table[i]                TurbineResult view of row i
+        for trb in table:       iterates over TurbineResult views
+        
+        Columns are the fields of report_dtype, plus any extra columns of the same length;
+        'ttype' holds indices into table.type_names.
+        table.errors lists the error lines OpenWind wrote in the report (see rdReportTable()).
+    '''
+    
+    def __init__(self, columns, type_names=None, errors=None):
+        # columns must hold every report_dtype field; other columns (e.g. a run id) are kept as given
+        self.columns = dict((name, np.ascontiguousarray(col, dtype=report_dtype[name] if name in report_dtype.names else None)) 
+                            for name, col in columns.items())
+        self.type_names = list(type_names) if type_names is not None else []
+        self.errors = list(errors) if errors is not None else []
+    
+    @classmethod
+    def fromRecords(cls, records, type_names=None, errors=None):
+        # create a table from a report_dtype structured array
+        return cls(dict((name, records[name]) for name in report_dtype.names), type_names, errors)
+    
+    @classmethod
+    def concatenate(cls, tables):
+        # stack the rows of several tables (e.g. the history of a layout optimization), merging their type names
+        #   (only the report_dtype columns are kept)
+        type_names = sorted(set(name for t in tables for name in t.type_names))
+        columns = dict((name, np.concatenate([t.columns[name] for t in tables] or [[]])) 
+                       for name in report_dtype.names if name != 'ttype')
+        
+        # map the type codes of each table to the merged type names (code -1 stays -1)
+        codes = []
+        for t in tables:
+            remap = np.array([type_names.index(n) for n in t.type_names] + [-1], dtype=np.int16)
+            codes.append(remap[t.columns['ttype']])
+        columns['ttype'] = np.concatenate(codes or [[]])
+        return cls(columns, type_names)
+    
+    def __len__(self):
+        return len(self.columns['gross'])
+    
+    def __getitem__(self, key):
+        if isinstance(key, basestring):
+            return self.columns[key]
+        if isinstance(key, (int, np.integer)):
+            if key < 0:
+                key += len(self)
+            if key < 0 or key >= len(self):
+                raise IndexError('TurbineResultTable index out of range')
+            return TurbineResult(self, key)
+        return TurbineResultTable(dict((name, col[key]) for name, col in self.columns.items()), self.type_names, self.errors)
+    
+    def __iter__(self):
+        for i in xrange(len(self)):
+            yield TurbineResult(self, i)
+    
+    def active(self):
+        # turbines with non-zero gross energy
+        return self[self.columns['gross'] > 0.0]
+    
+    def xy(self):
+        # (n, 2) array of turbine positions
+        return np.column_stack([self.columns['x'], self.columns['y']])
+    
+    def ttypes(self):
+        # list of turbine type names
+        names = self.type_names + ['none']
+        return [names[code] for code in self.columns['ttype']]
+    
+    def toRecords(self):
+        # copy of the table as a report_dtype structured array
+        records = np.empty(len(self), dtype=report_dtype)
+        for name in report_dtype.names:
+            records[name] = self.columns[name]
+        return records
+    
+    def turbines(self):
+        # list of owWindTurbine objects, one per row
+        return [owWindTurbine.fromRecord(rec, self.type_names) for rec in self.toRecords()]
+    
+# -------------------
+
+def rdReport(rptpath, debug=False, cache=None, sidecar=False):
     ''' read the output of an OpenWind script and extract useful info 
         OpenMDAO also has capabilities for parsing output files (the FileParser object)
         
@@ -106,14 +253,101 @@ def rdReport(rptpath, debug=False):
           'X [m]' and 'Y [m]'
           <TurbineXField value="true"/>
           <TurbineYField value="true"/>
+          
+        If cache (a ReportCache) is given, an unchanged report is only parsed once
+          (the cached owTrbs list is shared between calls)
+        If sidecar is True, the report is read from (or parsed into) its binary sidecar - see rdReportTable()
+    '''
+    
+    if cache is not None:
+        return cache.get(rptpath, rdReport, debug=debug, sidecar=sidecar)
+    
+    result = rdReportTable(rptpath, debug=debug, sidecar=sidecar)
+    if result is None:
+        return None
+    gross_aep, array_aep, net_aep, table = result
+    
+    owTrbs = table.turbines() # list of owWindTurbine objects
+            
+    return gross_aep, array_aep, net_aep, owTrbs   
+           
+# -------------------
+
+# columns of the turbine table returned by rdReportTable() and the report headers they are read from
+#   (headers are compared without blanks, with '%%' read as '%')
+
+report_dtype = np.dtype([('index', np.int32), ('x', np.float64), ('y', np.float64), 
+                         ('gross', np.float64), ('net', np.float64), ('aeff', np.float64), 
+                         ('freeWS', np.float64), ('meanWS', np.float64), ('TI', np.float64),
+                         ('ttype', np.int16)])
+
+report_columns = {'index'  : 'Index',
+                  'x'      : 'X[m]',
+                  'y'      : 'Y[m]',
+                  'gross'  : 'Gross [kWh]',
+                  'net'    : 'Net [kWh]',
+                  'aeff'   : 'Array Efficiency [%]',
+                  'freeWS' : 'Free Speed [m/s]',
+                  'meanWS' : 'Mean Speed [m/s]',
+                  'TI'     : 'Turbulence Intensity [%]',
+                  'ttype'  : 'Type'}
+
+def hdrKey(hdr):
+    # normalized form of a report column header
+    return hdr.strip().replace('%%', '%').replace(' ', '')
+
+def rdReportTable(rptpath, debug=False, activeOnly=True, cache=None, sidecar=False):
+    ''' read the output of an OpenWind script into a TurbineResultTable 
+    
+        The header line of the turbine table is located once and its columns are mapped to
+        indices; every column of the turbine block is then converted in a single NumPy call.
+        
+        USAGE:
+        gross_aep, array_aep, net_aep, table = openWindUtils.rdReportTable(rptpath)
+        
+        Returns:
+          gross_aep, array_aep, net_aep = totals in GWh (as rdReport())
+          table = TurbineResultTable with one row per active turbine (per turbine if activeOnly is False)
+                  (fields missing from the report are NaN, or -1 for 'index' and 'ttype')
+          The totals always cover active turbines only.
+          
+        Returns None if the report can't be read.
+        For owWindTurbine objects, call table.turbines()
+        If cache (a ReportCache) is given, an unchanged report is only parsed once
+          (the cached table is shared between calls)
+        If sidecar is True and rptpath.json/rptpath.bin match the report's stamp, the table columns
+          are memory-mapped from rptpath.bin instead of parsing the text; otherwise the report is parsed
+          and the sidecar (re)written
     '''
     
+    if cache is not None:
+        return cache.get(rptpath, rdReportTable, debug=debug, activeOnly=activeOnly, sidecar=sidecar)
+    
+    if sidecar:
+        sc = rdSidecar(rptpath)
+        if sc is not None:
+            header, columns = sc
+            for line in header['errors']:
+                sys.stderr.write('\n{:}\n'.format(line))
+            if len(header['errors']) > 0:
+                sys.stderr.write('Found {:} errors while reading {:}\n'.format(len(header['errors']), rptpath))
+            if debug:
+                sys.stderr.write('OpenWind::rdReport: read {:} turbines from sidecar of {:}\n'.format(header['nturb'], rptpath))
+            table = TurbineResultTable(columns, header['type_names'], header['errors'])
+            # selecting the active turbines copies the columns, so it is skipped when they all are
+            if activeOnly and not np.all(columns['gross'] > 0.0):
+                table = table.active()
+            return header['gross_aep'], header['array_aep'], header['net_aep'], table
+    
     if not os.path.isfile(rptpath):
         sys.stderr.write('OpenWind::rdReport: file "{:}" does not exist\n'.format(rptpath))
         return None
     
     try:
+        stamp = fileStamp(rptpath) # before reading, so that a report rewritten meanwhile doesn't match the sidecar
         fh = open(rptpath, 'r')
+        lines = fh.read().splitlines()
+        fh.close()
     except:
         sys.stderr.write('OpenWind::rdReport: error reading file "{:}"\n'.format(rptpath))
         return None
@@ -121,122 +355,84 @@ def rdReport(rptpath, debug=False):
     if debug:
         sys.stderr.write('\nOutput of OpenWind::rdReport({:}):\n'.format(rptpath))
     
-    foundHdrs = False
-    hdrs = []
-    nErrors = 0
-    eCaps = []
-    aGross = []
-    aNet = []
-    aArray = []
+    errors = []
     genparams = {}
-    xTurb = []
-    yTurb = []
-    owTrbs = [] # list of owWindTurbine objects
-    ival = []
-    ivDict = {}
+    hdrs = None
+    rows = []
+    tableDone = False
         
-    for line in fh.readlines():
+    for line in lines:
         line = line.rstrip()
         
-        # general parameters
-        # 2014 02 17 - when do these appear? where are they used? (not used at the moment)
+        # general parameters (only saved in the sidecar at the moment)
         
-        if line.startswith('\t\t\t\t'):
-            gpline = line.strip()
-            gp = gpline.split('=')
-            if debug:
-                sys.stderr.write('{:25s} {:}\n'.format(gp[0], gp[1]))
-            try:
-                genparams[gp[0]] = float(gp[1])
-            except:
+        if line.startswith('\t\t\t\t') and not tableDone:
+            gp = line.strip().split('=')
+            if len(gp) > 1:
+                if debug:
+                    sys.stderr.write('{:25s} {:}\n'.format(gp[0], gp[1]))
                 try:
-                   genparams[gp[0]] = int(gp[1])
-                except: 
-                   genparams[gp[0]] = gp[1]
+                    genparams[gp[0]] = float(gp[1])
+                except ValueError:
+                    genparams[gp[0]] = gp[1]
         
         # Error reported by OpenWind
         
-        foundError = False
-        if line.startswith('Failed to find and replace turbine type'):
-            foundError = True
-        if line.find('not have access to an appropriate WRG') > -1:
-            foundError = True
-        if foundError:
+        if line.startswith('Failed to find and replace turbine type') or \
+           line.find('not have access to an appropriate WRG') > -1:
             sys.stderr.write('\n{:}\n'.format(line))
-            nErrors += 1
-            
+            errors.append(line)
+        
         # table of turbine values
-        #   There is no sure way of recognizing the header line, since its contents can vary.
-        #   Here, we look for 'Gross' and 'Net' columns.
         
-        #if line.startswith('Site Name'):
-        if line.find('Gross') > -1 and line.find('Net') > -1:
-            hdrs = line.split('\t')
-            if len(hdrs) > 2: # skip line that has actual site name
-                # get headers and indices
-                ival = [None for i in range(len(hdrs))]
-                ivDict = {}
-                for i in range(len(hdrs)):
-                    hval = hdrs[i].strip()
-                    ivDict[hval] = i
-                    ival[i] = hval
-                    if debug:
-                        sys.stderr.write('{:2d} "{:}" "{:}"\n'.format(i,hdrs[i], hval))
-                foundHdrs = True
-                continue
-            
+        if hdrs is None:
+            if isReportHeader(line):
+                f = line.split('\t')
+                hdrs = [hval.strip() for hval in f]
+                if debug:
+                    for i in range(len(hdrs)):
+                        sys.stderr.write('{:2d} "{:}" "{:}"\n'.format(i,f[i], hdrs[i]))
+            continue
                 
         # individual turbine lines immediately follow the header line
-                
-        if foundHdrs:
-            if len(line) < 1:
-                break
-            f = line.split('\t')
-            if len(f) < len(ival):
-                break # end of turbine lines
-                
-            #try:
-            #    grossKWh = float(f[ivDict['Gross [kWh]']])
-            #except:
-            #    sys.stderr.write("Couldn't find 'Gross [kWh]' (field {:}) in line:\n  {:}\n".format(ivDict['Gross [kWh]'], line))
-            #try:
-            #    netKWh = float(f[ivDict['Net [kWh]']])
-            #except:
-            #    sys.stderr.write("Couldn't find 'Net [kWh]' (field {:}) in line:\n  {:}\n".format('Net [kWh]', line))
-            #try:
-            #    aEff = float(f[ivDict['Array Efficiency [%%]']])
-            #except:
-            #    sys.stderr.write("Couldn't find 'Array Efficiency [%%]' (field {:}) in line:\n  {:}\n".format('Array Efficiency [%%]', line))
-            
-            grossKWh = getValue(f, ivDict, 'Gross [kWh]', line)
-            netKWh = getValue(f, ivDict, 'Net [kWh]', line)
-            aEff = getValue(f, ivDict, 'Array Efficiency [%]', line)
-            
-            if grossKWh is None or grossKWh <= 0.0: # skip inactive turbines or those in deactivated layouts
-                continue
-                    
-            aGross.append(grossKWh)
-            aNet.append(netKWh)
-            arrayKWh = 0.01*aEff*grossKWh
-            aArray.append(arrayKWh)
-            #print '{:.2f} {:.2f} {:.2f} {:.2f} '.format(grossKWh, netKWh, arrayKWh, aEff)
-            
-            if ('X[m]' in ivDict and 'Y[m]' in ivDict):
-                xTurb.append(float(f[ivDict['X[m]']]))
-                yTurb.append(float(f[ivDict['Y[m]']]))
-                
-            newTurb = owWindTurbine()
-            newTurb.parseLine(line,hdrs)
-            owTrbs.append(newTurb)
-            
-    fh.close()
+        #   (the rest of the report is only checked for errors)
+        
+        if tableDone:
+            continue
+        if len(line) < 1:
+            tableDone = True
+            continue
+        f = line.split('\t')
+        if len(f) < len(hdrs):
+            tableDone = True # end of turbine lines
+            continue
+        rows.append(f)
+    
+    if hdrs is None:
+        hdrs = []
+    
+    table, type_names, missing = tableFromRows(hdrs, rows)
+    
+    # skip inactive turbines or those in deactivated layouts
+    
+    # only the energy columns are required, and only in a report that has a turbine table
+    if len(hdrs) > 0:
+        for name in ('gross', 'net'):
+            if name in missing:
+                sys.stderr.write('\n*** ERROR: variable "{:}" not found in ivDict\n'.format(report_columns[name]))
+    active = table[table['gross'] > 0.0]
     
     # Summarize
     
-    gross_aep = np.sum(np.array(aGross))/1000000.  # kWh to gWh
-    array_aep = np.sum(np.array(aArray))/1000000.
-    net_aep   = np.sum(np.array(aNet))/1000000.  
-    nTurb = len(aGross)
+    gross_aep = np.sum(active['gross'])/1000000.  # kWh to gWh
+    array_aep = np.sum(0.01*active['aeff']*active['gross'])/1000000.
+    net_aep   = np.sum(active['net'])/1000000.  
+    nTurb = len(active)
+    
+    if sidecar:
+        wrtSidecar(rptpath, stamp, table, type_names, gross_aep, array_aep, net_aep, genparams, errors)
+    if activeOnly:
+        table = active
     
     if debug:
         sys.stderr.write( 'N(turbines) {:}\n'.format(nTurb))
@@ -244,35 +440,247 @@ def rdReport(rptpath, debug=False):
         sys.stderr.write( 'Array {:.4f} GWh\n'.format(array_aep) )
         sys.stderr.write( 'Net   {:.4f} GWh\n'.format(net_aep  ) )
         
-        if (len(xTurb) > 0):
-            sys.stderr.write('X range {:9.1f} to {:9.1f} m\n'.format(np.min(xTurb), np.max(xTurb)))
-            sys.stderr.write('Y range {:9.1f} to {:9.1f} m\n'.format(np.min(yTurb), np.max(yTurb)))
+        if nTurb > 0 and not np.isnan(active['x'][0]):
+            sys.stderr.write('X range {:9.1f} to {:9.1f} m\n'.format(np.min(active['x']), np.max(active['x'])))
+            sys.stderr.write('Y range {:9.1f} to {:9.1f} m\n'.format(np.min(active['y']), np.max(active['y'])))
     
         sys.stderr.write('\nEnd OpenWind::rdReport({:})\n\n'.format(rptpath))
     
-    if nErrors > 0:
-        sys.stderr.write('Found {:} errors while reading {:}\n'.format(nErrors, rptpath))
+    if len(errors) > 0:
+        sys.stderr.write('Found {:} errors while reading {:}\n'.format(len(errors), rptpath))
             
-    return gross_aep, array_aep, net_aep, owTrbs   
-           
+    return gross_aep, array_aep, net_aep, TurbineResultTable.fromRecords(table, type_names, errors)
+
 # -------------------
 
-def getValue(f, ivDict, vname, line):
+def fileStamp(path):
+    ''' (size, mtime_ns) of a file - mtime_ns is derived from st_mtime where os.stat() has no st_mtime_ns '''
+    
+    st = os.stat(path)
+    return st.st_size, getattr(st, 'st_mtime_ns', int(st.st_mtime * 1e9))
+
+sidecar_version = 1
+
+def wrtSidecar(rptpath, stamp, table, type_names, gross_aep, array_aep, net_aep, genparams, errors):
+    ''' write the parsed contents of report rptpath to rptpath.bin (the report_dtype columns of all
+          turbines, one after another) and rptpath.json (totals, type names, general parameters, 
+          OpenWind errors, the stamp of the report and the offset of each column in rptpath.bin)
+        stamp = fileStamp(rptpath) taken before the report was read
+        Both files are written to a temporary file and renamed, so tables memory-mapped from an
+          earlier rptpath.bin stay valid, and the header is written last, so an interrupted write 
+          leaves no valid sidecar.
+        Returns False (with a message) if the sidecar can't be written.
     '''
-    Get the floating-point value associated with 'vname'
-      f = line.split()
-    2015 04 08
+    
+    header = {'version'    : sidecar_version,
+              'stamp'      : list(stamp),
+              'gross_aep'  : gross_aep,
+              'array_aep'  : array_aep,
+              'net_aep'    : net_aep,
+              'nturb'      : len(table),
+              'type_names' : list(type_names),
+              'genparams'  : genparams,
+              'errors'     : errors,
+              'columns'    : []}
+    
+    try:
+        if os.path.isfile(rptpath + '.json'):
+            os.remove(rptpath + '.json')
+        fh = open(rptpath + '.bin.tmp', 'wb')
+        offset = 0
+        for name in report_dtype.names:
+            col = np.ascontiguousarray(table[name], dtype=report_dtype[name].newbyteorder('<'))
+            header['columns'].append([name, col.dtype.str, offset])
+            fh.write(col.tostring())
+            # start every column on an 8 byte boundary
+            pad = -col.nbytes % 8
+            fh.write('\0' * pad)
+            offset += col.nbytes + pad
+        fh.close()
+        os.rename(rptpath + '.bin.tmp', rptpath + '.bin')
+        fh = open(rptpath + '.json.tmp', 'w')
+        json.dump(header, fh, indent=1)
+        fh.close()
+        os.rename(rptpath + '.json.tmp', rptpath + '.json')
+    except (IOError, OSError) as e:
+        sys.stderr.write('OpenWind::wrtSidecar: could not write sidecar of "{:}": {:}\n'.format(rptpath, e))
+        return False
+    return True
+
+def rdSidecar(rptpath):
+    ''' read the sidecar of report rptpath written by wrtSidecar()
+        Returns (header, columns) with columns a dict of contiguous arrays memory-mapped from rptpath.bin, 
+          or None if there is no sidecar or its stamp doesn't match the report
     '''
-    if not vname in ivDict:
-        sys.stderr.write('\n*** ERROR: variable "{:}" not found in ivDict\n'.format(vname))
+    
+    try:
+        fh = open(rptpath + '.json', 'r')
+        header = json.load(fh)
+        fh.close()
+        if header.get('version') != sidecar_version or header['stamp'] != list(fileStamp(rptpath)):
+            return None
+        nturb = header['nturb']
+        columns = {}
+        if nturb > 0:
+            data = np.memmap(rptpath + '.bin', dtype=np.uint8, mode='r')
+            for name, dtype, offset in header['columns']:
+                dtype = np.dtype(str(dtype))
+                if offset + nturb * dtype.itemsize > len(data):
+                    return None
+                columns[str(name)] = data[offset:offset + nturb * dtype.itemsize].view(dtype)
+        else:
+            for name, dtype, offset in header['columns']:
+                columns[str(name)] = np.zeros(0, dtype=str(dtype))
+    except (IOError, OSError, ValueError, KeyError, TypeError):
         return None
-        
-    ivd = ivDict[vname]
+    
+    if sorted(columns) != sorted(report_dtype.names):
+        return None
+    header['type_names'] = [str(t) for t in header['type_names']]
+    header['genparams'] = dict((str(k), v) for k, v in header['genparams'].items())
+    return header, columns
+
+def isReportHeader(line):
+    # header line of a turbine table: there is no sure way of recognizing it, since its contents can vary.
+    #   Here, we look for 'Gross' and 'Net' columns (and skip the line that has the actual site name)
+    return line.find('Gross') > -1 and line.find('Net') > -1 and len(line.split('\t')) > 2
+
+def tableFromRows(hdrs, rows):
+    ''' convert the split lines of a turbine table to a report_dtype structured array
+        hdrs = stripped column headers, rows = list of field lists (at least len(hdrs) fields each)
+        Returns (table, type_names, missing) - missing lists the report_dtype fields without a column
+    '''
+    
+    # map columns to indices and convert each column of the block at once
+    
+    ivDict = dict((hdrKey(hdrs[i]), i) for i in range(len(hdrs)))
+    columns = zip(*rows) if len(rows) > 0 else [()] * len(hdrs)
+    
+    table = np.empty(len(rows), dtype=report_dtype)
+    type_names = []
+    missing = []
+    for name, hdr in report_columns.items():
+        iv = ivDict.get(hdrKey(hdr))
+        if iv is None:
+            missing.append(name)
+        if name == 'ttype':
+            if iv is None:
+                table['ttype'] = -1
+            else:
+                type_names, codes = np.unique(np.array(columns[iv]), return_inverse=True)
+                type_names = [str(t).strip() for t in type_names]
+                table['ttype'] = codes
+        elif iv is None:
+            table[name] = -1 if name == 'index' else np.nan
+        elif name == 'index':
+            index = toFloats(columns[iv])
+            table[name] = np.where(np.isnan(index), -1, index)
+        else:
+            table[name] = toFloats(columns[iv])
+    
+    return table, type_names, missing
+
+def toFloats(column):
+    ''' convert a column of report fields to floats - fields that don't parse become NaN '''
+    
     try:
-        value = float(f[ivd])
+        return np.array(column, dtype=np.float64)
+    except ValueError:
+        values = np.empty(len(column))
+        for i in range(len(column)):
+            try:
+                values[i] = float(column[i])
+            except ValueError:
+                values[i] = np.nan
+        return values
+    
+# -------------------
+
+class ReportCache(object):
+    ''' bounded least-recently-used cache of parsed report files
+    
+        Entries are keyed on the absolute path, the parser and its options, and are valid while the
+        file's (size, mtime_ns) stamp is unchanged - or its MD5 digest, if hashContents is set
+        (for file systems with coarse time stamps, or copies of archived reports).
+        A lookup of an unchanged file costs one os.stat() and a dictionary lookup.
+        
+        USAGE:
+        cache = openWindUtils.ReportCache()
+        gross_aep, array_aep, net_aep, table = openWindUtils.rdReportTable(rptpath, cache=cache)
+        netEnergy, netNRG, grossNRG = cache.get('results.txt', owAcademicUtils.parseACresults)
+        
+        Cached results are shared between callers and should not be modified.
+    '''
+    
+    def __init__(self, maxsize=256, hashContents=False):
+        self.maxsize = maxsize
+        self.hashContents = hashContents
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+    
+    def stamp(self, path):
+        # identity of the current contents of path
+        if self.hashContents:
+            fh = open(path, 'rb')
+            digest = hashlib.md5(fh.read()).hexdigest()
+            fh.close()
+            return digest
+        return fileStamp(path)
+    
+    def get(self, path, parser, **kwargs):
+        # return parser(path, **kwargs), parsing only if path changed since it was cached
+        #   'debug' is passed to the parser but is not part of the key
+        
+        path = os.path.abspath(path)
+        key = (path, parser.__module__, parser.__name__, 
+               tuple(sorted((k, v) for k, v in kwargs.items() if k != 'debug')))
+        try:
+            stamp = self.stamp(path)
+        except (IOError, OSError):
+            self._entries.pop(key, None)
+            return parser(path, **kwargs) # let the parser report the missing file
+        
+        entry = self._entries.pop(key, None)
+        if entry is not None and entry[0] == stamp:
+            self._entries[key] = entry
+            self.hits += 1
+            return entry[1]
+        
+        self.misses += 1
+        value = parser(path, **kwargs)
+        
+        # failed parses (None, or a tuple of Nones) are not cached
+        if value is not None and not (isinstance(value, tuple) and all(v is None for v in value)):
+            self._entries[key] = (stamp, value)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
         return value
-    except:
-        sys.stderr.write("Couldn't find '{:}' (field {:}) in line:\n  {:}\n".format(vname, ivd, line))
-    return None
+    
+    def invalidate(self, path=None):
+        # drop the entries of path (all parsers), or every entry if path is None
+        if path is None:
+            self._entries.clear()
+            return
+        path = os.path.abspath(path)
+        for key in [k for k in self._entries if k[0] == path]:
+            del self._entries[key]
+    
+    def clear(self):
+        # drop all entries and reset the hit/miss counters
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def __contains__(self, path):
+        path = os.path.abspath(path)
+        return any(k[0] == path for k in self._entries)
+    
+    def __str__(self):
+        return 'ReportCache: {:d} of {:d} entries, {:d} hits, {:d} misses'.format(len(self._entries), 
+          self.maxsize, self.hits, self.misses)
     
 # function rdOWTG replaced with getTurbParams in rwTurbXML.py : 2014 03 31
@@ -0,0 +1,215 @@
+# owConstraints.py
+# 2026 10 18
+'''
+  Turbine position constraints - checked (and optionally repaired) before a layout is
+  written to positions.txt, so that OpenWind isn't run on layouts it would reject
+
+    - minimum spacing between turbines (KD-tree over the positions: O(N log N))
+    - site boundary polygon that all turbines must be inside
+    - exclusion polygons that no turbine may be inside
+
+  Polygons are sequences of (x, y) vertices in UTM meters (closing vertex optional);
+  all turbines are tested against all edges at once.
+
+    class LayoutConstraints(min_spacing=0.0, boundary=None, exclusions=())
+    class LayoutConstraintError(ValueError)
+    inside_polygon(xy, polygon)
+    nearest_on_polygon(xy, polygon)
+
+  USAGE:
+    lc = owConstraints.LayoutConstraints(min_spacing=4*126.0, boundary=site, exclusions=[lake])
+    for msg in lc.violations(wt_positions):
+        print msg
+    wt_positions = lc.repair(wt_positions)  # raises LayoutConstraintError if it can't
+    ow = OWcomp(owExe, scriptFile=scrptName, constraints=lc, repair=True)
+'''
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+#------------------------------------------------------------------
+
+class LayoutConstraintError(ValueError):
+    ''' raised for a layout that violates its constraints
+          violations : list of messages (see LayoutConstraints.violations())
+    '''
+
+    def __init__(self, violations):
+        self.violations = violations
+        ValueError.__init__(self, 'layout violates {:d} constraint(s): {:}'.format(len(violations),
+                                  '; '.join(violations[:5]) + (' ...' if len(violations) > 5 else '')))
+
+#------------------------------------------------------------------
+
+def _edges(polygon):
+    # start and end points of the edges of a polygon, without a repeated closing vertex
+    P = np.asarray(polygon, dtype=float).reshape(-1, 2)
+    if len(P) > 1 and np.all(P[0] == P[-1]):
+        P = P[:-1]
+    return P, np.roll(P, -1, axis=0)
+
+def inside_polygon(xy, polygon):
+    ''' boolean array: True for the points xy[n][2] inside polygon (even-odd rule) '''
+
+    xy = np.asarray(xy, dtype=float).reshape(-1, 2)
+    A, B = _edges(polygon)
+    x = xy[:,0][:,np.newaxis]
+    y = xy[:,1][:,np.newaxis]
+
+    # count the edges crossed by a ray from each point in the +x direction
+    straddle = (A[:,1] > y) != (B[:,1] > y)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        xcross = A[:,0] + (y - A[:,1]) * (B[:,0] - A[:,0]) / (B[:,1] - A[:,1])
+    return np.sum(straddle & (x < xcross), axis=1) % 2 == 1
+
+def nearest_on_polygon(xy, polygon):
+    ''' the point on the edges of polygon nearest to each point xy[n][2], and its distance
+        Returns (points[n][2], distances[n])
+    '''
+
+    xy = np.asarray(xy, dtype=float).reshape(-1, 2)
+    A, B = _edges(polygon)
+    AB = B - A
+    # [point, edge] position along each edge of the foot of the perpendicular, clipped to the edge
+    AP = xy[:,np.newaxis,:] - A
+    t = np.clip(np.sum(AP * AB, axis=2) / np.maximum(np.sum(AB * AB, axis=1), 1e-12), 0.0, 1.0)
+    foot = A + t[:,:,np.newaxis] * AB
+    dist = np.sqrt(np.sum((foot - xy[:,np.newaxis,:])**2, axis=2))
+    iedge = np.argmin(dist, axis=1)
+    rows = np.arange(len(xy))
+    return foot[rows,iedge], dist[rows,iedge]
+
+#------------------------------------------------------------------
+
+class LayoutConstraints(object):
+    ''' minimum spacing, boundary and exclusion zone constraints on turbine positions
+
+        min_spacing : minimum distance between turbines [m] (0: no spacing constraint)
+        boundary    : polygon the turbines must be inside (None: no boundary)
+        exclusions  : polygons the turbines must be outside
+
+        violations(xy) : list of messages, empty if xy satisfies all constraints
+        check(xy)      : raises LayoutConstraintError unless xy satisfies all constraints
+        repair(xy)     : nearby positions that satisfy the constraints
+    '''
+
+    def __init__(self, min_spacing=0.0, boundary=None, exclusions=()):
+        self.min_spacing = float(min_spacing)
+        self.boundary = None if boundary is None else np.asarray(boundary, dtype=float)
+        self.exclusions = [np.asarray(p, dtype=float) for p in exclusions]
+
+    # ---- queries
+
+    def close_pairs(self, xy):
+        ''' (i, j) index pairs (i < j) of turbines closer than min_spacing, as an array[npairs][2] '''
+
+        xy = np.asarray(xy, dtype=float).reshape(-1, 2)
+        if self.min_spacing <= 0.0 or len(xy) < 2:
+            return np.zeros((0, 2), dtype=int)
+        pairs = cKDTree(xy).query_pairs(self.min_spacing * (1.0 - 1e-9))
+        return np.array(sorted(pairs), dtype=int).reshape(-1, 2)
+
+    def nearest(self, xy):
+        ''' distance to, and index of, the nearest other turbine of each turbine '''
+
+        xy = np.asarray(xy, dtype=float).reshape(-1, 2)
+        if len(xy) < 2:
+            return np.array([np.inf] * len(xy)), np.array([-1] * len(xy))
+        dist, index = cKDTree(xy).query(xy, k=2)
+        return dist[:,1], index[:,1]
+
+    def outside(self, xy):
+        ''' indices of the turbines outside the boundary '''
+
+        if self.boundary is None:
+            return np.zeros(0, dtype=int)
+        return np.nonzero(~inside_polygon(xy, self.boundary))[0]
+
+    def excluded(self, xy):
+        ''' indices of the turbines inside an exclusion zone '''
+
+        xy = np.asarray(xy, dtype=float).reshape(-1, 2)
+        bad = np.zeros(len(xy), dtype=bool)
+        for polygon in self.exclusions:
+            bad |= inside_polygon(xy, polygon)
+        return np.nonzero(bad)[0]
+
+    def violations(self, xy):
+        ''' messages describing every violated constraint (turbines are numbered from 0) '''
+
+        xy = np.asarray(xy, dtype=float).reshape(-1, 2)
+        msgs = []
+        for i, j in self.close_pairs(xy):
+            msgs.append('turbines {:d} and {:d} are {:.1f} m apart (minimum {:.1f} m)'.format(i, j,
+                        np.hypot(*(xy[i] - xy[j])), self.min_spacing))
+        for i in self.outside(xy):
+            msgs.append('turbine {:d} at ({:.1f}, {:.1f}) is outside the boundary'.format(i, xy[i][0], xy[i][1]))
+        for i in self.excluded(xy):
+            msgs.append('turbine {:d} at ({:.1f}, {:.1f}) is in an exclusion zone'.format(i, xy[i][0], xy[i][1]))
+        return msgs
+
+    def valid(self, xy):
+        return len(self.violations(xy)) == 0
+
+    def check(self, xy):
+        ''' raise LayoutConstraintError if xy violates any constraint '''
+
+        msgs = self.violations(xy)
+        if len(msgs) > 0:
+            raise LayoutConstraintError(msgs)
+
+    # ---- repair
+
+    def _project(self, xy, index, polygon, margin):
+        # move turbines 'index' onto the nearest edge of polygon, then 'margin' further in the same direction
+        if len(index) == 0:
+            return
+        foot, dist = nearest_on_polygon(xy[index], polygon)
+        step = foot - xy[index]
+        norm = np.maximum(np.sqrt(np.sum(step**2, axis=1)), 1e-12)[:,np.newaxis]
+        xy[index] = foot + margin * step / norm
+
+    def repair(self, xy, max_iter=100, margin=None):
+        ''' return a copy of xy[n][2] with the turbines moved as little as practical to satisfy the constraints:
+              turbines outside the boundary or inside an exclusion zone are moved just past its nearest edge,
+              and turbines that are too close are pushed apart along the line between them
+            margin : distance past the edges [m] (default 1% of min_spacing, at least 0.1 m)
+            Raises LayoutConstraintError if the constraints are still violated after max_iter passes
+        '''
+
+        xy = np.array(xy, dtype=float).reshape(-1, 2)
+        if margin is None:
+            margin = max(0.01 * self.min_spacing, 0.1)
+
+        for it in range(max_iter):
+            moved = False
+
+            pairs = self.close_pairs(xy)
+            if len(pairs) > 0:
+                moved = True
+                i, j = pairs[:,0], pairs[:,1]
+                d = xy[j] - xy[i]
+                dist = np.sqrt(np.sum(d**2, axis=1))
+                # coincident turbines are separated in a direction that depends on their indices
+                angle = 2.0 * np.pi * (0.618034 * (i + j) % 1.0)
+                d = np.where(dist[:,np.newaxis] > 1e-9, d, np.column_stack((np.cos(angle), np.sin(angle))))
+                unit = d / np.maximum(np.sqrt(np.sum(d**2, axis=1)), 1e-12)[:,np.newaxis]
+                push = (0.5 * (self.min_spacing - dist) + 0.5 * margin)[:,np.newaxis] * unit
+                np.add.at(xy, i, -push)
+                np.add.at(xy, j, push)
+
+            for polygon in self.exclusions:
+                index = np.nonzero(inside_polygon(xy, polygon))[0]
+                moved |= len(index) > 0
+                self._project(xy, index, polygon, margin)
+
+            if self.boundary is not None:
+                index = self.outside(xy)
+                moved |= len(index) > 0
+                self._project(xy, index, self.boundary, margin)
+
+            if not moved:
+                return xy
+
+        self.check(xy)
+        return xy
@@ -0,0 +1,240 @@
+# owFollow.py
+# 2026 10 18
+'''
+  Generators that follow the output files of an OpenWind run while it is in progress,
+  so that dashboards and early-stopping logic don't have to wait for the run to finish
+
+    followLines(path, poll=0.5, timeout=None, stop=None)
+      - complete lines appended to a growing file
+    followReport(rptpath, poll=0.5, timeout=None, stop=None)
+      - turbine rows and per-table summaries of an energy capture report
+    followACresults(fname='results.txt', poll=0.5, timeout=None, stop=None)
+      - iterations of an academic-version optimization (results.txt is rewritten each iteration)
+
+  All generators poll the file every 'poll' seconds and return when 'timeout' seconds pass
+  without new data (never, if timeout is None) or when stop() returns True.
+
+  USAGE:
+    for kind, value in owFollow.followReport(rptpath, timeout=600):
+        if kind == 'summary':
+            print value['iteration'], value['net_aep']
+'''
+
+import sys, os, time
+import numpy as np
+
+import openWindUtils
+
+#------------------------------------------------------------------
+
+REWIND = None # yielded by followLines() when the file has been truncated or rewritten
+
+def followLines(path, poll=0.5, timeout=None, stop=None):
+    ''' yield each complete line (without the line ending) appended to file 'path'
+
+        - waits for the file to be created
+        - a partial last line is held back until its newline arrives, or until the
+          file has been idle for 'timeout' seconds (the writer is then taken to be finished)
+        - if the file is rewritten, yields REWIND and starts again from the top. A rewrite is seen when
+          the file shrinks, when it is replaced by a new file (its inode changes), or when its stamp
+          (see openWindUtils.fileStamp()) changes while its size is still the one already read
+          (a rewrite to the same size within one time stamp tick is not seen)
+    '''
+
+    fh = None
+    pos = 0
+    buf = ''
+    idle = 0.0
+    stamp = None # stamp of the file when everything in it had been read
+
+    try:
+        while True:
+            if fh is None and os.path.isfile(path):
+                try:
+                    fh = open(path, 'r')
+                    pos = 0
+                    stamp = None
+                except IOError:
+                    fh = None
+
+            data = ''
+            if fh is not None:
+                try:
+                    newStamp = openWindUtils.fileStamp(path)
+                    replaced = os.stat(path).st_ino != os.fstat(fh.fileno()).st_ino
+                except OSError:
+                    newStamp = stamp
+                    replaced = False
+                if replaced:
+                    fh.close()
+                    fh = None
+                    pos = 0
+                    buf = ''
+                    yield REWIND
+                    continue
+                if newStamp is not None and (newStamp[0] < pos or \
+                   (newStamp[0] == pos and stamp is not None and newStamp != stamp)):
+                    pos = 0
+                    buf = ''
+                    stamp = None
+                    yield REWIND
+                fh.seek(pos) # also clears the end-of-file condition
+                data = fh.read()
+                pos = fh.tell()
+                try:
+                    stamp = openWindUtils.fileStamp(path)
+                except OSError:
+                    stamp = None
+                if stamp is not None and stamp[0] != pos:
+                    stamp = None # appended since the read - the stamp doesn't identify the contents read
+
+            if len(data) > 0:
+                idle = 0.0
+                lines = (buf + data).split('\n')
+                buf = lines.pop() # partial line (or '' after a newline)
+                for line in lines:
+                    yield line.rstrip('\r')
+                continue
+
+            if (stop is not None and stop()) or (timeout is not None and idle >= timeout):
+                if len(buf) > 0:
+                    yield buf.rstrip('\r')
+                return
+
+            time.sleep(poll)
+            idle += poll
+    finally:
+        if fh is not None:
+            fh.close()
+
+#------------------------------------------------------------------
+
+def followReport(rptpath, poll=0.5, timeout=None, stop=None):
+    ''' follow an energy capture report and yield (kind, value) pairs:
+
+          ('turbine', row)    each turbine row as soon as its line is complete
+                              (a TurbineResult with the owWindTurbine attribute names)
+          ('summary', dict)   at the end of each turbine table: 'iteration' (0, 1, ...), 'nturb',
+                              'gross_aep', 'array_aep', 'net_aep' [GWh] and 'table' (TurbineResultTable),
+                              as rdReportTable() would return for that table
+          ('error', line)     errors reported by OpenWind
+          ('rewind', None)    the report was rewritten - iterations start again from 0
+    '''
+
+    hdrs = None
+    rows = []
+    iteration = 0
+
+    def summary():
+        table, type_names, missing = openWindUtils.tableFromRows(hdrs, rows)
+        active = openWindUtils.TurbineResultTable.fromRecords(table, type_names).active()
+        return {'iteration' : iteration,
+                'nturb'     : len(active),
+                'gross_aep' : np.sum(active['gross'])/1000000.,
+                'array_aep' : np.sum(0.01*active['aeff']*active['gross'])/1000000.,
+                'net_aep'   : np.sum(active['net'])/1000000.,
+                'table'     : active}
+
+    for line in followLines(rptpath, poll=poll, timeout=timeout, stop=stop):
+        if line is REWIND:
+            hdrs = None
+            rows = []
+            iteration = 0
+            yield 'rewind', None
+            continue
+
+        line = line.rstrip()
+        if line.startswith('Failed to find and replace turbine type') or \
+           line.find('not have access to an appropriate WRG') > -1:
+            yield 'error', line
+
+        if hdrs is not None:
+            f = line.split('\t')
+            if len(line) > 0 and len(f) >= len(hdrs):
+                rows.append(f)
+                table, type_names, missing = openWindUtils.tableFromRows(hdrs, [f])
+                yield 'turbine', openWindUtils.TurbineResultTable.fromRecords(table, type_names)[0]
+                continue
+
+            # end of turbine lines
+            yield 'summary', summary()
+            iteration += 1
+            hdrs = None
+            rows = []
+
+        if openWindUtils.isReportHeader(line):
+            hdrs = [hval.strip() for hval in line.split('\t')]
+
+    if hdrs is not None and len(rows) > 0:
+        yield 'summary', summary()
+
+#------------------------------------------------------------------
+
+def parseACtext(text, unterminated=False):
+    ''' parse the contents of results.txt (see owAcademicUtils.parseACresults())
+        Returns (netEnergy, netNRG, grossNRG), or None if the text is incomplete.
+        Every line must end with a newline, unless 'unterminated' is set (for a writer that
+        has finished without one)
+    '''
+
+    lines = text.split('\n')
+    if not unterminated:
+        lines = lines[:-1] # drop the partial last line
+    try:
+        f = lines[0].split()
+        nturb = int(f[0])
+        netEnergy = float(f[3])
+        if len(lines) < nturb + 1:
+            return None
+        netNRG = []
+        grossNRG = []
+        for line in lines[1:nturb+1]:
+            f = line.split()
+            netNRG.append(float(f[0]))
+            grossNRG.append(float(f[1]))
+    except (IndexError, ValueError):
+        return None
+
+    return netEnergy, netNRG, grossNRG
+
+def followACresults(fname='results.txt', poll=0.5, timeout=None, stop=None):
+    ''' yield (iteration, netEnergy, netNRG, grossNRG) each time OpenWind writes a complete results file
+
+        results.txt is rewritten (not appended) on every iteration of the optimiser, so the file is
+        re-read whenever its (size, mtime) stamp changes. Contents with a missing last newline are only
+        accepted once the stamp has been unchanged for one poll. Iterations written within one time
+        stamp tick with the same size are not seen.
+    '''
+
+    stamp = None     # stamp of the last file yielded
+    lastSeen = None  # stamp at the previous poll
+    iteration = 0
+    idle = 0.0
+
+    while True:
+        try:
+            newStamp = openWindUtils.fileStamp(fname)
+        except OSError:
+            newStamp = None
+
+        if newStamp is not None and newStamp != stamp:
+            try:
+                fh = open(fname, 'r')
+                text = fh.read()
+                fh.close()
+            except IOError:
+                text = ''
+            result = parseACtext(text, unterminated=(newStamp == lastSeen))
+            if result is not None:
+                stamp = newStamp
+                idle = 0.0
+                yield (iteration,) + result
+                iteration += 1
+                continue
+        lastSeen = newStamp
+
+        if (stop is not None and stop()) or (timeout is not None and idle >= timeout):
+            return
+
+        time.sleep(poll)
+        idle += poll
@@ -0,0 +1,188 @@
+# owLayoutCache.py
+# 2026 10 18
+'''
+  Cache of OpenWind layout evaluations, so that optimizers which revisit a layout
+  (pattern searches, GA restarts, line searches) don't run OpenWind again for it
+
+  Entries are keyed on a hash of
+    - the turbine positions, rounded to 'resolution' meters
+    - the script: its operations and their parameters, with the workbook named in
+      Change Workbook replaced by a digest of its contents (see scriptTag())
+    - anything else that changes the results, e.g. the replacement turbine definition
+  and hold (netEnergy, netNRG, grossNRG) as returned by owAcademicUtils.parseACresults().
+
+  The most recently used entries are kept in memory; with dbname, every entry is also
+  written to an sqlite database, so that results survive the process.
+
+    class LayoutCache(maxsize=1024, dbname=None, resolution=0.1)
+    scriptTag(scriptFile)
+    fileDigest(path)
+
+  USAGE:
+    cache = owLayoutCache.LayoutCache(dbname='layouts.db')
+    ow = OWcomp(owExe, scriptFile=scrptName, cache=cache)
+    pool = OWWorkerPool(owExe, scrptName, cache=cache)
+    ...
+    print cache
+'''
+
+import json
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+import numpy as np
+
+import rwScriptXML
+
+#------------------------------------------------------------------
+
+def fileDigest(path):
+    ''' MD5 digest of the contents of file 'path' '''
+
+    fh = open(path, 'rb')
+    digest = hashlib.md5(fh.read()).hexdigest()
+    fh.close()
+    return digest
+
+# operation parameters that name files: the file contents matter, not where they are
+path_params = ('Path', 'TurbinePath', 'TurbinePosPath')
+
+def scriptTag(scriptFile):
+    ''' digest of the parameters of an OpenWind script that determine its results
+          - ReportPath and the report field flags are left out
+          - the Change Workbook and Replace Turbine Positions files are represented by digests of
+            their contents; the Replace Turbine Type file is left out, since wrappers rewrite it
+            before each run (include the turbine definition in the key, see LayoutCache.key())
+        so copies of a script in different directories (e.g. owWorkerPool sandboxes) have the same tag
+    '''
+
+    root = rwScriptXML.parseScript(scriptFile).getroot()
+    md5 = hashlib.md5()
+    for op in root.findall('.//Operation'):
+        for param in op:
+            if not isinstance(param.tag, basestring): # comments
+                continue
+            value = param.get('value')
+            if param.tag == 'TurbinePath':
+                continue
+            if param.tag in path_params and value is not None:
+                value = fileDigest(value.replace('\\','/'))
+            md5.update('{:}={:}\n'.format(param.tag, value))
+        md5.update('\n')
+    return md5.hexdigest()
+
+#------------------------------------------------------------------
+
+class LayoutCache(object):
+    ''' bounded least-recently-used cache of layout evaluations, optionally backed by an sqlite database
+
+        maxsize    : number of entries held in memory
+        dbname     : sqlite database file (created if needed) - None for a memory-only cache
+        resolution : positions that round to the same multiple of resolution [m] share an entry
+
+        key(wt_positions, *parts) : cache key of a layout - parts are strings (e.g. scriptTag())
+        get(key)                  : (netEnergy, netNRG, grossNRG) or None
+        put(key, netEnergy, netNRG, grossNRG)
+
+        Cached results are shared between callers and should not be modified.
+        The cache can be used from several threads.
+    '''
+
+    def __init__(self, maxsize=1024, dbname=None, resolution=0.1):
+        self.maxsize = maxsize
+        self.resolution = resolution
+        self.dbname = dbname
+        self.hits = 0
+        self.dbhits = 0 # hits that were found in the database (included in hits)
+        self.misses = 0
+        self._entries = OrderedDict()
+        self.lock = threading.Lock()
+
+        self.db = None
+        if dbname is not None:
+            self.db = sqlite3.connect(dbname, check_same_thread=False)
+            self.db.execute('CREATE TABLE IF NOT EXISTS layouts (key TEXT PRIMARY KEY, netEnergy REAL, '
+                            'netNRG TEXT, grossNRG TEXT)')
+            self.db.commit()
+
+    def key(self, wt_positions, *parts):
+        ''' hex digest of the quantized positions wt_positions[n][2] and the strings in parts '''
+
+        xy = np.round(np.asarray(wt_positions, dtype=float).reshape(-1, 2) / self.resolution).astype(np.int64)
+        md5 = hashlib.md5()
+        md5.update('{:d}\n'.format(len(xy)))
+        md5.update(np.ascontiguousarray(xy).tostring())
+        for part in parts:
+            md5.update('\n')
+            md5.update(part)
+        return md5.hexdigest()
+
+    def get(self, key):
+        ''' return the cached (netEnergy, netNRG, grossNRG) of key (and mark it most recently used), or None '''
+
+        with self.lock:
+            entry = self._entries.pop(key, None)
+            if entry is None and self.db is not None:
+                row = self.db.execute('SELECT netEnergy, netNRG, grossNRG FROM layouts WHERE key = ?',
+                                      (key,)).fetchone()
+                if row is not None:
+                    entry = (row[0], json.loads(row[1]), json.loads(row[2]))
+                    self.dbhits += 1
+            if entry is None:
+                self.misses += 1
+                return None
+            self._remember(key, entry)
+            self.hits += 1
+            return entry
+
+    def put(self, key, netEnergy, netNRG, grossNRG):
+        ''' store the results of a layout evaluation '''
+
+        entry = (float(netEnergy), [float(e) for e in netNRG], [float(e) for e in grossNRG])
+        with self.lock:
+            self._entries.pop(key, None)
+            self._remember(key, entry)
+            if self.db is not None:
+                self.db.execute('INSERT OR REPLACE INTO layouts VALUES (?, ?, ?, ?)',
+                                (key, entry[0], json.dumps(entry[1]), json.dumps(entry[2])))
+                self.db.commit()
+
+    def _remember(self, key, entry):
+        self._entries[key] = entry
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        ''' drop all entries (also from the database) and reset the hit/miss counters '''
+
+        with self.lock:
+            self._entries.clear()
+            if self.db is not None:
+                self.db.execute('DELETE FROM layouts')
+                self.db.commit()
+            self.hits = self.dbhits = self.misses = 0
+
+    def close(self):
+        ''' close the database - the in-memory entries can still be used '''
+
+        with self.lock:
+            if self.db is not None:
+                self.db.close()
+                self.db = None
+
+    def __len__(self):
+        # number of entries in memory
+        return len(self._entries)
+
+    def __contains__(self, key):
+        if key in self._entries:
+            return True
+        if self.db is None:
+            return False
+        with self.lock:
+            return self.db.execute('SELECT 1 FROM layouts WHERE key = ?', (key,)).fetchone() is not None
+
+    def __str__(self):
+        return 'LayoutCache: {:d} of {:d} entries, {:d} hits ({:d} from {:}), {:d} misses'.format(len(self._entries),
+          self.maxsize, self.hits, self.dbhits, self.dbname, self.misses)
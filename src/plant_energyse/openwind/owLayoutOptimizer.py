@@ -0,0 +1,330 @@
+# owLayoutOptimizer.py
+# 2026 10 18
+'''
+  Genetic algorithm for turbine layouts that evaluates a whole generation at once
+
+  Each generation is submitted to an evaluator at once, and its results are then collected in order:
+    - an OWWorkerPool (OpenWind processes in sandboxes): the generation runs on all workers
+      at once, so the time per generation falls with the number of workers
+    - a JensenWakeModel (owWakeModel): the generation is evaluated in one batch
+    - anything else with submit(wt_positions) returning a future with result(),
+      whose results are (netEnergy, netNRG, grossNRG)
+
+  Options:
+    constraints : owConstraints.LayoutConstraints - every candidate is repaired before it is evaluated
+    screen      : a JensenWakeModel used to pick the most promising of 'oversample' times as many
+                  children as are evaluated by the (expensive) evaluator
+    cache       : owLayoutCache.LayoutCache - layouts seen before (in this run or an earlier one)
+                  are not evaluated again. The keys include cacheTag, which defaults to the evaluator's
+                  cacheTag (the scriptTag() of an OWWorkerPool's script) and must be given for other evaluators
+    checkpoint  : file (*.npz) written after every generation; run() resumes from it if it exists
+
+  Evaluations that fail (OWRunError etc.) get the worst possible fitness, and the run carries on.
+
+    class GALayoutOptimizer(evaluator, wt_positions, ...)
+
+  USAGE:
+    with OWWorkerPool(owExe, scriptFile, nworkers=8) as pool:
+        ga = GALayoutOptimizer(pool, wt_positions, constraints=lc, population=16, generations=40,
+                               checkpoint='ga.npz')
+        best_xy, best_net = ga.run()
+'''
+
+import sys, os, time
+import numpy as np
+
+#------------------------------------------------------------------
+
+class GALayoutOptimizer(object):
+    ''' maximize the net energy of a layout by moving its turbines
+
+        evaluator   : OWWorkerPool, JensenWakeModel or other evaluator (see module documentation)
+        wt_positions: starting layout [n][2] (UTM meters) - the first member of the initial population
+        population  : number of layouts per generation
+        generations : number of generations run() creates (in total, including those of a resumed run)
+        sigma       : standard deviation of a turbine move [m] (default: 5% of the extent of the starting layout)
+        mutation_rate : probability that a turbine of a child is moved
+        elite       : number of best layouts copied unchanged into the next generation (not re-evaluated)
+        tournament  : number of layouts competing for each parent
+        seed        : random number seed
+        progress    : optional callback progress(generation, best_net, mean_net, elapsed) after each generation
+    '''
+
+    def __init__(self, evaluator, wt_positions, population=20, generations=50, sigma=None, mutation_rate=0.2,
+                 elite=2, tournament=3, constraints=None, screen=None, oversample=4, cache=None, cacheTag=None,
+                 checkpoint=None, seed=None, progress=None, debug=False):
+        self.evaluator = evaluator
+        self.start = np.array(wt_positions, dtype=float).reshape(-1, 2)
+        self.population = population
+        self.generations = generations
+        if sigma is None:
+            sigma = 0.05 * max(np.max(np.ptp(self.start, axis=0)), 1.0)
+        self.sigma = sigma
+        self.mutation_rate = mutation_rate
+        self.elite = min(elite, population)
+        self.tournament = tournament
+        self.constraints = constraints
+        self.screen = screen
+        self.oversample = oversample
+        self.cache = cache
+        if cacheTag is None:
+            cacheTag = getattr(evaluator, 'cacheTag', None)
+        if cache is not None and cacheTag is None:
+            raise ValueError('GALayoutOptimizer: a cache needs a cacheTag that identifies the evaluator')
+        self.cacheTag = cacheTag
+        self.checkpoint = checkpoint
+        self.progress = progress
+        self.debug = debug
+        self.rng = np.random.RandomState(seed)
+
+        self.generation = 0
+        self.layouts = None # [population][n][2]
+        self.fitness = None # net energy of each layout [kWh] (-inf for failed evaluations)
+        self.best_xy = None
+        self.best_net = -np.inf
+        self.history = [] # (generation, best_net, mean_net, elapsed) of each generation
+        self.nevals = 0   # evaluations sent to the evaluator
+        self.nfailed = 0
+
+    # ---- evaluation
+
+    def repair(self, xy):
+        # a layout that satisfies the constraints, or None if it can't be repaired
+        if self.constraints is None:
+            return xy
+        try:
+            return self.constraints.repair(xy)
+        except ValueError:
+            return None
+
+    def evaluate(self, layouts):
+        ''' net energy of each layout in layouts[L][n][2] - cached layouts are not sent to the evaluator '''
+
+        fitness = np.empty(len(layouts))
+        fitness.fill(-np.inf)
+        keys = [None] * len(layouts)
+        todo = []
+        for i, xy in enumerate(layouts):
+            if self.cache is not None:
+                keys[i] = self.cache.key(xy, self.cacheTag)
+                cached = self.cache.get(keys[i])
+                if cached is not None:
+                    fitness[i] = cached[0]
+                    continue
+            todo.append(i)
+        if len(todo) == 0:
+            return fitness
+        self.nevals += len(todo)
+
+        results = {}
+        if hasattr(self.evaluator, 'evaluate_batch'):
+            netEnergy, netNRG, grossNRG = self.evaluator.evaluate_batch([layouts[i] for i in todo])
+            for k, i in enumerate(todo):
+                results[i] = (netEnergy[k], netNRG[k], grossNRG[k])
+        else:
+            # submit the whole generation before waiting for any of it
+            futures = [(i, self.evaluator.submit(layouts[i])) for i in todo]
+            for i, future in futures:
+                try:
+                    results[i] = future.result()
+                except Exception as e:
+                    self.nfailed += 1
+                    sys.stderr.write('\n*** ERROR: evaluation of layout {:d} in generation {:d} failed: {:}\n'.format(i,
+                                     self.generation, e))
+
+        for i, result in results.items():
+            if result is None or result[0] is None:
+                self.nfailed += 1
+                continue
+            fitness[i] = result[0]
+            if self.cache is not None:
+                self.cache.put(keys[i], *result)
+        return fitness
+
+    # ---- genetic operators
+
+    def mutate(self, xy):
+        moved = self.rng.uniform(size=len(xy)) < self.mutation_rate
+        if not np.any(moved):
+            moved[self.rng.randint(len(xy))] = True
+        child = xy.copy()
+        child[moved] += self.rng.normal(0.0, self.sigma, size=(np.sum(moved), 2))
+        return child
+
+    def crossover(self, a, b):
+        # each turbine's position comes from one parent
+        fromA = self.rng.uniform(size=len(a)) < 0.5
+        return np.where(fromA[:,np.newaxis], a, b)
+
+    def select(self):
+        # tournament selection - index of the fittest of 'tournament' random layouts
+        entrants = self.rng.randint(len(self.layouts), size=self.tournament)
+        return entrants[np.argmax(self.fitness[entrants])]
+
+    def children(self, n):
+        ''' n new layouts that satisfy the constraints (fewer if repairs keep failing) '''
+
+        kids = []
+        for attempt in range(10 * n):
+            if len(kids) >= n:
+                break
+            child = self.mutate(self.crossover(self.layouts[self.select()], self.layouts[self.select()]))
+            child = self.repair(child)
+            if child is not None:
+                kids.append(child)
+        return kids
+
+    # ---- checkpoints
+
+    def save(self, fname):
+        ''' write the state of the optimizer to fname (*.npz) '''
+
+        state = self.rng.get_state()
+        tmpname = fname + '.tmp.npz'
+        np.savez(tmpname, generation=self.generation, layouts=self.layouts, fitness=self.fitness,
+                 best_xy=self.best_xy, best_net=self.best_net, history=np.array(self.history).reshape(-1, 4),
+                 nevals=self.nevals, nfailed=self.nfailed,
+                 rng_keys=state[1], rng_pos=state[2], rng_gauss=[state[3], state[4]])
+        os.rename(tmpname, fname) # a run stopped while saving leaves the previous checkpoint intact
+
+    def load(self, fname):
+        ''' restore the state written by save() '''
+
+        data = np.load(fname)
+        if data['layouts'].shape[1:] != self.start.shape:
+            raise ValueError('GALayoutOptimizer: checkpoint {:} has layouts of {:} turbines, not {:}'.format(fname,
+                             data['layouts'].shape[1], len(self.start)))
+        self.generation = int(data['generation'])
+        self.layouts = data['layouts']
+        self.fitness = data['fitness']
+        self.best_xy = data['best_xy']
+        self.best_net = float(data['best_net'])
+        self.history = [tuple(h) for h in data['history']]
+        self.nevals = int(data['nevals'])
+        self.nfailed = int(data['nfailed'])
+        self.rng.set_state(('MT19937', data['rng_keys'], int(data['rng_pos']),
+                            int(data['rng_gauss'][0]), float(data['rng_gauss'][1])))
+
+    # ---- main loop
+
+    def initialize(self):
+        ''' the starting layout and mutations of it
+              Raises ValueError if 10*population mutations don't give enough layouts that satisfy the constraints
+        '''
+
+        start = self.repair(self.start)
+        if start is None:
+            raise ValueError('GALayoutOptimizer: the starting layout violates the constraints and could not be repaired')
+        layouts = [start]
+        for attempt in range(10 * self.population):
+            if len(layouts) >= self.population:
+                break
+            child = self.repair(self.mutate(start))
+            if child is not None:
+                layouts.append(child)
+        if len(layouts) < self.population:
+            raise ValueError('GALayoutOptimizer: only {:d} of {:d} initial layouts could be repaired to satisfy the constraints'.format(
+                             len(layouts), self.population))
+        self.layouts = np.array(layouts)
+
+    def step(self):
+        ''' evaluate one generation and breed the next '''
+
+        t0 = time.time()
+        if self.fitness is None:
+            self.fitness = self.evaluate(self.layouts)
+        else:
+            # elite layouts keep their fitness
+            order = np.argsort(-self.fitness)
+            elite = order[:self.elite]
+            nkids = self.population - self.elite
+            if self.screen is not None:
+                kids = self.children(self.oversample * nkids)
+                if len(kids) > 0:
+                    netEnergy = self.screen.evaluate_batch(kids)[0]
+                    kids = [kids[i] for i in np.argsort(-netEnergy)[:nkids]]
+            else:
+                kids = self.children(nkids)
+            layouts = np.concatenate((self.layouts[elite], np.array(kids).reshape(-1, len(self.start), 2)))
+            fitness = np.concatenate((self.fitness[elite], self.evaluate(layouts[self.elite:])))
+            self.layouts, self.fitness = layouts, fitness
+        self.generation += 1
+
+        ibest = np.argmax(self.fitness)
+        if self.fitness[ibest] > self.best_net:
+            self.best_net = self.fitness[ibest]
+            self.best_xy = self.layouts[ibest].copy()
+        finite = self.fitness[np.isfinite(self.fitness)]
+        mean = np.mean(finite) if len(finite) > 0 else -np.inf
+        self.history.append((self.generation, self.best_net, mean, time.time() - t0))
+        if self.debug:
+            sys.stderr.write('GA generation {:3d}: best {:.6g} mean {:.6g} ({:.1f} s)\n'.format(*self.history[-1]))
+        if self.progress is not None:
+            self.progress(*self.history[-1])
+
+    def run(self):
+        ''' run (or resume) the optimization - returns (best_xy, best_net) '''
+
+        if self.checkpoint is not None and os.path.isfile(self.checkpoint):
+            self.load(self.checkpoint)
+            if self.debug:
+                sys.stderr.write('GA: resuming from {:} at generation {:d}\n'.format(self.checkpoint, self.generation))
+        elif self.layouts is None:
+            self.initialize()
+
+        while self.generation < self.generations:
+            self.step()
+            if self.checkpoint is not None:
+                self.save(self.checkpoint)
+        return self.best_xy, self.best_net
+
+#------------------------------------------------------------------
+
+def example():
+    ''' optimize a layout with a pool of simulated OpenWind processes (see owSimulator) '''
+
+    import tempfile
+    import shutil
+    import owSimulator
+    import rwScriptXML
+    import owConstraints
+    from owWorkerPool import OWWorkerPool
+
+    nworkers = 4
+    for arg in sys.argv[1:]:
+        if arg.startswith('-j'):
+            nworkers = int(arg[2:])
+        if arg == '-help':
+            sys.stderr.write('USAGE: python owLayoutOptimizer.py [-jN]\n')
+            exit()
+
+    tmpdir = tempfile.mkdtemp(prefix='owga')
+    try:
+        owExe = owSimulator.makeFakeInstall(os.path.join(tmpdir, 'ow'), external=True, delay=0.2)
+        xy = owSimulator.defaultLayout(10)
+        wkbk = os.path.join(tmpdir, 'layout.blb')
+        np.savetxt(wkbk, xy, fmt='%.1f')
+        scripttree, ops = rwScriptXML.newScriptTree(os.path.join(tmpdir, 'report.txt'))
+        rwScriptXML.makeChWkbkOp(ops, wkbk)
+        rwScriptXML.makeOptimiseOp(ops)
+        scriptFile = os.path.join(tmpdir, 'script.xml')
+        rwScriptXML.wrtScript(scripttree, scriptFile)
+
+        site = [[499500.0, 4399500.0], [503000.0, 4399500.0], [503000.0, 4401400.0], [499500.0, 4401400.0]]
+        lc = owConstraints.LayoutConstraints(min_spacing=3*126.0, boundary=site)
+
+        def progress(generation, best, mean, elapsed):
+            print 'Generation {:2d}: best {:.4f} GWh  mean {:.4f} GWh  {:.1f} s'.format(generation, best*1e-6,
+                                                                                  mean*1e-6, elapsed)
+
+        t0 = time.time()
+        with OWWorkerPool(owExe, scriptFile, nworkers=nworkers, poll=0.01) as pool:
+            ga = GALayoutOptimizer(pool, xy, population=8, generations=5, constraints=lc, seed=1, progress=progress)
+            best_xy, best_net = ga.run()
+        sys.stderr.write('{:} evaluations in {:.1f} s with {:} workers\n'.format(ga.nevals, time.time()-t0, nworkers))
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+if __name__ == "__main__":
+
+    example()
@@ -0,0 +1,217 @@
+# owReportBatch.py
+# 2026 10 18
+'''
+  Parse many OpenWind energy capture reports (e.g. the archive of a DOE campaign) in parallel
+  and aggregate them into one columnar table
+
+    findReports(source, pattern='*.txt')
+    rdReportBatch(sources, processes=None, pattern='*.txt', progress=None, sidecar=False)
+    saveBatch(fname, batch)
+    loadBatch(fname)
+
+  USAGE (command line):
+    python owReportBatch.py [-j nproc] [-o batch.npz] [-pattern '*.txt'] [-sidecar] [-quiet] dir_or_glob [...]
+'''
+
+import sys, os, glob, fnmatch, time
+import traceback
+from StringIO import StringIO
+from multiprocessing import Pool
+import numpy as np
+
+import openWindUtils
+
+#------------------------------------------------------------------
+
+def findReports(source, pattern='*.txt'):
+    ''' list of report files in directory 'source' (searched recursively for 'pattern'),
+        or matching the glob 'source' '''
+
+    if os.path.isdir(source):
+        paths = []
+        for dirpath, dirnames, filenames in os.walk(source):
+            paths.extend(os.path.join(dirpath, f) for f in fnmatch.filter(filenames, pattern))
+        return sorted(paths)
+    return sorted(glob.glob(source))
+
+#------------------------------------------------------------------
+
+def _parseOne(args):
+    ''' parse one report, capturing anything written to stderr (module level so it can run in a Pool) '''
+
+    path, sidecar = args
+    stderr = sys.stderr
+    sys.stderr = StringIO()
+    try:
+        result = openWindUtils.rdReportTable(path, sidecar=sidecar)
+        if result is None:
+            error = 'could not read report'
+        else:
+            error = None
+    except Exception:
+        result = None
+        error = traceback.format_exc()
+    finally:
+        messages = sys.stderr.getvalue()
+        sys.stderr = stderr
+
+    if result is None:
+        return path, None, None, None, (error + '\n' + messages).strip()
+    gross_aep, array_aep, net_aep, table = result
+    return path, table.toRecords(), table.type_names, (gross_aep, array_aep, net_aep), messages.strip()
+
+class ReportBatch(object):
+    ''' turbine rows of many reports, with a run id per row
+
+        table  = TurbineResultTable of all turbines, with an extra 'run' column (index into runs)
+        runs   = list of report paths that were parsed
+        totals = (nruns, 3) array of gross, array and net AEP of each run [GWh]
+        errors = dict of report path : captured error/warning messages
+                 (reports that failed to parse are not in runs)
+    '''
+
+    def __init__(self, table, runs, totals, errors):
+        self.table = table
+        self.runs = runs
+        self.totals = totals
+        self.errors = errors
+
+    def run(self, i):
+        # table of the turbines of run i
+        return self.table[self.table['run'] == i]
+
+    def __str__(self):
+        return 'ReportBatch: {:d} turbines from {:d} reports, {:d} with errors'.format(len(self.table),
+          len(self.runs), len(self.errors))
+
+def rdReportBatch(sources, processes=None, pattern='*.txt', progress=None, sidecar=False):
+    ''' parse reports in parallel and aggregate them into a ReportBatch
+
+        sources   = directory, glob, or list of directories/globs/file paths
+        processes = size of process pool (None or 1: parse in this process)
+        pattern   = file name pattern used when searching directories
+        progress  = optional callback progress(ndone, ntotal, path) called after each report
+        sidecar   = read reports through their binary sidecars, writing any that are missing or stale
+                    (see openWindUtils.rdReportTable())
+
+        Messages that rdReportTable() would write to stderr are captured per file in batch.errors
+    '''
+
+    if isinstance(sources, basestring):
+        sources = [sources]
+    paths = []
+    for source in sources:
+        if os.path.isfile(source):
+            paths.append(source)
+        else:
+            paths.extend(findReports(source, pattern))
+
+    tasks = [(path, sidecar) for path in paths]
+    if processes is None or processes <= 1:
+        pool = None
+        results = (_parseOne(task) for task in tasks)
+    else:
+        pool = Pool(processes)
+        results = pool.imap(_parseOne, tasks, chunksize=max(1, len(tasks) // (8*processes)))
+
+    runs = []
+    tables = []
+    totals = []
+    errors = {}
+    try:
+        for i, result in enumerate(results):
+            path = result[0]
+            if result[1] is None:
+                errors[path] = result[4]
+            else:
+                if len(result[4]) > 0:
+                    errors[path] = result[4]
+                table = openWindUtils.TurbineResultTable.fromRecords(result[1], result[2])
+                runs.append(path)
+                tables.append(table)
+                totals.append(result[3])
+            if progress is not None:
+                progress(i+1, len(paths), path)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    table = openWindUtils.TurbineResultTable.concatenate(tables)
+    table.columns['run'] = np.repeat(np.arange(len(tables), dtype=np.int32), [len(t) for t in tables])
+
+    return ReportBatch(table, runs, np.array(totals).reshape(-1, 3), errors)
+
+#------------------------------------------------------------------
+
+def saveBatch(fname, batch):
+    ''' write a ReportBatch to a compressed .npz file '''
+
+    arrays = dict(('col_' + name, col) for name, col in batch.table.columns.items())
+    np.savez_compressed(fname, type_names=np.array(batch.table.type_names, dtype=str),
+                        runs=np.array(batch.runs, dtype=str), totals=batch.totals,
+                        error_paths=np.array(sorted(batch.errors), dtype=str),
+                        error_messages=np.array([batch.errors[p] for p in sorted(batch.errors)], dtype=str),
+                        **arrays)
+
+def loadBatch(fname):
+    ''' read a ReportBatch written by saveBatch() '''
+
+    data = np.load(fname)
+    columns = dict((key[4:], data[key]) for key in data.files if key.startswith('col_'))
+    table = openWindUtils.TurbineResultTable(columns, [str(t) for t in data['type_names']])
+    errors = dict(zip([str(p) for p in data['error_paths']], [str(m) for m in data['error_messages']]))
+    return ReportBatch(table, [str(r) for r in data['runs']], data['totals'], errors)
+
+#------------------------------------------------------------------
+
+def main():
+
+    processes = None
+    ofname = None
+    pattern = '*.txt'
+    quiet = False
+    sidecar = False
+    sources = []
+
+    args = sys.argv[1:]
+    while len(args) > 0:
+        arg = args.pop(0)
+        if arg == '-j':
+            processes = int(args.pop(0))
+        elif arg == '-o':
+            ofname = args.pop(0)
+        elif arg == '-pattern':
+            pattern = args.pop(0)
+        elif arg == '-quiet':
+            quiet = True
+        elif arg == '-sidecar':
+            sidecar = True
+        elif arg == '-help':
+            sys.stderr.write("USAGE: python owReportBatch.py [-j nproc] [-o batch.npz] [-pattern '*.txt'] [-sidecar] [-quiet] dir_or_glob [...]\n")
+            exit()
+        else:
+            sources.append(arg)
+
+    def progress(ndone, ntotal, path):
+        sys.stderr.write('\r{:6d} / {:d} reports'.format(ndone, ntotal))
+
+    t0 = time.time()
+    batch = rdReportBatch(sources, processes=processes, pattern=pattern, progress=None if quiet else progress,
+                          sidecar=sidecar)
+    if not quiet:
+        sys.stderr.write('\n')
+
+    sys.stderr.write('{:} in {:.1f} s\n'.format(batch, time.time() - t0))
+    for path in sorted(batch.errors):
+        sys.stderr.write('  {:}: {:}\n'.format(path, batch.errors[path].splitlines()[-1]))
+    if len(batch.runs) > 0:
+        sys.stderr.write('Net AEP {:.4f} to {:.4f} GWh\n'.format(np.min(batch.totals[:,2]), np.max(batch.totals[:,2])))
+
+    if ofname is not None:
+        saveBatch(ofname, batch)
+        sys.stderr.write('Wrote {:}\n'.format(ofname))
+
+if __name__ == "__main__":
+
+    main()
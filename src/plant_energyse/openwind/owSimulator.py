@@ -0,0 +1,451 @@
+# owSimulator.py
+# 2026 10 18
+'''
+  A stand-in for the OpenWind executable, so that the wrappers (OWcomp, OWACcomp, getworkbookvals,
+  owAcademicUtils, owWorkerPool) can be run, benchmarked and load-tested without an OpenWind licence
+
+  The simulator reads an OpenWind XML script and carries out its operations:
+    Change Workbook           - loads the turbine layout of the workbook (see below)
+    Replace Turbine Type      - takes name, capacity, hub height and rotor diameter from the *.owtg file
+    Replace Turbine Positions - loads positions from a text file of X Y lines
+    Energy Capture            - appends a turbine table to the report (ReportPath), honouring the *Field flags
+    Optimise                  - with 'ExternalOptimiser Yes' in OpenWind64.ini, writes results.txt in the
+                                workbook directory, then for each iteration waits for notifyOW.txt, reads
+                                positions.txt and rewrites results.txt (forever if there is no Iterations value).
+                                Otherwise, moves turbines at random for Iterations steps, keeping improvements,
+                                and appends a report table per iteration.
+    Exit                      - exits (the simulator also exits at the end of the script, unlike OpenWind)
+
+  Real workbooks (*.blb) are binary: if the workbook isn't a text file of 'X Y [type]' lines,
+  a grid of 'nturb' turbines is used. Energies come from a simple terrain/Park wake model, so
+  they vary smoothly with turbine positions but mean nothing.
+
+  Behaviour is set by the 'settings' dict (see makeFakeInstall()), which environment variables
+  OWSIM_DELAY, OWSIM_STARTUP, ... override:
+    delay   : seconds each energy calculation takes
+    startup : seconds before the first operation is carried out
+    crash   : probability that an energy calculation exits with code 3 (leaving a partial results.txt)
+    hang    : probability that an energy calculation never finishes
+    partial : seconds between writing the first and second halves of results.txt
+    seed    : random number seed for the failures and the internal optimiser
+    nturb   : number of turbines in the default layout
+    poll    : interval between checks for notifyOW.txt [s]
+
+  USAGE:
+    owExe = owSimulator.makeFakeInstall('/tmp/fakeow', external=True, delay=0.5, crash=0.05)
+    comp = OWACcomp(owExe=owExe, scriptFile=scriptFile, ...)
+
+    or, directly:
+    python owSimulator.py script.xml
+'''
+
+import sys, os, time
+import random
+import numpy as np
+
+import rwScriptXML
+import rwTurbXML
+
+#------------------------------------------------------------------
+
+default_settings = {'delay'   : 0.0,
+                    'startup' : 0.0,
+                    'crash'   : 0.0,
+                    'hang'    : 0.0,
+                    'partial' : 0.0,
+                    'seed'    : None,
+                    'nturb'   : 10,
+                    'poll'    : 0.01}
+
+# report columns in the order OpenWind writes them: (script field flag, header)
+field_columns = [('SiteNameField',        'Site'),
+                 ('TurbineLabelField',    'Label'),
+                 ('TurbineIndexField',    'Index'),
+                 ('TurbineXField',        'X[m]'),
+                 ('TurbineYField',        'Y[m]'),
+                 ('GrossEnergyField',     'Gross [kWh]'),
+                 ('NetEnergyField',       'Net [kWh]'),
+                 ('ArrayEfficiencyField', 'Array Efficiency [%]'),
+                 ('FreeWindspeedField',   'Free Speed [m/s]'),
+                 ('MeanWindspeedField',   'Mean Speed [m/s]'),
+                 ('TurbulenceTotalField', 'Turbulence Intensity [%]'),
+                 ('TurbineTypeField',     'Type')]
+
+# wind rose of the model site: direction the wind comes from [deg] and frequency
+rose_dirs  = np.arange(0.0, 360.0, 30.0)
+rose_freqs = np.array([0.05, 0.04, 0.05, 0.06, 0.07, 0.09, 0.12, 0.15, 0.13, 0.10, 0.08, 0.06])
+
+class SimTurbine(object):
+    ''' the turbine parameters the simulator uses '''
+
+    def __init__(self, name='NREL 5 MW', capKW=5000.0, hubHt=90.0, rtrDiam=126.0):
+        self.name = name
+        self.capKW = capKW
+        self.hubHt = hubHt
+        self.rtrDiam = rtrDiam
+
+#------------------------------------------------------------------
+
+def defaultLayout(nturb):
+    # rows of 5 turbines 5 D apart east-west, 7 D apart north-south
+    i = np.arange(nturb)
+    return np.column_stack((500000.0 + 630.0 * (i % 5), 4400000.0 + 880.0 * (i // 5)))
+
+def rdLayout(fname, nturb=10):
+    ''' read 'X Y [type]' lines from a text workbook or positions file
+        Returns (xy[n][2], type names or None), or (default layout, None) if the file can't be read
+    '''
+
+    xy = []
+    ttypes = []
+    try:
+        fh = open(fname, 'r')
+        for line in fh:
+            line = line.split('#')[0]
+            f = line.split(None, 2)
+            if len(f) == 0:
+                continue
+            xy.append([float(f[0]), float(f[1])])
+            ttypes.append(f[2].strip() if len(f) > 2 else None)
+        fh.close()
+    except (IOError, ValueError, IndexError):
+        xy = []
+    if len(xy) == 0:
+        return defaultLayout(nturb), None
+    if None in ttypes:
+        ttypes = None
+    return np.array(xy), ttypes
+
+def energyCapture(xy, turbine, k=0.075, ct=0.8):
+    ''' gross and net energy of the turbines at xy[n][2] [kWh]
+        Returns a dict of per-turbine arrays 'gross', 'net', 'aeff' [%], 'freeWS', 'meanWS', 'TI' [%]
+    '''
+
+    xy = np.asarray(xy, dtype=float).reshape(-1, 2)
+    D = turbine.rtrDiam
+
+    # free stream speed varies with position (hills), and with hub height
+    freeWS = (7.5 + 0.6 * np.sin(xy[:,0] / 1500.0) * np.cos(xy[:,1] / 1700.0)) * (turbine.hubHt / 80.0)**0.14
+    cf = 0.9 * (1.0 - np.exp(-(freeWS / 9.0)**3))
+    gross = 8760.0 * turbine.capKW * cf
+
+    # Park model: speed deficits from every turbine upwind, combined as root sum of squares
+    dx = xy[np.newaxis,:,0] - xy[:,np.newaxis,0] # [downwind turbine, upwind turbine]
+    dy = xy[np.newaxis,:,1] - xy[:,np.newaxis,1]
+    a0 = 1.0 - np.sqrt(1.0 - ct)
+    ratio = np.zeros(len(xy))
+    deficit = np.zeros(len(xy))
+    for wdir, freq in zip(rose_dirs, rose_freqs):
+        theta = np.radians(wdir)
+        # distance downwind and across the wind of each turbine from each other turbine
+        down = dx * np.sin(theta) + dy * np.cos(theta)
+        across = np.abs(dx * np.cos(theta) - dy * np.sin(theta))
+        waked = (down > 0.0) & (across < 0.5 * D + k * down)
+        d = np.where(waked, a0 / (1.0 + 2.0 * k * np.maximum(down, 0.0) / D)**2, 0.0)
+        dtot = np.sqrt(np.sum(d**2, axis=1))
+        ratio += freq * (1.0 - dtot)**3
+        deficit += freq * dtot
+
+    aeff = 100.0 * ratio
+    return {'gross'  : gross,
+            'net'    : gross * ratio,
+            'aeff'   : aeff,
+            'freeWS' : freeWS,
+            'meanWS' : freeWS * (1.0 - deficit),
+            'TI'     : 10.0 + 40.0 * deficit}
+
+#------------------------------------------------------------------
+
+class OWSimulator(object):
+    ''' carries out the operations of one OpenWind script (see module documentation) '''
+
+    def __init__(self, scriptFile, external=False, settings=None):
+        self.settings = dict(default_settings)
+        if settings is not None:
+            self.settings.update(settings)
+        self.external = external
+        self.random = random.Random(self.settings['seed'])
+
+        self.tree = rwScriptXML.parseScript(scriptFile)
+        root = self.tree.getroot()
+        rpt = root.find('ReportPath')
+        self.rptpath = None if rpt is None else rpt.get('value').replace('\\','/')
+        self.fields = dict((flag, root.find(flag) is not None and root.find(flag).get('value') == 'true')
+                           for flag, hdr in field_columns)
+
+        self.workbook = None
+        self.wkdir = '.'
+        self.xy = defaultLayout(self.settings['nturb'])
+        self.turbines = [SimTurbine()] * len(self.xy)
+        self.nevals = 0
+        if self.rptpath is not None:
+            open(self.rptpath, 'w').close() # OpenWind starts a new report on every run
+
+    # ---- energy calculations, with delays and failures
+
+    def evaluate(self, xy, turbine):
+        self.nevals += 1
+        if self.settings['delay'] > 0:
+            time.sleep(self.settings['delay'])
+        if self.random.random() < self.settings['hang']:
+            sys.stderr.write('owSimulator: hanging in evaluation {:}\n'.format(self.nevals))
+            while True:
+                time.sleep(60)
+        return energyCapture(xy, turbine)
+
+    def crashNow(self):
+        return self.random.random() < self.settings['crash']
+
+    # ---- output files
+
+    def wrtReportTable(self, ec, title=None):
+        ''' append a turbine table to the report '''
+
+        if self.rptpath is None:
+            return
+        hdrs = [hdr for flag, hdr in field_columns if self.fields[flag]]
+        fh = open(self.rptpath, 'a')
+        fh.write('Openwind Energy Capture Report (owSimulator)\n' if title is None else title + '\n')
+        fh.write('\t\t\t\tWorkbook={:}\n'.format(self.workbook))
+        fh.write('\t\t\t\tAirDensity=1.225\n')
+        fh.write('Site 1\tGross and Net\n\n')
+        fh.write('\t'.join(hdrs) + '\t\n')
+        for i in range(len(self.xy)):
+            values = {'Site'  : 'Site 1',
+                      'Label' : 'T{:03d}'.format(i+1),
+                      'Index' : '{:d}'.format(i+1),
+                      'X[m]'  : '{:.1f}'.format(self.xy[i][0]),
+                      'Y[m]'  : '{:.1f}'.format(self.xy[i][1]),
+                      'Gross [kWh]' : '{:.1f}'.format(ec['gross'][i]),
+                      'Net [kWh]'   : '{:.1f}'.format(ec['net'][i]),
+                      'Array Efficiency [%]' : '{:.2f}'.format(ec['aeff'][i]),
+                      'Free Speed [m/s]'     : '{:.3f}'.format(ec['freeWS'][i]),
+                      'Mean Speed [m/s]'     : '{:.3f}'.format(ec['meanWS'][i]),
+                      'Turbulence Intensity [%]' : '{:.2f}'.format(ec['TI'][i]),
+                      'Type'  : self.turbines[i].name}
+            fh.write('\t'.join(values[hdr] for hdr in hdrs) + '\t\n')
+        fh.write('\nTotals [kWh]\t{:.1f}\t{:.1f}\n\n'.format(np.sum(ec['gross']), np.sum(ec['net'])))
+        fh.close()
+
+    def wrtReportLine(self, line):
+        if self.rptpath is not None:
+            fh = open(self.rptpath, 'a')
+            fh.write(line + '\n')
+            fh.close()
+
+    def wrtResults(self, ec, bestNet, crash=False):
+        ''' (re)write results.txt in the workbook directory - with crash, stop halfway and exit '''
+
+        lines = ['{:d}\tturbines\tNetEnergy=\t{:.6f}\tcurrentNet\tcurrentGross\tbestNet\n'.format(len(ec['net']),
+                                                                                               np.sum(ec['net']))]
+        for i in range(len(ec['net'])):
+            lines.append('{:.12f}\t{:.12f}\t{:.12f}\n'.format(ec['net'][i], ec['gross'][i], bestNet[i]))
+        half = (len(lines) + 1) // 2
+
+        fh = open(os.path.join(self.wkdir, 'results.txt'), 'w')
+        fh.writelines(lines[:half])
+        fh.flush()
+        if crash:
+            sys.stderr.write('owSimulator: crashing in evaluation {:}\n'.format(self.nevals))
+            fh.close()
+            os._exit(3)
+        if self.settings['partial'] > 0:
+            time.sleep(self.settings['partial'])
+        fh.writelines(lines[half:])
+        fh.close()
+
+    # ---- operations
+
+    def turbineArray(self):
+        # one SimTurbine for all turbines (the layout's first type) - enough for a stand-in
+        return self.turbines[0]
+
+    def changeWorkbook(self, op):
+        self.workbook = op.find('Path').get('value').replace('\\','/')
+        self.wkdir = os.path.dirname(os.path.abspath(self.workbook))
+        self.xy, ttypes = rdLayout(self.workbook, nturb=self.settings['nturb'])
+        if ttypes is None:
+            self.turbines = [SimTurbine()] * len(self.xy)
+        else:
+            self.turbines = [SimTurbine(name=t) for t in ttypes]
+
+    def replaceTurbineType(self, op):
+        tname = op.find('TurbineName').get('value')
+        tpath = op.find('TurbinePath').get('value').replace('\\','/')
+        tree = rwTurbXML.parseOWTG(tpath) if os.path.isfile(tpath) else None
+        found = [i for i in range(len(self.turbines)) if self.turbines[i].name == tname]
+        if tree is None or len(found) == 0:
+            self.wrtReportLine('Failed to find and replace turbine type {:}'.format(tname))
+            return
+        name, capKW, hubHt, rtrDiam = rwTurbXML.getTurbParams(tree)
+        newTurb = SimTurbine(name=name, capKW=capKW, hubHt=hubHt, rtrDiam=rtrDiam)
+        for i in found:
+            self.turbines[i] = newTurb
+
+    def replaceTurbinePositions(self, op):
+        xy, ttypes = rdLayout(op.find('TurbinePosPath').get('value').replace('\\','/'), nturb=0)
+        if len(xy) > 0:
+            turbine = self.turbineArray()
+            self.xy = xy
+            self.turbines = [turbine] * len(xy)
+
+    def energyCapture(self, op):
+        ec = self.evaluate(self.xy, self.turbineArray())
+        self.wrtReportTable(ec)
+
+    def optimise(self, op):
+        iters = op.find('Iterations')
+        niter = None if iters is None else int(iters.get('value'))
+        if self.external:
+            self.externalOptimise(niter)
+        else:
+            self.internalOptimise(5 if niter is None else niter)
+
+    def externalOptimise(self, niter):
+        ''' the academic protocol: results.txt <- notifyOW.txt + positions.txt '''
+
+        turbine = self.turbineArray()
+        notify = os.path.join(self.wkdir, 'notifyOW.txt')
+        ec = self.evaluate(self.xy, turbine)
+        best = ec
+        self.wrtResults(ec, best['net'])
+
+        it = 0
+        while niter is None or it < niter:
+            if not os.path.exists(notify):
+                time.sleep(self.settings['poll'])
+                continue
+            try:
+                os.remove(notify)
+            except OSError:
+                pass
+            xy, ttypes = rdLayout(os.path.join(self.wkdir, 'positions.txt'), nturb=0)
+            self.xy = xy
+            self.turbines = [turbine] * len(xy)
+            crash = self.crashNow()
+            ec = self.evaluate(self.xy, turbine)
+            if len(ec['net']) != len(best['net']) or np.sum(ec['net']) > np.sum(best['net']):
+                best = ec
+            self.wrtResults(ec, best['net'], crash=crash)
+            it += 1
+        self.wrtReportTable(ec)
+
+    def internalOptimise(self, niter):
+        ''' random moves of one turbine by up to one rotor diameter, keeping those that add energy '''
+
+        turbine = self.turbineArray()
+        best = self.evaluate(self.xy, turbine)
+        for it in range(niter):
+            xy = self.xy.copy()
+            i = self.random.randrange(len(xy))
+            xy[i] += turbine.rtrDiam * np.array([self.random.uniform(-1, 1), self.random.uniform(-1, 1)])
+            ec = self.evaluate(xy, turbine)
+            if np.sum(ec['net']) > np.sum(best['net']):
+                self.xy = xy
+                best = ec
+            self.wrtReportTable(best, title='Optimisation iteration {:}'.format(it+1))
+
+    def run(self):
+        ''' carry out all operations - returns the exit code '''
+
+        if self.settings['startup'] > 0:
+            time.sleep(self.settings['startup'])
+        if self.crashNow():
+            sys.stderr.write('owSimulator: crashing on startup\n')
+            return 3
+
+        handlers = {'Change Workbook'           : self.changeWorkbook,
+                    'Replace Turbine Type'      : self.replaceTurbineType,
+                    'Replace Turbine Positions' : self.replaceTurbinePositions,
+                    'Energy Capture'            : self.energyCapture,
+                    'Optimise'                  : self.optimise}
+        for op in self.tree.getroot().findall('.//Operation'):
+            optype = op.find('Type').get('value')
+            if optype == 'Exit':
+                break
+            if optype not in handlers:
+                sys.stderr.write('owSimulator: ignoring operation "{:}"\n'.format(optype))
+                continue
+            handlers[optype](op)
+        return 0
+
+#------------------------------------------------------------------
+
+def rdSettings(settings=None):
+    ''' default_settings, updated with 'settings' and then with OWSIM_* environment variables '''
+
+    result = dict(default_settings)
+    if settings is not None:
+        result.update(settings)
+    for key in default_settings:
+        val = os.environ.get('OWSIM_' + key.upper())
+        if val is not None:
+            result[key] = int(val) if key in ('seed', 'nturb') else float(val)
+    return result
+
+def iniExternal(dname):
+    # True if OpenWind64.ini in directory dname says 'ExternalOptimiser Yes'
+
+    ipname = os.path.join(dname, 'OpenWind64.ini')
+    if not os.path.isfile(ipname):
+        return False
+    fh = open(ipname, 'r')
+    lines = fh.readlines()
+    fh.close()
+    for line in lines:
+        if line.startswith('ExternalOptimiser'):
+            return line.split()[1].startswith('Y')
+    return False
+
+def main(argv=None, settings=None):
+    ''' run the script named in argv[1] - the ini file is looked for next to argv[0], as OpenWind does '''
+
+    if argv is None:
+        argv = sys.argv
+    if len(argv) < 2:
+        sys.stderr.write('USAGE: owSimulator.py script.xml\n')
+        return 1
+    try:
+        sim = OWSimulator(argv[1], external=iniExternal(os.path.dirname(os.path.abspath(argv[0]))),
+                          settings=rdSettings(settings))
+    except IOError:
+        sys.stderr.write('owSimulator: cannot read script {:}\n'.format(argv[1]))
+        return 2
+    return sim.run()
+
+def makeFakeInstall(dname, external=True, **settings):
+    ''' write an executable 'openWind64' that runs the simulator, and 'OpenWind64.ini', to directory dname
+        external : value of ExternalOptimiser in the ini file (can be changed later with owIniSet())
+        settings : default values for the simulator (see module documentation) - OWSIM_* variables in
+                   the environment of the process that runs the executable take precedence
+        Returns the path of the executable
+    '''
+
+    if not os.path.isdir(dname):
+        os.makedirs(dname)
+    srcdir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    for key in settings:
+        if key not in default_settings:
+            raise ValueError('makeFakeInstall: unknown setting {:}'.format(key))
+
+    owExe = os.path.join(os.path.abspath(dname), 'openWind64')
+    fh = open(owExe, 'w')
+    fh.write('#!{:}\n'.format(sys.executable))
+    fh.write('# OpenWind stand-in written by owSimulator.makeFakeInstall()\n')
+    fh.write('import sys\n')
+    fh.write('sys.path.insert(0, {!r})\n'.format(srcdir))
+    fh.write('from plant_energyse.openwind import owSimulator\n')
+    fh.write('sys.exit(owSimulator.main(sys.argv, {!r}))\n'.format(settings))
+    fh.close()
+    os.chmod(owExe, 0755)
+
+    fh = open(os.path.join(dname, 'OpenWind64.ini'), 'w')
+    fh.write('ExternalOptimiser {:}\n'.format('Yes' if external else 'No'))
+    fh.close()
+    return owExe
+
+#------------------------------------------------------------------
+
+if __name__ == "__main__":
+
+    sys.exit(main())
@@ -0,0 +1,190 @@
+# owWakeModel.py
+# 2026 10 18
+'''
+  Jensen (Park) wake model for screening turbine layouts before they are sent to OpenWind
+
+  Thousands of layouts per second can be evaluated: for each wind rose sector, the downwind and
+  crosswind distances between all pairs of turbines form N x N matrices, from which the wake
+  overlap and decay of every pair follow in a few array operations (no loops over turbines).
+  Batches of layouts are evaluated together.
+
+  Model:
+    - top-hat wakes that expand linearly (wake decay constant k) from the rotor of each turbine
+    - initial deficit 1 - sqrt(1 - Ct(U)) at the free stream speed U of the bin
+    - deficits scaled by the fraction of the rotor area inside the wake, and combined
+      as the root sum of squares
+    - the turbines are all of one type, in uniform free stream conditions (no terrain)
+
+    class JensenWakeModel(wtpc, wind_rose, k=0.075, integration='pdf')
+    layout_aep(wt_layout, wind_rose, k=0.075, integration='pdf')
+
+  USAGE:
+    wtpc = turbfuncs.owtg_to_wtpc('templates/NREL5MW.owtg')
+    model = owWakeModel.JensenWakeModel(wtpc, wind_rose)
+    netEnergy, netNRG, grossNRG = model.evaluate(wt_positions)
+    netEnergy, netNRG, grossNRG = model.evaluate_batch(layouts)  # layouts[L][n][2]
+'''
+
+import numpy as np
+
+from plant_energyse.nrel_csm_aep.aep_csm_component import weibull_bin_weights
+
+#------------------------------------------------------------------
+
+def overlap_fraction(r, R, d):
+    ''' fraction of the area of a circle of radius r covered by a circle of radius R >= r
+        whose centre is d away (arrays broadcast against each other) '''
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # area of the lens where the circles intersect
+        dd = np.maximum(d, 1e-9)
+        c1 = np.clip((dd**2 + r**2 - R**2) / (2.0 * dd * r), -1.0, 1.0)
+        c2 = np.clip((dd**2 + R**2 - r**2) / (2.0 * dd * R), -1.0, 1.0)
+        s = np.maximum((-dd + r + R) * (dd + r - R) * (dd - r + R) * (dd + r + R), 0.0)
+        lens = r**2 * np.arccos(c1) + R**2 * np.arccos(c2) - 0.5 * np.sqrt(s)
+        frac = lens / (np.pi * r**2)
+
+    return np.where(d >= R + r, 0.0, np.where(d <= R - r, 1.0, frac))
+
+class JensenWakeModel(object):
+    ''' Park wake model of a layout of identical turbines
+
+        wtpc      : turbine - a GenericWindTurbinePowerCurveVT (e.g. from turbfuncs.owtg_to_wtpc()) with
+                    power_curve[:,2] (wind speed [m/s], power [kW]), c_t_curve[:,2] and rotor_diameter [m]
+        wind_rose : rows of (direction the wind comes from [deg], frequency, Weibull scale A [m/s], Weibull shape k)
+                    at hub height, as in fusedwind GenericWindRoseVT.weibull_array - frequencies are normalized
+        k         : wake decay constant (0.075 onshore, 0.04-0.05 offshore)
+        integration : 'pdf' or 'cdf' - see aep_csm_component.weibull_bin_weights()
+
+        Energies are in kWh per year; the wind speed bins are those of the power curve.
+    '''
+
+    def __init__(self, wtpc, wind_rose, k=0.075, integration='pdf'):
+        power_curve = np.asarray(wtpc.power_curve, dtype=float)
+        c_t_curve = np.asarray(wtpc.c_t_curve, dtype=float)
+        self.ws = power_curve[:,0]
+        self.power = power_curve[:,1]
+        self.D = float(wtpc.rotor_diameter)
+        self.k = k
+
+        rose = np.atleast_2d(np.asarray(wind_rose, dtype=float))
+        if rose.shape[1] != 4 or np.any(rose[:,1] < 0.0) or np.sum(rose[:,1]) <= 0.0:
+            raise ValueError('JensenWakeModel: wind_rose must have rows of (direction, frequency, A, k) '
+                             'with non-negative frequencies and a positive sum')
+        self.wind_dirs = rose[:,0]
+        theta = np.radians(self.wind_dirs)
+        self.sin = np.sin(theta)[:,np.newaxis,np.newaxis]
+        self.cos = np.cos(theta)[:,np.newaxis,np.newaxis]
+
+        # hours per year in each (sector, speed bin)
+        freq = rose[:,1] / np.sum(rose[:,1])
+        W = weibull_bin_weights(self.ws, rose[:,3][:,np.newaxis], rose[:,2][:,np.newaxis], integration)
+        self.hours = 8760.0 * freq[:,np.newaxis] * W
+
+        # initial velocity deficit of each speed bin
+        c_t = np.clip(np.interp(self.ws, c_t_curve[:,0], c_t_curve[:,1], left=0.0, right=0.0), 0.0, 1.0)
+        self.a = 1.0 - np.sqrt(1.0 - c_t)
+
+        self.gross = np.sum(self.hours * self.power) # of each turbine
+
+    def wake_factors(self, layouts):
+        ''' G[L][S][n]: root sum of squares of the wake deficits at each turbine of each layout in each sector,
+              per unit initial deficit - the speed at turbine i is U * (1 - a(U) * G[l,s,i])
+        '''
+
+        layouts = np.asarray(layouts, dtype=float)
+        x = layouts[...,0]
+        y = layouts[...,1]
+
+        # [layout, sector, downwind turbine i, upwind turbine j]
+        dx = (x[:,np.newaxis,:] - x[:,:,np.newaxis])[:,np.newaxis]
+        dy = (y[:,np.newaxis,:] - y[:,:,np.newaxis])[:,np.newaxis]
+        down = dx * self.sin + dy * self.cos
+        across = np.abs(dx * self.cos - dy * self.sin)
+
+        # only the pairs where the wake of j reaches the rotor of i are worked out
+        R = 0.5 * self.D
+        waked = (down > 0.0) & (across < 2.0 * R + self.k * down)
+        down = down[waked]
+        g2 = np.zeros(waked.shape)
+        decay = (self.D / (self.D + 2.0 * self.k * down))**2
+        g2[waked] = (decay * overlap_fraction(R, R + self.k * down, across[waked]))**2
+        return np.sqrt(np.sum(g2, axis=-1))
+
+    def evaluate_batch(self, layouts, max_bytes=64*2**20):
+        ''' evaluate layouts[L][n][2] (UTM meters, all with the same number of turbines)
+            Returns (netEnergy[L], netNRG[L][n], grossNRG[L][n]) [kWh]
+            Layouts are processed in chunks whose S x n x n (sector, turbine pair) and S x U x n
+              (sector, speed bin, turbine) arrays each take at most max_bytes (but at least one layout
+              per chunk), whatever the batch size and number of turbines
+        '''
+
+        layouts = np.asarray(layouts, dtype=float)
+        if layouts.ndim != 3 or layouts.shape[2] != 2:
+            raise ValueError('JensenWakeModel: layouts must have shape (L, n, 2)')
+
+        S = len(self.wind_dirs)
+        n = layouts.shape[1]
+        chunk_size = max(1, max_bytes // (S * n * max(n, len(self.ws)) * 8))
+        netNRG = np.empty(layouts.shape[:2])
+        for start in range(0, len(layouts), chunk_size):
+            G = self.wake_factors(layouts[start:start+chunk_size])
+            # waked speeds [layout, sector, speed bin, turbine]
+            V = self.ws[:,np.newaxis] * (1.0 - self.a[:,np.newaxis] * G[:,:,np.newaxis,:])
+            P = np.interp(V.ravel(), self.ws, self.power).reshape(V.shape)
+            netNRG[start:start+chunk_size] = np.einsum('lsun,su->ln', P, self.hours)
+
+        grossNRG = np.empty_like(netNRG)
+        grossNRG.fill(self.gross)
+        return np.sum(netNRG, axis=1), netNRG, grossNRG
+
+    def evaluate(self, wt_positions):
+        ''' evaluate one layout wt_positions[n][2] - returns (netEnergy, netNRG[n], grossNRG[n]) like
+            owAcademicUtils.parseACresults() '''
+
+        netEnergy, netNRG, grossNRG = self.evaluate_batch(np.asarray(wt_positions, dtype=float)[np.newaxis])
+        return netEnergy[0], netNRG[0], grossNRG[0]
+
+#------------------------------------------------------------------
+
+def layout_aep(wt_layout, wind_rose, k=0.075, integration='pdf'):
+    ''' gross and net AEP [kWh] of a GenericWindFarmTurbineLayout whose turbines are all like wt_list[0]
+        Returns (gross_aep, net_aep, array_efficiency)
+    '''
+
+    model = JensenWakeModel(wt_layout.wt_list[0], wind_rose, k=k, integration=integration)
+    netEnergy, netNRG, grossNRG = model.evaluate(wt_layout.wt_positions)
+    gross_aep = np.sum(grossNRG)
+    return gross_aep, netEnergy, netEnergy / gross_aep
+
+#------------------------------------------------------------------
+
+def example():
+
+    import time
+    import turbfuncs
+
+    wtpc = turbfuncs.owtg_to_wtpc('templates/NREL5MW.owtg')
+
+    # 12 sector rose with prevailing south-westerly winds
+    dirs = np.arange(0.0, 360.0, 30.0)
+    freqs = [0.05, 0.04, 0.05, 0.06, 0.07, 0.09, 0.12, 0.15, 0.13, 0.10, 0.08, 0.06]
+    wind_rose = np.column_stack((dirs, freqs, 9.0 * np.ones(12), 2.1 * np.ones(12)))
+    model = JensenWakeModel(wtpc, wind_rose)
+
+    # 4 x 5 grids with spacings of 3 to 10 rotor diameters
+    i = np.arange(20)
+    grid = np.column_stack((i % 5, i // 5)).astype(float) * model.D
+    for spacing in (3.0, 5.0, 7.0, 10.0):
+        netEnergy, netNRG, grossNRG = model.evaluate(spacing * grid)
+        print '{:4.1f} D : net {:8.2f} GWh  array efficiency {:5.1f}%'.format(spacing, netEnergy * 1e-6,
+                                                                          100.0 * netEnergy / np.sum(grossNRG))
+
+    layouts = grid[np.newaxis] * np.random.uniform(3.0, 10.0, size=(2000, 1, 1))
+    t0 = time.time()
+    model.evaluate_batch(layouts)
+    print '{:} layouts of {:} turbines per second'.format(int(len(layouts) / (time.time() - t0)), len(grid))
+
+if __name__ == "__main__":
+
+    example()
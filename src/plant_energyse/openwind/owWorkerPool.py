@@ -0,0 +1,309 @@
+# owWorkerPool.py
+# 2026 10 18
+'''
+  Evaluate many turbine layouts concurrently with a pool of OpenWind processes
+  running in external optimiser ('academic') mode
+
+  OpenWind reads 'positions.txt' and 'notifyOW.txt' from, and writes 'results.txt' to,
+  the directory that contains the workbook, so one workbook directory can only serve one
+  OpenWind process. The pool clones the workbook (and any replacement turbine file) into
+  one sandbox directory per worker, writes a script that points at the copies, and keeps
+  one OpenWind process alive in each sandbox. Layouts are dispatched to idle workers and
+  the results are returned as futures.
+
+    makeSandbox(scriptFile, sandbox, debug=False)
+    class OWWorker  - one OpenWind process in one sandbox directory
+    class OWFuture  - result of a layout evaluation that may still be running
+    class OWWorkerPool
+
+  USAGE:
+    pool = OWWorkerPool(owExe, scriptFile, nworkers=4)
+    futures = [pool.submit(layout) for layout in layouts]
+    for future in futures:
+        netEnergy, netNRG, grossNRG = future.result()
+    pool.close()
+
+  NOTE: OpenWind64.ini must contain 'ExternalOptimiser Yes' (see owAcademicUtils.owIniSet()),
+    and the script must contain an Optimise operation, as for OWcomp.
+'''
+
+import sys, os, time
+import shutil
+import tempfile
+import subprocess
+import Queue
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
+
+import academic.owAcademicUtils as acutils
+import plant_energyse.openwind.owLayoutCache as owLayoutCache
+import plant_energyse.openwind.rwScriptXML as rwScriptXML
+
+#------------------------------------------------------------------
+
+def makeSandbox(scriptFile, sandbox, debug=False):
+    ''' copy the workbook and replacement turbine file named in scriptFile into directory sandbox
+          and write a script there that uses the copies and writes its report to the sandbox
+        Relative paths in scriptFile are taken relative to the current directory, as OpenWind does.
+        Returns the path of the new script
+    '''
+
+    if not os.path.isdir(sandbox):
+        os.makedirs(sandbox)
+
+    e = rwScriptXML.parseScript(scriptFile, debug=debug)
+    root = e.getroot()
+
+    rpt = root.find('ReportPath')
+    if rpt is not None:
+        rptname = os.path.basename(rpt.get('value').replace('\\','/'))
+        rpt.set('value', os.path.abspath(os.path.join(sandbox, rptname)))
+
+    foundWkbk = False
+    for op in root.findall('.//Operation'):
+        optype = op.find('Type').get('value')
+        if optype == 'Change Workbook':
+            elem = op.find('Path')
+            foundWkbk = True
+        elif optype == 'Replace Turbine Type':
+            elem = op.find('TurbinePath')
+        else:
+            continue
+        src = elem.get('value').replace('\\','/')
+        dst = os.path.abspath(os.path.join(sandbox, os.path.basename(src)))
+        shutil.copy2(src, dst)
+        elem.set('value', dst)
+        if debug:
+            sys.stderr.write('makeSandbox: copied {:} to {:}\n'.format(src, dst))
+
+    if not foundWkbk:
+        sys.stderr.write('\n*** ERROR in makeSandbox: no Change Workbook operation in {:}\n'.format(scriptFile))
+        return None
+
+    ofname = os.path.abspath(os.path.join(sandbox, os.path.basename(scriptFile)))
+    rwScriptXML.wrtScript(e, ofname)
+    return ofname
+
+#------------------------------------------------------------------
+
+class OWWorker(object):
+    ''' one OpenWind process in external optimiser mode, working in its own sandbox directory
+
+          evaluate(wt_positions) writes positions.txt and notifyOW.txt and waits for the new results.txt
+          OpenWind is started by the first call to evaluate() and stays alive until stop()
+
+          An evaluation that takes longer than 'timeout' seconds, or whose OpenWind exits, is retried
+          up to max_retries times with a new OpenWind process, after a delay of backoff, 2*backoff, ... s
+    '''
+
+    def __init__(self, owExe, scriptFile, sandbox, timeout=None, max_retries=2, backoff=1.0,
+                 watcher=None, debug=False):
+        self.owExe = owExe
+        self.sandbox = os.path.abspath(sandbox)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.debug = debug
+        if watcher is None:
+            watcher = acutils.sharedWatcher()
+        self.watcher = watcher
+
+        self.script_file = makeSandbox(scriptFile, self.sandbox, debug=debug)
+        if self.script_file is None:
+            raise ValueError('OWWorker: no workbook in script file {:}'.format(scriptFile))
+        self.dname = self.sandbox # makeSandbox() copied the workbook here
+        self.resname = os.path.join(self.dname, 'results.txt')
+
+        self.command = [owExe, self.script_file]
+        self.proc = None
+        self.nevals = 0
+        self.nstarts = 0
+
+    def launch(self):
+        ''' start OpenWind in the sandbox and return its Popen object '''
+
+        self.stop()
+        self.proc = subprocess.Popen(self.command, cwd=self.sandbox)
+        self.nstarts += 1
+        if self.debug:
+            sys.stderr.write('OWWorker: started OpenWind with pid {:} in {:}\n'.format(self.proc.pid, self.sandbox))
+        return self.proc
+
+    def stop(self):
+        ''' terminate the OpenWind process (if it is running) '''
+
+        if self.proc is not None:
+            if self.debug and self.proc.poll() is None:
+                sys.stderr.write('OWWorker: stopping OpenWind with pid {:}\n'.format(self.proc.pid))
+            acutils.killProcess(self.proc)
+        self.proc = None
+
+    def alive(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    def evaluate(self, wt_positions):
+        ''' run OpenWind on the turbine positions wt_positions[n][2]
+            Returns (netEnergy, netNRG, grossNRG) as parseACresults() does
+            Raises acutils.OWRunError if every attempt fails
+        '''
+
+        def restart(failed):
+            return acutils.ExtOptRun(wt_positions, self.dname, launch=self.launch, watcher=self.watcher, debug=self.debug)
+        if self.alive():
+            run = acutils.ExtOptRun(wt_positions, self.dname, proc=self.proc, watcher=self.watcher, debug=self.debug)
+        else:
+            run = restart(None)
+        result = acutils.retryRun(run, restart, self.stop, timeout=self.timeout, max_retries=self.max_retries,
+                                  backoff=self.backoff, debug=self.debug)
+        self.nevals += 1
+        return result
+
+#------------------------------------------------------------------
+
+class OWFuture(object):
+    ''' result of OWWorkerPool.submit()
+          result(timeout=None) : (netEnergy, netNRG, grossNRG) - waits for the evaluation to finish
+                                 (raises multiprocessing.TimeoutError if it doesn't finish in time,
+                                 or the OWRunError of an evaluation that failed)
+          done()               : True if the evaluation has finished
+    '''
+
+    def __init__(self, asyncResult, wt_positions):
+        self._result = asyncResult
+        self.wt_positions = wt_positions
+
+    def result(self, timeout=None):
+        if timeout is None:
+            # AsyncResult.get() without a timeout can't be interrupted with Cntl-C
+            while not self._result.ready():
+                self._result.wait(1.0)
+        return self._result.get(timeout)
+
+    def done(self):
+        return self._result.ready()
+
+class OWWorkerPool(object):
+    ''' a pool of OWWorkers that evaluates turbine layouts concurrently
+
+        owExe      : full path to OpenWind executable
+        scriptFile : OpenWind script with a Change Workbook and an Optimise operation
+        nworkers   : number of OpenWind processes (default: number of cores)
+        workdir    : directory for the worker sandboxes (default: a new temporary directory, removed by close())
+        poll       : interval between checks that OpenWind is still running [s]
+                     (new results are detected by a ResultsWatcher as soon as they are written)
+        timeout, max_retries, backoff : per-evaluation time limit [s] and restart policy (see OWWorker)
+        cache      : optional owLayoutCache.LayoutCache - layouts found in it aren't sent to OpenWind,
+                     and the results of the others are added to it
+    '''
+
+    def __init__(self, owExe, scriptFile, nworkers=None, workdir=None, poll=0.1, timeout=None,
+                 max_retries=2, backoff=1.0, cache=None, debug=False):
+        if nworkers is None:
+            nworkers = cpu_count()
+        if acutils.owIniSet(owExe) is False:
+            sys.stderr.write('\n*** WARNING: ExternalOptimiser is not set in the OpenWind ini file - see owIniSet()\n\n')
+
+        self.debug = debug
+        self.removeWorkdir = workdir is None
+        if workdir is None:
+            workdir = tempfile.mkdtemp(prefix='owpool')
+        self.workdir = workdir
+        self.watcher = acutils.ResultsWatcher(poll=poll, debug=debug)
+        self.cache = cache
+        self.cacheTag = owLayoutCache.scriptTag(scriptFile) # also the default tag of a GALayoutOptimizer cache
+
+        try:
+            self.workers = [OWWorker(owExe, scriptFile, os.path.join(workdir, 'worker{:02d}'.format(i)),
+                                     timeout=timeout, max_retries=max_retries, backoff=backoff,
+                                     watcher=self.watcher, debug=debug) for i in range(nworkers)]
+        except:
+            if self.removeWorkdir:
+                shutil.rmtree(workdir, ignore_errors=True)
+            raise
+        self.idle = Queue.Queue()
+        for worker in self.workers:
+            self.idle.put(worker)
+
+        self.pool = ThreadPool(nworkers)
+
+    def _evaluate(self, wt_positions):
+        if self.cache is not None:
+            key = self.cache.key(wt_positions, self.cacheTag)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        worker = self.idle.get()
+        try:
+            result = worker.evaluate(wt_positions)
+        finally:
+            self.idle.put(worker)
+        if self.cache is not None:
+            self.cache.put(key, *result)
+        return result
+
+    def submit(self, wt_positions):
+        ''' queue one layout (wt_positions[n][2], UTM meters) for evaluation and return an OWFuture '''
+
+        return OWFuture(self.pool.apply_async(self._evaluate, (wt_positions,)), wt_positions)
+
+    def map(self, layouts):
+        ''' evaluate a sequence of layouts and return the list of (netEnergy, netNRG, grossNRG) in the same order '''
+
+        return [future.result() for future in [self.submit(layout) for layout in layouts]]
+
+    def close(self):
+        ''' wait for queued evaluations, stop all OpenWind processes and remove the sandboxes '''
+
+        self.pool.close()
+        self.pool.join()
+        for worker in self.workers:
+            worker.stop()
+        self.watcher.stop()
+        if self.removeWorkdir:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+#------------------------------------------------------------------
+
+def example(owExe):
+
+    nworkers = 2
+    for arg in sys.argv[1:]:
+        if arg.startswith('-j'):
+            nworkers = int(arg[2:])
+        if arg == '-help':
+            sys.stderr.write('USAGE: python owWorkerPool.py [-jN]\n')
+            exit()
+
+    if not os.path.isfile(owExe):
+        sys.stderr.write('OpenWind executable file "{:}" not found\n'.format(owExe))
+        exit()
+    acutils.owIniSet(owExe, extVal=True, debug=True)
+
+    owXMLname = 'templates/owScript.xml'
+    workbook = rwScriptXML.rdScript(owXMLname)['workbook']
+    wb = acutils.WTWkbkFile(wkbk=workbook, owexe=owExe)
+
+    # shift the whole layout east by 0, 50, ... 350 m
+    layouts = []
+    for i in range(8):
+        xy = wb.xy.copy()
+        xy[:,0] += 50.0 * i
+        layouts.append(xy)
+
+    t0 = time.time()
+    with OWWorkerPool(owExe, owXMLname, nworkers=nworkers) as pool:
+        for i, (netEnergy, netNRG, grossNRG) in enumerate(pool.map(layouts)):
+            print 'Shift {:4.0f} m : net {:.4f} GWh'.format(50.0*i, netEnergy*0.000001)
+    sys.stderr.write('{:} layouts in {:.1f} s with {:} workers\n'.format(len(layouts), time.time()-t0, nworkers))
+
+if __name__ == "__main__":
+
+    # Substitute your own path to Openwind Enterprise
+    owExe = 'D:/rassess/Openwind/openWind64.exe'
+    example(owExe)
@@ -8,13 +8,32 @@ Copyright (c) NREL. All rights reserved.
 """
 
 
+import os
+import sys
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
 import unittest
+from StringIO import StringIO
 import numpy as np
+from scipy.special import gamma
 from commonse.utilities import check_gradient_unit_test
-from plant_energyse.nrel_csm_aep.nrel_csm_aep import aep_csm_assembly
-from plant_energyse.nrel_csm_aep.aep_csm_component import weibull, aep_csm_component
-from plant_energyse.nrel_csm_aep.aero_csm_component import aero_csm_component
-from plant_energyse.nrel_csm_aep.CSMDrivetrain import CSMDrivetrain
+from plant_energyse.nrel_csm_aep.nrel_csm_aep import aep_csm_assembly, aep_csm_fast
+from plant_energyse.nrel_csm_aep.aep_csm_component import weibull, aep_csm_component, aep_weibull_batch, \
+    weibull_bin_weights, weibull_bin_weights_partials
+from plant_energyse.nrel_csm_aep.aero_csm_component import aero_csm_component, aero_csm_batch
+from plant_energyse.nrel_csm_aep.CSMDrivetrain import CSMDrivetrain, drivetrain_types
+from plant_energyse.nrel_csm_aep.power_curve_cache import PowerCurveCache
+from plant_energyse.nrel_csm_aep.aep_timeseries_component import aep_timeseries
+from plant_energyse.nrel_csm_aep.aep_uncertainty import aep_monte_carlo
+from plant_energyse.nrel_csm_aep.aep_windrose_component import aep_wind_rose, aep_windrose_component
+from plant_energyse.openwind import openWindUtils, owReportBatch, owFollow, owSimulator, rwScriptXML, getworkbookvals, \
+    owLayoutCache, owWakeModel, turbfuncs, owConstraints, owLayoutOptimizer, owWorkerPool
+from plant_energyse.openwind.academic import owAcademicUtils
+from plant_energyse.openwind.openWindComponent import OWcomp
+from plant_energyse.openwind.academic.openWindAcComponent import OWACcomp
 
 # -------------------------------------------------------------------------------
 # NREL CSM AEP
@@ -55,6 +74,88 @@ class Testnrel_csm_aep(unittest.TestCase):
         
         self.assertEqual(round(self.aep.net_aep,1), 1691553683.6)
 
+    def test_fast(self):
+
+        self.aep.max_efficiency = 0.902
+
+        for drivetrain_design in ('geared', 'single_stage', 'multi_drive', 'pm_direct_drive'):
+            self.aep.drivetrain_design = drivetrain_design
+            self.aep.run()
+
+            inputs = dict((name, getattr(self.aep, name)) for name in ('machine_rating', 'max_tip_speed', \
+                          'rotor_diameter', 'max_power_coefficient', 'opt_tsr', 'cut_in_wind_speed', 'cut_out_wind_speed', \
+                          'hub_height', 'altitude', 'air_density', 'drivetrain_design', 'shear_exponent', 'wind_speed_50m', \
+                          'weibull_k', 'soiling_losses', 'array_losses', 'availability', 'turbine_number', \
+                          'thrust_coefficient', 'max_efficiency'))
+            outputs = aep_csm_fast(**inputs)
+
+            for name in ('gross_aep', 'net_aep', 'capacity_factor', 'rated_wind_speed', 'rated_rotor_speed', \
+                         'rotor_thrust', 'rotor_torque'):
+                self.assertAlmostEqual(outputs[name], getattr(self.aep, name))
+            np.testing.assert_allclose(outputs['power_curve'], self.aep.power_curve)
+
+class Testpower_curve_cache(unittest.TestCase):
+
+    def setUp(self):
+
+        self.turbine = dict((name, 1.0) for name in PowerCurveCache.turbine_inputs)
+
+    def test_lru(self):
+
+        cache = PowerCurveCache(maxsize=2)
+        keys = [cache.make_key('geared', **self.turbine)]
+        self.turbine['rotor_diameter'] = 2.0
+        keys.append(cache.make_key('geared', **self.turbine))
+        keys.append(cache.make_key('multi_drive', **self.turbine))
+
+        for key in keys:
+            self.assertTrue(cache.get(key) is None)
+            cache.put(key, [0.0, 1.0], [0.0, 1.0], 1.0, 1.0, 1.0, 1.0)
+
+        self.assertEqual(len(cache), 2)
+        self.assertFalse(keys[0] in cache)
+        self.assertTrue(cache.get(keys[2]) is not None)
+        self.assertEqual((cache.hits, cache.misses), (1, 3))
+
+    def test_quantized_key(self):
+
+        cache = PowerCurveCache(digits=6)
+        key = cache.make_key('geared', **self.turbine)
+        self.turbine['rotor_diameter'] = 1.0 + 1e-9
+
+        self.assertEqual(cache.make_key('geared', **self.turbine), key)
+
+    def test_assembly(self):
+
+        cache = PowerCurveCache()
+        aep = aep_csm_assembly(power_curve_cache=cache)
+        ref = aep_csm_assembly()
+
+        inputs = {'machine_rating' : 5000.0, 'rotor_diameter' : 126.0, 'max_tip_speed' : 80.0, 'drivetrain_design' : 'geared', \
+                  'altitude' : 0.0, 'turbine_number' : 100, 'hub_height' : 90.0, 'max_power_coefficient' : 0.488, \
+                  'opt_tsr' : 7.525, 'cut_in_wind_speed' : 3.0, 'cut_out_wind_speed' : 25.0, 'shear_exponent' : 0.1, \
+                  'weibull_k' : 2.15, 'soiling_losses' : 0.0, 'array_losses' : 0.10, 'availability' : 0.941, \
+                  'thrust_coefficient' : 0.50, 'max_efficiency' : 0.902}
+        for name in inputs:
+            setattr(aep, name, inputs[name])
+            setattr(ref, name, inputs[name])
+
+        # the last run is a hit on the first turbine, after a run with another rotor
+        for wind_speed_50m, rotor_diameter in ((8.02, 126.0), (7.0, 126.0), (7.0, 110.0), (8.02, 126.0)):
+            for a in (aep, ref):
+                a.wind_speed_50m = wind_speed_50m
+                a.rotor_diameter = rotor_diameter
+                a.run()
+            self.assertAlmostEqual(aep.net_aep / ref.net_aep, 1.0)
+            self.assertEqual(aep.rated_wind_speed, ref.rated_wind_speed)
+            np.testing.assert_allclose(aep.power_curve, ref.power_curve)
+            np.testing.assert_allclose(aep.aep.power_curve, ref.drive.power)
+            np.testing.assert_allclose(aep.power.wind_curve, ref.aero.wind_curve)
+
+        self.assertEqual((cache.hits, cache.misses), (2, 2))
+        # the workflow is configured once and not changed by the runs
+        self.assertEqual(aep.driver.workflow.get_names(), ['power', 'aep'])
+
 class Testaep_csm_component(unittest.TestCase):
 
     def setUp(self):
@@ -77,6 +178,191 @@ class Testaep_csm_component(unittest.TestCase):
         
         self.assertEqual(round(self.aep.net_aep,1), 1862105019.6)
 
+    def test_batch(self):
+
+        power_curves = np.array([self.aep.power_curve, 0.9*self.aep.power_curve])
+        gross_aep, net_aep, capacity_factor = aep_weibull_batch(power_curves, self.aep.wind_curve, \
+                              [8.35, 7.0, 9.0], [2.1, 2.0, 2.3], [0.1, 0.1, 0.14], 90.0, [5000.0, 4500.0])
+
+        self.assertEqual(net_aep.shape, (2, 3))
+        self.assertEqual(round(net_aep[0,0],1), 1862105019.6)
+        self.assertAlmostEqual(net_aep[1,0] / net_aep[0,0], 0.9)
+
+        self.aep.wind_speed_50m = 9.0
+        self.aep.weibull_k = 2.3
+        self.aep.shear_exponent = 0.14
+        self.aep.run()
+        self.assertAlmostEqual(net_aep[0,2] / self.aep.net_aep, 1.0)
+
+    def test_gradient(self):
+
+        self.aep.machine_rating = 5000.0
+
+        check_gradient_unit_test(self, self.aep)
+
+    def test_cdf_integration(self):
+
+        self.aep.integration = 'cdf'
+        self.aep.run()
+        net_aep = self.aep.net_aep
+
+        # piecewise-linear power is integrated exactly, so adding collinear points on a non-uniform grid changes nothing
+        wind_curve = np.sort(np.concatenate([self.aep.wind_curve, [3.5, 7.25, 11.9]]))
+        self.aep.power_curve = np.interp(wind_curve, self.aep.wind_curve, self.aep.power_curve)
+        self.aep.wind_curve = wind_curve
+        self.aep.run()
+
+        self.assertAlmostEqual(self.aep.net_aep / net_aep, 1.0, places=10)
+        self.assertAlmostEqual(net_aep / 1862105019.6, 1.0, places=2)
+
+    def test_cdf_partials(self):
+
+        # the K partial comes from quadrature, not differencing - compare it with central differences
+        wind_curve = np.asarray(self.aep.wind_curve)
+        for K in (1.2, 2.1, 3.0):
+            dW_dK, dW_dL = weibull_bin_weights_partials(wind_curve, K, 9.5, 'cdf')
+            h = 1e-5
+            fd = (weibull_bin_weights(wind_curve, K+h, 9.5, 'cdf') - weibull_bin_weights(wind_curve, K-h, 9.5, 'cdf')) / (2*h)
+            np.testing.assert_allclose(dW_dK, fd, rtol=0.0, atol=1e-6 * np.max(np.abs(fd)))
+
+    def test_gradient_cdf_integration(self):
+
+        self.aep.machine_rating = 5000.0
+        self.aep.integration = 'cdf'
+
+        check_gradient_unit_test(self, self.aep, tol=1e-5)
+
+class Testaep_timeseries(unittest.TestCase):
+
+    def setUp(self):
+
+        self.power_curve = [0.0, 0.0, 0.0, 0.0, 187.0, 350.0, 658.30, 1087.4, 1658.3, 2391.5, 3307.0, \
+                            4415.70, 5000.0, 5000.0, 5000.0, 5000.0, 5000.0, 5000.0, 5000.0, 5000.0, 5000.0, 5000.0, \
+                            5000.0, 5000.0, 5000.0, 5000.0, 0.0]
+        self.wind_curve = np.arange(27.0)
+
+        # two years of hourly records starting 2014-01-01 00:00
+        self.times = np.arange(2*8760) * 3600 + 1388534400
+        self.speeds = 8.0 * np.random.RandomState(0).weibull(2.1, 2*8760)
+
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+
+        shutil.rmtree(self.tmpdir)
+
+    def test_sources(self):
+
+        results = aep_timeseries(self.power_curve, self.wind_curve, (self.times, self.speeds), 90.0, 50.0, 0.1, \
+                                 machine_rating=5000.0, chunk_size=5000)
+
+        power = np.interp(self.speeds * (90.0/50.0)**0.1, self.wind_curve, self.power_curve)
+        self.assertEqual(results['hours'], 2*8760)
+        self.assertAlmostEqual(results['gross_aep'] / (np.sum(power) * 100 / 2), 1.0)
+        self.assertAlmostEqual(np.sum(results['monthly_net_energy']) / (2 * results['net_aep']), 1.0)
+        self.assertAlmostEqual(np.sum(results['diurnal_net_energy']) / (2 * results['net_aep']), 1.0)
+        self.assertEqual(results['monthly_hours'][0], 2*31*24)
+
+        npyfile = os.path.join(self.tmpdir, 'wind.npy')
+        np.save(npyfile, np.array([self.times, self.speeds]).transpose())
+        npy_results = aep_timeseries(self.power_curve, self.wind_curve, npyfile, 90.0, 50.0, 0.1, chunk_size=5000)
+        self.assertAlmostEqual(npy_results['net_aep'] / results['net_aep'], 1.0)
+
+        csvfile = os.path.join(self.tmpdir, 'wind.csv')
+        fh = open(csvfile, 'w')
+        fh.write('time,speed\n')
+        for t, v in zip(self.times.astype('datetime64[s]'), self.speeds):
+            fh.write('{:},{:.6f}\n'.format(t, v))
+        fh.write('2016-01-01T00:00:00,NA\n')
+        fh.close()
+        csv_results = aep_timeseries(self.power_curve, self.wind_curve, csvfile, 90.0, 50.0, 0.1, chunk_size=5000)
+        self.assertEqual(csv_results['hours'], 2*8760)
+        self.assertAlmostEqual(csv_results['net_aep'] / results['net_aep'], 1.0, places=6)
+
+class Testaep_monte_carlo(unittest.TestCase):
+
+    def setUp(self):
+
+        self.power_curve = [0.0, 0.0, 0.0, 0.0, 187.0, 350.0, 658.30, 1087.4, 1658.3, 2391.5, 3307.0, \
+                            4415.70, 5000.0, 5000.0, 5000.0, 5000.0, 5000.0, 5000.0, 5000.0, 5000.0, 5000.0, 5000.0, \
+                            5000.0, 5000.0, 5000.0, 5000.0, 0.0]
+        self.wind_curve = np.arange(27.0)
+        self.uncertainty = {'wind_speed_50m': 0.4, 'weibull_k': 0.1, 'availability': 0.02}
+
+    def test_nominal(self):
+
+        results = aep_monte_carlo(self.power_curve, self.wind_curve, 5000.0, 90.0, 8.02, 2.15, 0.1, n_samples=10)
+        _, net_aep, _ = aep_weibull_batch(self.power_curve, self.wind_curve, 8.02, 2.15, 0.1, 90.0, 5000.0)
+
+        self.assertAlmostEqual(results['P50'] / net_aep[0,0], 1.0)
+        self.assertAlmostEqual(results['P99'] / net_aep[0,0], 1.0)
+
+    def test_reproducible(self):
+
+        results = aep_monte_carlo(self.power_curve, self.wind_curve, 5000.0, 90.0, 8.02, 2.15, 0.1, \
+                                  uncertainty=self.uncertainty, n_samples=4000, seed=3)
+        pooled = aep_monte_carlo(self.power_curve, self.wind_curve, 5000.0, 90.0, 8.02, 2.15, 0.1, \
+                                 uncertainty=self.uncertainty, n_samples=4000, seed=3, processes=2)
+
+        np.testing.assert_array_equal(results['net_aep'], pooled['net_aep'])
+        self.assertTrue(results['P50'] > results['P75'] > results['P90'] > results['P99'])
+        self.assertTrue(results['P90_std_error'] < 0.01 * results['P90'])
+        self.assertEqual(results['history'].shape, (4, 4))
+
+class Testaep_wind_rose(unittest.TestCase):
+
+    def setUp(self):
+
+        self.power_curve = [0.0, 0.0, 0.0, 0.0, 187.0, 350.0, 658.30, 1087.4, 1658.3, 2391.5, 3307.0, \
+                            4415.70, 5000.0, 5000.0, 5000.0, 5000.0, 5000.0, 5000.0, 5000.0, 5000.0, 5000.0, 5000.0, \
+                            5000.0, 5000.0, 5000.0, 5000.0, 0.0]
+        self.wind_curve = np.arange(27.0)
+
+    def test_omnidirectional(self):
+
+        # identical sectors reproduce the omnidirectional AEP
+        scale = 8.02 / gamma(1.0 + 1.0/2.15)
+        gross_aep, net_aep, capacity_factor, sector_net_aep = aep_wind_rose(self.power_curve, self.wind_curve, \
+                  np.ones(12), 2.15, scale, 0.1, 90.0, 5000.0, array_losses=0.1)
+        gross_ref, net_ref, cf_ref = aep_weibull_batch(self.power_curve, self.wind_curve, 8.02, 2.15, 0.1, 90.0, 5000.0, \
+                  array_losses=0.1)
+
+        self.assertAlmostEqual(gross_aep / gross_ref[0,0], 1.0)
+        self.assertAlmostEqual(net_aep / net_ref[0,0], 1.0)
+        self.assertAlmostEqual(capacity_factor / cf_ref[0,0], 1.0)
+        np.testing.assert_allclose(sector_net_aep, net_aep / 12)
+
+    def test_sectors(self):
+
+        frequency = np.array([0.1, 0.3, 0.6])
+        k = np.array([1.8, 2.0, 2.4])
+        scale = np.array([7.0, 8.5, 10.0])
+        losses = np.array([0.05, 0.1, 0.15])
+        _, net_aep, _, sector_net_aep = aep_wind_rose(self.power_curve, self.wind_curve, frequency, k, scale, 0.0, 50.0, \
+                                                      5000.0, array_losses=losses, integration='cdf')
+
+        for i in range(3):
+            _, net_ref, _, _ = aep_wind_rose(self.power_curve, self.wind_curve, 1.0, k[i], scale[i], 0.0, 50.0, 5000.0, \
+                                             array_losses=losses[i], integration='cdf')
+            self.assertAlmostEqual(sector_net_aep[i] / (frequency[i] * net_ref), 1.0)
+        self.assertAlmostEqual(np.sum(sector_net_aep) / net_aep, 1.0)
+
+    def test_wind_directions(self):
+
+        rose = aep_windrose_component()
+        rose.power_curve = self.power_curve
+        rose.wind_curve = self.wind_curve
+        rose.hub_height = 90.0
+        rose.machine_rating = 5000.0
+        rose.sector_frequency = [0.2, 0.3, 0.5]
+        rose.sector_weibull_k = [2.0, 2.0, 2.0]
+        rose.sector_weibull_scale = [8.0, 9.0, 10.0]
+        rose.run() # wind_directions is optional
+        self.assertEqual(len(rose.sector_net_aep), 3)
+
+        rose.wind_directions = [0.0, 90.0, 180.0, 270.0]
+        self.assertRaises(ValueError, rose.run)
+
 class Testaero_csm_component(unittest.TestCase):
 
     def setUp(self):
@@ -102,10 +388,1200 @@ class Testaero_csm_component(unittest.TestCase):
         
         self.assertEqual(round(self.aero.rated_rotor_speed,1), 12.1)
 
-# Currently excluding tests for CSMDrivetrain - likely moving to another location
+    def test_batch(self):
+
+        self.aero.run()
+
+        wind_curve, power_curve, rated_wind_speed, rated_rotor_speed, rotor_thrust, rotor_torque = \
+            aero_csm_batch([5000.0, 3000.0], 80.0, [126.0, 100.0], 0.488, 7.525, 3.0, 25.0, 90.0, 0.0, 0.0, 0.902, 0.50)
+
+        self.assertEqual(power_curve.shape, (2, len(wind_curve)))
+        np.testing.assert_array_equal(power_curve[0], self.aero.power_curve)
+        self.assertEqual(rated_wind_speed[0], self.aero.rated_wind_speed)
+        self.assertEqual(rotor_thrust[0], self.aero.rotor_thrust)
+        self.assertEqual(rotor_torque[0], self.aero.rotor_torque)
+        self.assertEqual(np.max(power_curve[1]), 3000.0)
+
+    def test_gradient(self):
+
+        check_gradient_unit_test(self, self.aero, tol=1e-5)
+
+    def test_gradient_air_density(self):
+
+        self.aero.air_density = 1.225
+
+        check_gradient_unit_test(self, self.aero, tol=1e-5)
+
+class TestCSMDrivetrain(unittest.TestCase):
+
+    def setUp(self):
+
+        self.drive = CSMDrivetrain()
+        self.drive.aeroPower = np.linspace(-50.0, 5500.0, 200)
+        self.drive.ratedPower = 5000.0
+
+    def test_compact_jacobian(self):
+
+        self.drive.run()
+
+        J = self.drive.provideJ()
+        np.testing.assert_allclose(self.drive.sparseJ().toarray(), J)
+
+        x = {'aeroPower': np.random.rand(200), 'ratedPower': np.array([0.3])}
+        result = {'power': np.zeros(200)}
+        self.drive.apply_deriv(x, result)
+        np.testing.assert_allclose(result['power'], np.dot(J, np.hstack([x['aeroPower'], x['ratedPower']])))
+
+        y = {'power': np.random.rand(200)}
+        result = {'aeroPower': np.zeros(200), 'ratedPower': np.zeros(1)}
+        self.drive.apply_derivT(y, result)
+        np.testing.assert_allclose(np.hstack([result['aeroPower'], result['ratedPower']]), np.dot(J.T, y['power']))
+
+    def test_all_types(self):
+
+        self.drive.all_types = True
+        self.drive.run()
+        power_by_type = self.drive.power_by_type
+
+        self.drive.all_types = False
+        for i, drivetrainType in enumerate(drivetrain_types):
+            self.drive.drivetrainType = drivetrainType
+            self.drive.run()
+            np.testing.assert_allclose(power_by_type[i], self.drive.power)
 
 # -------------------------------------------------------------------------------
 # Openwind
 
+def write_report(rptpath, nturb=20, pct='%'):
+    # synthetic OpenWind energy capture report - every 7th turbine is inactive
+
+    hdrs = ['Site', 'Index', 'X[m]', 'Y[m]', 'Gross [kWh]', 'Net [kWh]', 'Array Efficiency [{0}]'.format(pct), \
+            'Free Speed [m/s]', 'Mean Speed [m/s]', 'Turbulence Intensity [{0}]'.format(pct), 'Type']
+    fh = open(rptpath, 'w')
+    fh.write('Energy capture report\n\t\t\t\tAirDensity=1.225\nSite Name\tGross and Net\n\n')
+    fh.write('\t'.join(hdrs) + '\t\n')
+    for i in range(nturb):
+        gross = 0.0 if i % 7 == 3 else 1.0e7 + 1.0e5*i
+        fh.write('\t'.join(['Site1', str(i+1), str(100.0*i), str(50.0*i), str(gross), str(0.8*gross), str(90.0 - 0.1*i), \
+                            '8.0', str(7.0 + 0.01*i), '10.5', ['NREL5MW', 'GE1.5'][i % 2]]) + '\t\n')
+    fh.write('\nTotals\n')
+    fh.close()
+
+class TestrdReportTable(unittest.TestCase):
+
+    def setUp(self):
+
+        self.tmpdir = tempfile.mkdtemp()
+        self.rptpath = os.path.join(self.tmpdir, 'report.txt')
+
+    def tearDown(self):
+
+        shutil.rmtree(self.tmpdir)
+
+    def test_table(self):
+
+        write_report(self.rptpath)
+        gross_aep, array_aep, net_aep, table = openWindUtils.rdReportTable(self.rptpath)
+        type_names = table.type_names
+
+        self.assertEqual(len(table), 17)
+        self.assertEqual(type_names, ['GE1.5', 'NREL5MW'])
+        self.assertAlmostEqual(gross_aep, np.sum(table['gross']) / 1.0e6)
+        self.assertAlmostEqual(net_aep, 0.8 * gross_aep)
+        self.assertAlmostEqual(array_aep, np.sum(0.01 * table['aeff'] * table['gross']) / 1.0e6)
+        np.testing.assert_allclose(table['y'], 0.5 * table['x'])
+        self.assertEqual(table['index'][3], 5)
+
+        owTrbs = openWindUtils.rdReport(self.rptpath)[3]
+        for trb, rec in zip(owTrbs, table):
+            self.assertEqual(trb.tIndex, rec.tIndex)
+            self.assertEqual(trb.x, rec.x)
+            self.assertEqual(trb.meanWS, rec.meanWS)
+            self.assertEqual(trb.TI, 10.5)
+            self.assertEqual(trb.ttype, rec.ttype)
+
+    def test_legacy_headers(self):
+
+        write_report(self.rptpath, pct='%%')
+        gross_aep, array_aep, net_aep, table = openWindUtils.rdReportTable(self.rptpath)
+
+        self.assertEqual(len(table), 17)
+        self.assertTrue(np.all(table['aeff'] > 0.0))
+
+    def test_missing_columns(self):
+
+        def read():
+            stderr = sys.stderr
+            sys.stderr = StringIO()
+            try:
+                result = openWindUtils.rdReportTable(self.rptpath)
+                return result, sys.stderr.getvalue()
+            finally:
+                sys.stderr = stderr
+
+        # optional columns that are absent, and a report without a turbine table, are not errors
+        open(self.rptpath, 'w').write('Site Name\tGross and Net\n\nSite\tIndex\tGross [kWh]\tNet [kWh]\t\n'
+                                      'Site1\t1\t1000.0\t900.0\t\n\n')
+        (gross_aep, array_aep, net_aep, table), messages = read()
+        self.assertEqual(messages, '')
+        self.assertEqual(len(table), 1)
+        self.assertTrue(np.isnan(table['aeff'][0]))
+        open(self.rptpath, 'w').write('Energy capture report\nno turbines\n')
+        (gross_aep, array_aep, net_aep, table), messages = read()
+        self.assertEqual(messages, '')
+        self.assertEqual(len(table), 0)
+
+        # a table without net energies in kWh is
+        open(self.rptpath, 'w').write('Site Name\tGross and Net\n\nSite\tIndex\tGross [kWh]\tNet [MWh]\t\n'
+                                      'Site1\t1\t1000.0\t0.9\t\n\n')
+        result, messages = read()
+        self.assertTrue('Net [kWh]' in messages)
+
+    def test_result_table(self):
+
+        write_report(self.rptpath)
+        gross_aep, array_aep, net_aep, table = openWindUtils.rdReportTable(self.rptpath, activeOnly=False)
+
+        self.assertEqual(len(table), 20)
+        self.assertTrue(table['x'].flags['C_CONTIGUOUS'])
+        self.assertTrue(np.may_share_memory(table['x'], table.columns['x']))
+
+        active = table.active()
+        self.assertEqual(len(active), 17)
+        self.assertAlmostEqual(np.sum(active['gross']) / 1.0e6, gross_aep)
+
+        trb = active[3]
+        self.assertEqual(trb.tIndex, 5)
+        self.assertEqual((trb.x, trb.y, trb.ttype), (400.0, 200.0, 'NREL5MW'))
+        self.assertFalse(hasattr(trb, '__dict__'))
+        self.assertEqual([t.tIndex for t in active[active['ttype'] == 0]], [2, 6, 8, 10, 12, 14, 16, 20])
+
+        history = openWindUtils.TurbineResultTable.concatenate([active, active[:5]])
+        self.assertEqual(len(history), 22)
+        self.assertEqual(history.ttypes()[17:], active.ttypes()[:5])
+        np.testing.assert_array_equal(history.xy()[:17], active.xy())
+
+    def test_cache(self):
+
+        cache = openWindUtils.ReportCache(maxsize=2)
+        write_report(self.rptpath)
+
+        result = openWindUtils.rdReportTable(self.rptpath, cache=cache)
+        self.assertTrue(openWindUtils.rdReportTable(self.rptpath, cache=cache) is result)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        # a different parser of the same file has its own entry
+        openWindUtils.rdReport(self.rptpath, cache=cache)
+        self.assertEqual(len(cache), 2)
+
+        write_report(self.rptpath, nturb=30)
+        self.assertEqual(len(openWindUtils.rdReportTable(self.rptpath, cache=cache)[3]), 26)
+        self.assertEqual((cache.hits, cache.misses), (1, 3))
+
+        # error lines OpenWind writes in the report are kept with the table (checkReport() reads them from the cache)
+        write_report(self.rptpath)
+        open(self.rptpath, 'a').write('Failed to find and replace turbine type GE1.5\n')
+        table = openWindUtils.rdReportTable(self.rptpath, cache=cache)[3]
+        self.assertEqual(table.errors, ['Failed to find and replace turbine type GE1.5'])
+        self.assertEqual(table[table['x'] > 0.0].errors, table.errors)
+
+        cache.invalidate(self.rptpath)
+        self.assertFalse(self.rptpath in cache)
+        self.assertTrue(cache.get(os.path.join(self.tmpdir, 'missing.txt'), openWindUtils.rdReportTable) is None)
+        self.assertEqual(len(cache), 0)
+
+    def test_sidecar(self):
+
+        write_report(self.rptpath)
+        gross_aep, array_aep, net_aep, table = openWindUtils.rdReportTable(self.rptpath, sidecar=True)
+
+        header, columns = openWindUtils.rdSidecar(self.rptpath)
+        self.assertTrue(isinstance(columns['x'], np.memmap))
+        self.assertEqual(len(columns['x']), 20) # the sidecar keeps inactive turbines
+        self.assertEqual(header['genparams'], {'AirDensity': 1.225})
+        self.assertEqual(header['net_aep'], net_aep)
+
+        # the table columns are the memory-mapped arrays, not copies
+        full = openWindUtils.rdReportTable(self.rptpath, activeOnly=False, sidecar=True)[3]
+        table_full = openWindUtils.TurbineResultTable.fromRecords(full.toRecords().copy(), full.type_names)
+        for name in openWindUtils.report_dtype.names:
+            self.assertTrue(full[name].flags['C_CONTIGUOUS'])
+            self.assertFalse(full[name].flags['OWNDATA'])
+
+        result = openWindUtils.rdReportTable(self.rptpath, sidecar=True)
+        self.assertEqual(result[:3], (gross_aep, array_aep, net_aep))
+        np.testing.assert_array_equal(result[3].toRecords(), table.toRecords())
+        self.assertEqual(result[3].type_names, table.type_names)
+
+        # a changed report invalidates the sidecar
+        write_report(self.rptpath, nturb=30)
+        self.assertTrue(openWindUtils.rdSidecar(self.rptpath) is None)
+        self.assertEqual(len(openWindUtils.rdReportTable(self.rptpath, sidecar=True)[3]), 26)
+        self.assertEqual(len(openWindUtils.rdSidecar(self.rptpath)[1]['gross']), 30)
+
+        # rewriting the sidecar replaces rptpath.bin, so the table mapped from the old one is unchanged
+        np.testing.assert_array_equal(full.toRecords(), table_full.toRecords())
+        self.assertFalse(os.path.exists(self.rptpath + '.bin.tmp'))
+
+        # the stamp is the one passed in, so a report rewritten while it is read doesn't match
+        openWindUtils.wrtSidecar(self.rptpath, (0, 0), full, full.type_names, 1.0, 1.0, 1.0, {}, [])
+        self.assertTrue(openWindUtils.rdSidecar(self.rptpath) is None)
+
+    def test_batch(self):
+
+        os.mkdir(os.path.join(self.tmpdir, 'runs'))
+        for i in range(4):
+            write_report(os.path.join(self.tmpdir, 'runs', 'run{0}.txt'.format(i)), nturb=10+i)
+        fh = open(os.path.join(self.tmpdir, 'runs', 'failed.txt'), 'w')
+        fh.write('Failed to find and replace turbine type\n')
+        fh.close()
+
+        progress = []
+        batch = owReportBatch.rdReportBatch(os.path.join(self.tmpdir, 'runs'), processes=2, \
+                                            progress=lambda ndone, ntotal, path: progress.append(ndone))
+
+        self.assertEqual(progress, [1, 2, 3, 4, 5])
+        self.assertEqual(len(batch.runs), 5)
+        self.assertEqual(batch.errors.keys(), [os.path.join(self.tmpdir, 'runs', 'failed.txt')])
+        self.assertEqual(len(batch.run(1)), 9) # run0.txt has 10 turbines, one inactive
+        self.assertAlmostEqual(batch.totals[1,0], np.sum(batch.run(1)['gross']) / 1.0e6)
+
+        npzfile = os.path.join(self.tmpdir, 'batch.npz')
+        owReportBatch.saveBatch(npzfile, batch)
+        loaded = owReportBatch.loadBatch(npzfile)
+        self.assertEqual(loaded.runs, batch.runs)
+        np.testing.assert_array_equal(loaded.table['run'], batch.table['run'])
+        self.assertEqual(loaded.table.ttypes(), batch.table.ttypes())
+
+    def test_follow(self):
+
+        # write the report in pieces that split lines, as OpenWind does while it runs
+        write_report(self.rptpath)
+        text = open(self.rptpath).read()
+        growing = os.path.join(self.tmpdir, 'growing.txt')
+        def writer():
+            fh = open(growing, 'w')
+            for i in range(0, len(text), 37):
+                fh.write(text[i:i+37])
+                fh.flush()
+                time.sleep(0.001)
+            fh.close()
+        thread = threading.Thread(target=writer)
+        thread.start()
+        events = list(owFollow.followReport(growing, poll=0.01, timeout=0.2))
+        thread.join()
+
+        turbines = [value for kind, value in events if kind == 'turbine']
+        summaries = [value for kind, value in events if kind == 'summary']
+        self.assertEqual(len(turbines), 20)
+        self.assertEqual(turbines[5].index, 6)
+        self.assertEqual(len(summaries), 1)
+        gross_aep, array_aep, net_aep, owTable = openWindUtils.rdReportTable(self.rptpath)
+        self.assertAlmostEqual(summaries[0]['gross_aep'], gross_aep)
+        self.assertAlmostEqual(summaries[0]['net_aep'], net_aep)
+        self.assertEqual(summaries[0]['nturb'], len(owTable))
+
+    def test_follow_rewrite(self):
+
+        path = os.path.join(self.tmpdir, 'rewritten.txt')
+        open(path, 'w').write('aaaa\nbbbb\n')
+        lines = owFollow.followLines(path, poll=0.01, timeout=0.5)
+        self.assertEqual([lines.next(), lines.next()], ['aaaa', 'bbbb'])
+
+        # rewritten in place to the same size: only the time stamp changes
+        fh = open(path, 'r+')
+        fh.write('cccc\ndddd\n')
+        fh.close()
+        mtime = os.stat(path).st_mtime + 10.0
+        os.utime(path, (mtime, mtime))
+        self.assertEqual([lines.next(), lines.next(), lines.next()], [owFollow.REWIND, 'cccc', 'dddd'])
+
+        # replaced by a new file of the same size
+        open(path + '.tmp', 'w').write('eeee\nffff\n')
+        os.rename(path + '.tmp', path)
+        self.assertEqual(list(lines), [owFollow.REWIND, 'eeee', 'ffff'])
+
+    def test_follow_results(self):
+
+        self.assertEqual(owFollow.parseACtext('2\tturbines\tNetEnergy=\t10.5\n1.0\t2.0\n3.0\t4.'), None)
+        self.assertEqual(owFollow.parseACtext('2\tturbines\tNetEnergy=\t10.5\n1.0\t2.0\n3.0\t4.0\n'), \
+                         (10.5, [1.0, 3.0], [2.0, 4.0]))
+        self.assertEqual(owFollow.parseACtext('2\tturbines\tNetEnergy=\t10.5\n1.0\t2.0\n3.0\t4.0', unterminated=True), \
+                         (10.5, [1.0, 3.0], [2.0, 4.0]))
+
+class TestowSimulator(unittest.TestCase):
+
+    def setUp(self):
+
+        self.tmpdir = tempfile.mkdtemp()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmpdir) # getworkbookvals writes its script and report to the current directory
+        open('layout.blb', 'w').write('0.0 0.0 GE1.5\n630.0 0.0 GE1.5\n1260.0 0.0 GE1.5\n')
+
+    def tearDown(self):
+
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tmpdir)
+
+    def write_script(self, nIter):
+
+        scripttree, ops = rwScriptXML.newScriptTree('report.txt')
+        rwScriptXML.makeChWkbkOp(ops, 'layout.blb')
+        rwScriptXML.makeOptimiseOp(ops, nIter=nIter)
+        rwScriptXML.makeExitOp(ops)
+        rwScriptXML.wrtScript(scripttree, 'script.xml')
+
+    def test_energy_capture(self):
+
+        owExe = owSimulator.makeFakeInstall('ow', external=False)
+        xy, ttypes = getworkbookvals.getTurbPos('layout.blb', owExe)
+        self.assertEqual(xy, [[0.0, 0.0], [630.0, 0.0], [1260.0, 0.0]])
+        self.assertEqual(ttypes, ['GE1.5'] * 3)
+        gross_aep, array_aep, net_aep = getworkbookvals.getEC('layout.blb', owExe)
+        self.assertTrue(0.0 < net_aep < gross_aep)
+        self.assertAlmostEqual(array_aep / net_aep, 1.0, 4) # Array Efficiency has 2 decimals
+
+    def test_external_optimiser(self):
+
+        owExe = owSimulator.makeFakeInstall('ow', external=True)
+        self.write_script(2)
+        proc = subprocess.Popen([owExe, 'script.xml'])
+        results = owFollow.followACresults('results.txt', poll=0.01, timeout=10.0, stop=lambda: proc.poll() is not None)
+
+        # first run: the workbook layout, then the layouts we send
+        iteration, netEnergy, netNRG, grossNRG = next(results)
+        self.assertEqual(len(netNRG), 3)
+        for spacing in (300.0, 1000.0):
+            open('positions.txt', 'w').write(''.join('{:.1f}\t{:.1f}\n'.format(spacing * i, 0.0) for i in range(4)))
+            open('notifyOW.txt', 'w').close()
+            iteration, newEnergy, netNRG, grossNRG = next(results)
+            self.assertEqual(len(netNRG), 4)
+            self.assertAlmostEqual(newEnergy, sum(netNRG), 0)
+        self.assertTrue(newEnergy > 4.0 / 3.0 * netEnergy) # fewer wake losses at 1000 m
+        self.assertEqual(proc.wait(), 0)
+
+    def test_wake_direction(self):
+
+        # wind directions are where the wind comes from: a north wind wakes the southern turbine
+        north_south = [[0.0, 500.0], [0.0, 0.0]]
+        west_east = [[0.0, 0.0], [500.0, 0.0]]
+        cases = [(0.0, north_south, 1), (180.0, north_south, 0), (90.0, west_east, 0), (270.0, west_east, 1)]
+        dirs, freqs = owSimulator.rose_dirs, owSimulator.rose_freqs
+        try:
+            owSimulator.rose_freqs = np.array([1.0])
+            for wdir, xy, iwaked in cases:
+                owSimulator.rose_dirs = np.array([wdir])
+                aeff = owSimulator.energyCapture(xy, owSimulator.SimTurbine())['aeff']
+                self.assertAlmostEqual(aeff[1-iwaked], 100.0)
+                self.assertTrue(aeff[iwaked] < 90.0, 'wind from {:.0f} deg: {:}'.format(wdir, aeff))
+        finally:
+            owSimulator.rose_dirs, owSimulator.rose_freqs = dirs, freqs
+
+    def test_crash(self):
+
+        owExe = owSimulator.makeFakeInstall('ow', external=True, crash=1.0)
+        self.write_script(2)
+        self.assertEqual(subprocess.call([owExe, 'script.xml']), 3)
+
+class TestLayoutCache(unittest.TestCase):
+
+    def setUp(self):
+
+        self.tmpdir = tempfile.mkdtemp()
+        self.xy = owSimulator.defaultLayout(6)
+
+    def tearDown(self):
+
+        shutil.rmtree(self.tmpdir)
+
+    def test_key(self):
+
+        cache = owLayoutCache.LayoutCache(resolution=0.1)
+        key = cache.key(self.xy, 'script')
+        self.assertEqual(cache.key(self.xy + 0.04, 'script'), key)
+        self.assertNotEqual(cache.key(self.xy + 0.06, 'script'), key)
+        self.assertNotEqual(cache.key(self.xy, 'other script'), key)
+        self.assertNotEqual(cache.key(self.xy[:5], 'script'), key)
+
+    def test_lru(self):
+
+        cache = owLayoutCache.LayoutCache(maxsize=2)
+        keys = [cache.key(self.xy + i) for i in range(3)]
+        for i, key in enumerate(keys):
+            cache.put(key, 10.0 * i, [5.0 * i, 5.0 * i], [6.0 * i, 6.0 * i])
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get(keys[0]), None)
+        self.assertEqual(cache.get(keys[2]), (20.0, [10.0, 10.0], [12.0, 12.0]))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_database(self):
+
+        dbname = os.path.join(self.tmpdir, 'layouts.db')
+        cache = owLayoutCache.LayoutCache(maxsize=1, dbname=dbname)
+        keys = [cache.key(self.xy + i) for i in range(2)]
+        for i, key in enumerate(keys):
+            cache.put(key, 10.0 * i, [5.0 * i], [6.0 * i])
+        self.assertEqual(cache.get(keys[0]), (0.0, [0.0], [0.0])) # dropped from memory, not from the database
+        cache.close()
+
+        cache = owLayoutCache.LayoutCache(dbname=dbname)
+        self.assertEqual(cache.get(keys[1]), (10.0, [5.0], [6.0]))
+        self.assertEqual(cache.dbhits, 1)
+        self.assertTrue(keys[0] in cache)
+        cache.close()
+
+    def test_script_tag(self):
+
+        # copies of a script and workbook in other directories have the same tag
+        tags = []
+        for dname in ('a', 'b'):
+            os.mkdir(os.path.join(self.tmpdir, dname))
+            wkbk = os.path.join(self.tmpdir, dname, 'layout.blb')
+            open(wkbk, 'w').write('0.0 0.0\n')
+            scripttree, ops = rwScriptXML.newScriptTree(os.path.join(self.tmpdir, dname, 'report.txt'))
+            rwScriptXML.makeChWkbkOp(ops, wkbk)
+            rwScriptXML.makeOptimiseOp(ops, nIter=5)
+            scriptFile = os.path.join(self.tmpdir, dname, 'script.xml')
+            rwScriptXML.wrtScript(scripttree, scriptFile)
+            tags.append(owLayoutCache.scriptTag(scriptFile))
+        self.assertEqual(tags[0], tags[1])
+        open(wkbk, 'w').write('100.0 0.0\n')
+        self.assertNotEqual(owLayoutCache.scriptTag(scriptFile), tags[0])
+
+class TestJensenWakeModel(unittest.TestCase):
+
+    def setUp(self):
+
+        owtg = os.path.join(os.path.dirname(turbfuncs.__file__), 'templates', 'NREL5MW.owtg')
+        self.wtpc = turbfuncs.owtg_to_wtpc(owtg)
+        self.north = [[0.0, 1.0, 9.0, 2.0]] # all wind from the north
+        self.rose = np.column_stack((np.arange(0.0, 360.0, 30.0), np.ones(12), 9.0 * np.ones(12), 2.0 * np.ones(12)))
+
+    def test_overlap(self):
+
+        f = owWakeModel.overlap_fraction(1.0, 2.0, np.array([0.0, 1.0, 3.0, 5.0]))
+        np.testing.assert_allclose(f, [1.0, 1.0, 0.0, 0.0])
+        # equal circles, centres one radius apart
+        f = owWakeModel.overlap_fraction(1.0, 1.0, 1.0)
+        self.assertAlmostEqual(f, (2.0 * np.pi / 3.0 - np.sqrt(3.0) / 2.0) / np.pi)
+
+    def test_single_row(self):
+
+        model = owWakeModel.JensenWakeModel(self.wtpc, self.north)
+        D = model.D
+        netEnergy, netNRG, grossNRG = model.evaluate([[0.0, 0.0]])
+        self.assertAlmostEqual(netNRG[0], grossNRG[0])
+
+        # a north-south row: each turbine is waked by those north of it, an east-west row is not waked
+        netEnergy, netNRG, grossNRG = model.evaluate([[0.0, 0.0], [0.0, -5.0 * D], [0.0, -10.0 * D]])
+        self.assertAlmostEqual(netNRG[0], grossNRG[0])
+        self.assertTrue(netNRG[2] < netNRG[1] < netNRG[0])
+        netEnergy, netNRG, grossNRG = model.evaluate([[0.0, 0.0], [5.0 * D, 0.0], [10.0 * D, 0.0]])
+        np.testing.assert_allclose(netNRG, grossNRG)
+
+    def test_batch(self):
+
+        model = owWakeModel.JensenWakeModel(self.wtpc, self.rose)
+        i = np.arange(12)
+        grid = np.column_stack((i % 4, i // 4)).astype(float) * model.D
+        layouts = [spacing * grid for spacing in (3.0, 5.0, 8.0)]
+        netEnergy, netNRG, grossNRG = model.evaluate_batch(layouts)
+        for layout, net in zip(layouts, netEnergy):
+            self.assertAlmostEqual(model.evaluate(layout)[0], net)
+        # a budget too small for one layout evaluates them one at a time
+        np.testing.assert_allclose(model.evaluate_batch(layouts, max_bytes=1)[1], netNRG)
+        self.assertTrue(netEnergy[0] < netEnergy[1] < netEnergy[2] < np.sum(grossNRG[0]))
+
+class TestLayoutConstraints(unittest.TestCase):
+
+    def setUp(self):
+
+        self.site = [[0.0, 0.0], [3000.0, 0.0], [3000.0, 2000.0], [0.0, 2000.0]]
+        self.lake = [[1000.0, 500.0], [1600.0, 500.0], [1600.0, 1200.0], [1000.0, 1200.0], [1000.0, 500.0]]
+        self.lc = owConstraints.LayoutConstraints(min_spacing=400.0, boundary=self.site, exclusions=[self.lake])
+        self.xy = np.random.RandomState(0).uniform([-200.0, -200.0], [3200.0, 2200.0], size=(25, 2))
+
+    def test_polygons(self):
+
+        # L-shaped (concave) polygon
+        ell = [[0.0, 0.0], [2.0, 0.0], [2.0, 1.0], [1.0, 1.0], [1.0, 2.0], [0.0, 2.0]]
+        pts = [[0.5, 0.5], [1.5, 0.5], [1.5, 1.5], [0.5, 1.5], [-0.5, 0.5], [2.5, 0.5]]
+        np.testing.assert_array_equal(owConstraints.inside_polygon(pts, ell), [True, True, False, True, False, False])
+        foot, dist = owConstraints.nearest_on_polygon([[1.5, 1.5], [3.0, 0.5]], ell)
+        np.testing.assert_allclose(foot, [[1.5, 1.0], [2.0, 0.5]])
+        np.testing.assert_allclose(dist, [0.5, 1.0])
+
+    def test_spacing(self):
+
+        pairs = self.lc.close_pairs(self.xy)
+        d = np.sqrt(np.sum((self.xy[:,np.newaxis] - self.xy[np.newaxis])**2, axis=2))
+        i, j = np.nonzero(np.triu(d < 400.0, 1))
+        np.testing.assert_array_equal(pairs, np.column_stack((i, j)))
+        dist, index = self.lc.nearest(self.xy)
+        np.testing.assert_allclose(dist, np.min(d + np.diag([np.inf] * len(d)), axis=1))
+
+    def test_repair(self):
+
+        msgs = self.lc.violations(self.xy)
+        self.assertTrue(len(msgs) > 0)
+        self.assertRaises(owConstraints.LayoutConstraintError, self.lc.check, self.xy)
+
+        xy = self.xy.copy()
+        xy[4] = xy[3] # coincident turbines
+        repaired = self.lc.repair(xy)
+        self.assertEqual(self.lc.violations(repaired), [])
+        np.testing.assert_array_equal(xy[4], xy[3]) # the input is not changed
+        self.assertTrue(np.all(self.lc.nearest(repaired)[0] >= 400.0))
+
+        # too many turbines for the site
+        crowded = owConstraints.LayoutConstraints(min_spacing=1500.0, boundary=self.site)
+        self.assertRaises(owConstraints.LayoutConstraintError, crowded.repair, self.xy, max_iter=20)
+
+class TestGALayoutOptimizer(unittest.TestCase):
+
+    def setUp(self):
+
+        owtg = os.path.join(os.path.dirname(turbfuncs.__file__), 'templates', 'NREL5MW.owtg')
+        rose = np.column_stack((np.arange(0.0, 360.0, 90.0), [0.1, 0.2, 0.3, 0.4], 9.0 * np.ones(4), 2.0 * np.ones(4)))
+        self.model = owWakeModel.JensenWakeModel(turbfuncs.owtg_to_wtpc(owtg), rose)
+        D = self.model.D
+        # 2 x 3 grid 3 D apart on a site 12 D square
+        i = np.arange(6)
+        self.xy = 3.0 * D * np.column_stack((i % 3, i // 3)).astype(float) + 2.0 * D
+        site = [[0.0, 0.0], [12.0 * D, 0.0], [12.0 * D, 12.0 * D], [0.0, 12.0 * D]]
+        self.lc = owConstraints.LayoutConstraints(min_spacing=3.0 * D, boundary=site)
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+
+        shutil.rmtree(self.tmpdir)
+
+    def ga(self, **kwargs):
+
+        return owLayoutOptimizer.GALayoutOptimizer(self.model, self.xy, population=8, constraints=self.lc,
+                                                   seed=3, **kwargs)
+
+    def test_improves(self):
+
+        start = self.model.evaluate(self.xy)[0]
+        ga = self.ga(generations=8)
+        best_xy, best_net = ga.run()
+        self.assertTrue(best_net > start)
+        self.assertAlmostEqual(self.model.evaluate(best_xy)[0] / best_net, 1.0)
+        self.assertEqual(self.lc.violations(best_xy), [])
+        best = [h[1] for h in ga.history]
+        self.assertEqual(best, sorted(best)) # elitism: the best layout is never lost
+
+    def test_resume(self):
+
+        ref_xy, ref_net = self.ga(generations=6).run()
+
+        ckpt = os.path.join(self.tmpdir, 'ga.npz')
+        self.ga(generations=3, checkpoint=ckpt).run()
+        ga = self.ga(generations=6, checkpoint=ckpt)
+        best_xy, best_net = ga.run()
+        self.assertEqual(len(ga.history), 6)
+        self.assertEqual(best_net, ref_net)
+        np.testing.assert_array_equal(best_xy, ref_xy)
+
+    def test_initialize_bounded(self):
+
+        class StartOnly(object):
+            # accepts the starting layout and nothing else
+            def __init__(self):
+                self.calls = 0
+            def repair(self, xy):
+                self.calls += 1
+                if self.calls > 1:
+                    raise owConstraints.LayoutConstraintError(['rejected'])
+                return xy
+
+        constraints = StartOnly()
+        ga = owLayoutOptimizer.GALayoutOptimizer(self.model, self.xy, population=8, constraints=constraints)
+        self.assertRaises(ValueError, ga.initialize)
+        self.assertEqual(constraints.calls, 1 + 10 * 8)
+
+    def test_cache(self):
+
+        cache = owLayoutCache.LayoutCache()
+        ga = self.ga(generations=4, cache=cache, cacheTag='jensen')
+        ga.run()
+        self.assertEqual(cache.misses, ga.nevals)
+        # the same run again is answered from the cache
+        ga = self.ga(generations=4, cache=cache, cacheTag='jensen')
+        ga.run()
+        self.assertEqual(ga.nevals, 0)
+        # but not for another evaluator
+        ga = self.ga(generations=1, cache=cache, cacheTag='other')
+        ga.run()
+        self.assertTrue(ga.nevals > 0)
+        # the wake model has no tag of its own
+        self.assertRaises(ValueError, self.ga, cache=cache)
+
+def write_ow_case(dname, nturb=3, nIter=1000, turbine=False):
+    # text workbook of nturb turbines 630 m apart and an external optimiser script for the simulator, in dname
+    #   (all paths absolute, as OWcomp needs) - returns the path of the script
+
+    if not os.path.isdir(dname):
+        os.makedirs(dname)
+    wkbk = os.path.join(dname, 'layout.blb')
+    open(wkbk, 'w').write(''.join('{0:.1f} 0.0\n'.format(630.0 * i) for i in range(nturb)))
+    scripttree, ops = rwScriptXML.newScriptTree(os.path.join(dname, 'report.txt'))
+    rwScriptXML.makeChWkbkOp(ops, wkbk)
+    if turbine:
+        tpath = os.path.join(dname, 'turbine.owtg')
+        shutil.copy(os.path.join(os.path.dirname(turbfuncs.__file__), 'templates', 'NREL5MW.owtg'), tpath)
+        rwScriptXML.makeRepTurbOp(ops, 'NREL 5 MW', tpath)
+    rwScriptXML.makeOptimiseOp(ops, nIter=nIter)
+    rwScriptXML.makeExitOp(ops)
+    scriptFile = os.path.join(dname, 'script.xml')
+    rwScriptXML.wrtScript(scripttree, scriptFile)
+    return scriptFile
+
+def sim_energy(xy):
+    # net energy the simulator computes for layout xy
+
+    return np.sum(owSimulator.energyCapture(np.asarray(xy, dtype=float), owSimulator.SimTurbine())['net'])
+
+def row_layouts(n, nturb=3):
+    # n rows of nturb turbines, 300 m to 1000 m apart
+
+    return [np.column_stack((spacing * np.arange(nturb), np.zeros(nturb))) for spacing in np.linspace(300.0, 1000.0, n)]
+
+class TestowWorkerPool(unittest.TestCase):
+
+    def setUp(self):
+
+        self.tmpdir = tempfile.mkdtemp()
+        self.owExe = owSimulator.makeFakeInstall(os.path.join(self.tmpdir, 'ow'), external=True, delay=0.05)
+        self.scriptFile = write_ow_case(os.path.join(self.tmpdir, 'case'), turbine=True)
+
+    def tearDown(self):
+
+        shutil.rmtree(self.tmpdir)
+
+    def test_sandbox(self):
+
+        # relative paths are taken relative to the current directory
+        cwd = os.getcwd()
+        os.chdir(os.path.join(self.tmpdir, 'case'))
+        try:
+            scripttree, ops = rwScriptXML.newScriptTree('report.txt')
+            rwScriptXML.makeChWkbkOp(ops, 'layout.blb')
+            rwScriptXML.makeRepTurbOp(ops, 'NREL 5 MW', 'turbine.owtg')
+            rwScriptXML.makeOptimiseOp(ops, nIter=10)
+            rwScriptXML.wrtScript(scripttree, 'relative.xml')
+            sandbox = os.path.join(self.tmpdir, 'sandbox')
+            scriptFile = owWorkerPool.makeSandbox('relative.xml', sandbox)
+        finally:
+            os.chdir(cwd)
+
+        self.assertEqual(scriptFile, os.path.join(sandbox, 'relative.xml'))
+        dscript = rwScriptXML.rdScript(scriptFile)
+        self.assertEqual(dscript['workbook'], os.path.join(sandbox, 'layout.blb'))
+        self.assertEqual(dscript['replturbpath'], os.path.join(sandbox, 'turbine.owtg'))
+        self.assertEqual(dscript['rptpath'], os.path.join(sandbox, 'report.txt'))
+        self.assertEqual(open(dscript['workbook']).read(), open(os.path.join(self.tmpdir, 'case', 'layout.blb')).read())
+        self.assertTrue(os.path.isfile(dscript['replturbpath']))
+
+        # a script without a workbook can't be sandboxed
+        scripttree, ops = rwScriptXML.newScriptTree('report.txt')
+        rwScriptXML.makeOptimiseOp(ops, nIter=10)
+        rwScriptXML.wrtScript(scripttree, os.path.join(self.tmpdir, 'nowkbk.xml'))
+        self.assertTrue(owWorkerPool.makeSandbox(os.path.join(self.tmpdir, 'nowkbk.xml'), sandbox) is None)
+
+    def test_map(self):
+
+        layouts = row_layouts(6)
+        with owWorkerPool.OWWorkerPool(self.owExe, self.scriptFile, nworkers=2, poll=0.05) as pool:
+            futures = [pool.submit(xy) for xy in layouts]
+            results = [future.result() for future in futures]
+            self.assertEqual([future.done() for future in futures], [True] * 6)
+            mapped = pool.map(layouts[::-1])
+            nevals = [worker.nevals for worker in pool.workers]
+
+        # the results are in the order of submission, whichever worker evaluated them
+        for xy, (netEnergy, netNRG, grossNRG) in zip(layouts, results):
+            self.assertAlmostEqual(netEnergy / sim_energy(xy), 1.0, 6)
+            self.assertEqual(len(netNRG), 3)
+        self.assertEqual([r[0] for r in mapped], [r[0] for r in results[::-1]])
+        self.assertEqual(sum(nevals), 12)
+        self.assertTrue(min(nevals) > 0)
+
+    def test_close(self):
+
+        pool = owWorkerPool.OWWorkerPool(self.owExe, self.scriptFile, nworkers=2, poll=0.05)
+        sandboxes = [worker.sandbox for worker in pool.workers]
+        self.assertEqual(len(set(sandboxes)), 2)
+        pool.map(row_layouts(2))
+        procs = [worker.proc for worker in pool.workers if worker.proc is not None]
+        self.assertTrue(len(procs) > 0)
+        pool.close()
+
+        self.assertFalse(os.path.exists(pool.workdir))
+        self.assertEqual([proc.poll() is None for proc in procs], [False] * len(procs))
+
+        # a workdir that is given is kept
+        workdir = os.path.join(self.tmpdir, 'work')
+        with owWorkerPool.OWWorkerPool(self.owExe, self.scriptFile, nworkers=1, workdir=workdir) as pool:
+            pass
+        self.assertTrue(os.path.isdir(os.path.join(workdir, 'worker00')))
+
+    def test_ga(self):
+
+        # one worker, so that the OWSIM_CRASH setting can't leak into another worker's OpenWind
+        with owWorkerPool.OWWorkerPool(self.owExe, self.scriptFile, nworkers=1, poll=0.05,
+                                       max_retries=0, backoff=0.01) as pool:
+            worker = pool.workers[0]
+            worker.launch = failing_launches(worker.launch, 1, 'crash')
+            # a cache of the pool's evaluations is keyed on its script
+            cached = owLayoutOptimizer.GALayoutOptimizer(pool, row_layouts(1)[0], cache=owLayoutCache.LayoutCache())
+            self.assertEqual(cached.cacheTag, owLayoutCache.scriptTag(self.scriptFile))
+            ga = owLayoutOptimizer.GALayoutOptimizer(pool, row_layouts(1)[0], population=4, generations=2, seed=1)
+            ga.initialize()
+            ga.step()
+            self.assertEqual(ga.nfailed, 1)
+            self.assertEqual(ga.fitness[0], -np.inf) # the first evaluation failed
+            self.assertTrue(np.all(np.isfinite(ga.fitness[1:])))
+            best_xy, best_net = ga.run()
+
+        self.assertEqual(len(ga.history), 2)
+        self.assertEqual(ga.nevals, 4 + 2) # the elite aren't evaluated again
+        self.assertAlmostEqual(best_net / sim_energy(best_xy), 1.0, 5) # positions.txt is rounded to 0.1 m
+
+def results_lines(netNRG, grossNRG):
+    # lines of an OpenWind results.txt file
+
+    lines = ['{0:d}\tturbines\tNetEnergy=\t{1:.6f}\tcurrentNet\tcurrentGross\tbestNet\n'.format(len(netNRG), sum(netNRG))]
+    return lines + ['{0:.6f}\t{1:.6f}\t{0:.6f}\n'.format(net, gross) for net, gross in zip(netNRG, grossNRG)]
+
+class FullInotify(object):
+    # an observer that can't watch any more directories
+
+    def schedule(self, *args, **kwargs):
+        raise OSError(28, 'inotify watch limit reached')
+
+    def stop(self):
+        pass
+
+    def join(self):
+        pass
+
+class TestResultsWatcher(unittest.TestCase):
+
+    def setUp(self):
+
+        self.tmpdir = tempfile.mkdtemp()
+        self.resname = os.path.join(self.tmpdir, 'results.txt')
+        self.lines = results_lines([900.0, 800.0, 700.0], [1000.0, 1000.0, 1000.0])
+        self.watcher = owAcademicUtils.ResultsWatcher(poll=0.05)
+
+    def tearDown(self):
+
+        self.watcher.stop()
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, lines):
+
+        fh = open(self.resname, 'w')
+        fh.writelines(lines)
+        fh.close()
+
+    def test_written_before_wait(self):
+
+        self.write(self.lines)
+        waiter = self.watcher.expect(self.resname, None)
+        self.assertTrue(waiter.done())
+        self.assertEqual(waiter.wait(0.0), (2400.0, [900.0, 800.0, 700.0], [1000.0, 1000.0, 1000.0]))
+
+        # an unchanged stamp is not a new result
+        waiter = self.watcher.expect(self.resname, owAcademicUtils.resultsStamp(self.resname))
+        self.assertTrue(waiter.wait(0.1) is None)
+
+    def test_missed_event(self):
+
+        waiter = self.watcher.expect(self.resname, None)
+        self.watcher.observer.unschedule_all() # no more events from the directory
+        finished = threading.Event()
+        waiter.add_done_callback(lambda w: finished.set())
+        self.write(self.lines)
+
+        # the sweeper finds the results without anybody waiting
+        self.assertTrue(finished.wait(5.0))
+        self.assertEqual(waiter.result[0], 2400.0)
+
+    def test_polling(self):
+
+        # a directory that inotify can't watch is polled
+        self.watcher.observer = FullInotify()
+        waiter = self.watcher.expect(self.resname, None)
+        self.assertTrue(self.watcher.watched[self.tmpdir][0] is self.watcher.pollingObserver)
+        self.write(self.lines)
+        self.assertEqual(waiter.wait(5.0)[0], 2400.0)
+
+        watcher = owAcademicUtils.ResultsWatcher(polling=True, poll=0.05)
+        try:
+            waiter = watcher.expect(self.resname, owAcademicUtils.resultsStamp(self.resname))
+            self.assertTrue(watcher.observer is None)
+            self.write(results_lines([500.0], [600.0]))
+            self.assertEqual(waiter.wait(5.0), (500.0, [500.0], [600.0]))
+        finally:
+            watcher.stop()
+
+    def test_split_write(self):
+
+        waiter = self.watcher.expect(self.resname, None)
+        self.write(self.lines[:2])
+        self.assertTrue(waiter.wait(0.2) is None)
+        self.assertFalse(waiter.done())
+
+        # complete but for the last newline: accepted once the file stops changing
+        self.write(self.lines[:3] + [self.lines[3].rstrip()])
+        self.assertEqual(waiter.wait(5.0)[0], 2400.0)
+
+    def test_simulator_partial(self):
+
+        owExe = owSimulator.makeFakeInstall(os.path.join(self.tmpdir, 'ow'), external=True, partial=0.3)
+        scriptFile = write_ow_case(os.path.join(self.tmpdir, 'case'), nturb=4, nIter=0)
+        resname = os.path.join(self.tmpdir, 'case', 'results.txt')
+        waiter = self.watcher.expect(resname, None)
+        proc = subprocess.Popen([owExe, scriptFile])
+        try:
+            netEnergy, netNRG, grossNRG = waiter.wait(10.0)
+        finally:
+            proc.wait()
+        self.assertEqual(len(netNRG), 4)
+        self.assertAlmostEqual(netEnergy / sim_energy(row_layouts(1, 4)[0] * 630.0 / 300.0), 1.0, 6)
+
+    def test_timeout(self):
+
+        waiter = self.watcher.expect(self.resname, None)
+        t0 = time.time()
+        self.assertTrue(waiter.wait(0.2) is None)
+        self.assertTrue(0.2 <= time.time() - t0 < 2.0)
+        waiter.cancel()
+
+        t0 = time.time()
+        try:
+            self.assertTrue(owAcademicUtils.waitForNotify(watchFile=self.resname, timeout=0.2) is None)
+        finally:
+            owAcademicUtils.sharedWatcher().stop() # before its directory is removed
+        self.assertTrue(time.time() - t0 < 2.0)
+
+class TestOWcompAsync(unittest.TestCase):
+
+    def setUp(self):
+
+        self.tmpdir = tempfile.mkdtemp()
+        self.owExe = owSimulator.makeFakeInstall(os.path.join(self.tmpdir, 'ow'), external=True, delay=0.3)
+        self.watcher = owAcademicUtils.ResultsWatcher(poll=0.05)
+        self.comps = []
+
+    def tearDown(self):
+
+        for ow in self.comps:
+            ow.terminateOW()
+        self.watcher.stop()
+        owAcademicUtils.sharedWatcher().stop() # start_once waits on the shared watcher
+        shutil.rmtree(self.tmpdir)
+
+    def owcomp(self, name, **kwargs):
+
+        ow = OWcomp(self.owExe, scriptFile=write_ow_case(os.path.join(self.tmpdir, name)), **kwargs)
+        self.comps.append(ow)
+        return ow
+
+    def test_as_completed(self):
+
+        layouts = row_layouts(2, nturb=4)
+        comps = [self.owcomp('case{0}'.format(i)) for i in range(2)]
+        for ow, xy in zip(comps, layouts):
+            ow.wt_layout.wt_positions = xy
+
+        runs = dict((ow.execute_async(watcher=self.watcher), ow) for ow in comps)
+        finished = []
+        for run in owAcademicUtils.as_completed(runs, timeout=30.0):
+            runs[run].finish_execute(run)
+            finished.append(run)
+        self.assertEqual(len(finished), 2)
+
+        for ow, xy in zip(comps, layouts):
+            self.assertEqual(ow.nTurbs, 4)
+            self.assertAlmostEqual(ow.net_aep / sim_energy(xy), 1.0, 6)
+        # both OpenWinds had finished their first runs before either evaluation was done
+        self.assertTrue(max(run.t_ready for run in finished) < min(run.t_done for run in finished))
+
+    def test_start_once(self):
+
+        ow = self.owcomp('case', start_once=True)
+        proc = ow.proc
+        # layouts of 4 turbines, unlike the workbook, so its results can't be mistaken for theirs
+        for xy in row_layouts(2, nturb=4):
+            ow.wt_layout.wt_positions = xy
+            run = ow.execute_async(watcher=self.watcher)
+            ow.finish_execute(run, timeout=30.0)
+            self.assertEqual(ow.nTurbs, 4)
+            self.assertAlmostEqual(ow.net_aep / sim_energy(xy), 1.0, 6)
+        self.assertTrue(ow.proc is proc)
+        self.assertTrue(proc.poll() is None) # still running
+
+    def test_write_error(self):
+
+        # positions without a Y coordinate can't be written - the run fails instead of waiting forever
+        stderr, sys.stderr = sys.stderr, StringIO()
+        try:
+            run = owAcademicUtils.ExtOptRun([[1.0]], self.tmpdir, watcher=self.watcher)
+        finally:
+            sys.stderr = stderr
+        self.assertTrue(run.done())
+        self.assertEqual(run.failure, 'error')
+        self.assertTrue(isinstance(run.error, IndexError))
+        self.assertTrue(run.result(timeout=1.0) is None)
+        finished = []
+        run.add_done_callback(finished.append)
+        self.assertEqual(finished, [run])
+
+def failing_launches(launch, nfail, failure):
+    ''' wrap launch() so that the first nfail OpenWinds it starts run with OWSIM_<failure>=1 '''
+
+    launches = []
+    def wrapped():
+        var = 'OWSIM_' + failure.upper()
+        if len(launches) < nfail:
+            os.environ[var] = '1'
+        try:
+            proc = launch()
+        finally:
+            os.environ.pop(var, None)
+        launches.append(proc)
+        return proc
+    wrapped.launches = launches
+    return wrapped
+
+class TestOWRetry(unittest.TestCase):
+
+    def setUp(self):
+
+        self.tmpdir = tempfile.mkdtemp()
+        self.owExe = owSimulator.makeFakeInstall(os.path.join(self.tmpdir, 'ow'), external=True, delay=0.1)
+        self.scriptFile = write_ow_case(os.path.join(self.tmpdir, 'case'))
+        self.xy = row_layouts(1)[0]
+        self.stopped = []
+
+    def tearDown(self):
+
+        for stop in self.stopped:
+            stop()
+        owAcademicUtils.sharedWatcher().stop()
+        shutil.rmtree(self.tmpdir)
+
+    def component(self, cls, nfail, failure):
+
+        comp = cls(self.owExe, scriptFile=self.scriptFile, timeout=2.0, max_retries=1, backoff=0.01)
+        comp.wt_layout.wt_positions = self.xy
+        comp.launchOW = failing_launches(comp.launchOW, nfail, failure)
+        self.stopped.append(comp.terminateOW)
+        return comp
+
+    def check_retried(self, cls):
+
+        comp = self.component(cls, 1, 'hang')
+        comp.execute()
+        self.assertEqual(len(comp.launchOW.launches), 2)
+        self.assertNotEqual(comp.launchOW.launches[0].poll(), None) # the hung OpenWind was stopped
+        self.assertAlmostEqual(comp.net_aep / sim_energy(self.xy), 1.0, 6)
+
+    def check_all_fail(self, cls):
+
+        comp = self.component(cls, 2, 'crash')
+        with self.assertRaises(owAcademicUtils.OWRunError) as cm:
+            comp.execute()
+        err = cm.exception
+        self.assertEqual(len(comp.launchOW.launches), 2)
+        self.assertEqual(len(err.attempts), 2)
+        self.assertEqual(err.reason, 'exited')
+        for reason, elapsed, returncode in err.attempts:
+            self.assertEqual(reason, 'exited')
+            self.assertEqual(returncode, 3)
+            self.assertTrue(elapsed > 0)
+        self.assertTrue(err.elapsed >= sum(a[1] for a in err.attempts) + comp.backoff)
+        self.assertEqual(err.resname, comp.resname)
+
+    def check_retried_positions(self, cls):
+
+        # the retry evaluates the positions of the run, even if the layout has changed since it started
+        comp = self.component(cls, 1, 'hang')
+        run = comp.execute_async()
+        comp.wt_layout.wt_positions = row_layouts(2)[1]
+        comp.finish_execute(run)
+        self.assertEqual(len(comp.launchOW.launches), 2)
+        self.assertAlmostEqual(comp.net_aep / sim_energy(self.xy), 1.0, 6)
+
+    def test_owcomp_retry(self):
+        self.check_retried(OWcomp)
+
+    def test_owcomp_retry_positions(self):
+        self.check_retried_positions(OWcomp)
+
+    def test_owaccomp_retry_positions(self):
+        self.check_retried_positions(OWACcomp)
+
+    def test_owcomp_all_fail(self):
+        self.check_all_fail(OWcomp)
+
+    def test_owaccomp_retry(self):
+        self.check_retried(OWACcomp)
+
+    def test_owaccomp_all_fail(self):
+        self.check_all_fail(OWACcomp)
+
+    def worker(self, nfail, failure):
+
+        worker = owWorkerPool.OWWorker(self.owExe, self.scriptFile, os.path.join(self.tmpdir, 'sandbox'),
+                                       timeout=2.0, max_retries=1, backoff=0.01)
+        worker.launch = failing_launches(worker.launch, nfail, failure)
+        self.stopped.append(worker.stop)
+        return worker
+
+    def test_worker_retry(self):
+
+        worker = self.worker(1, 'hang')
+        netEnergy, netNRG, grossNRG = worker.evaluate(self.xy)
+        self.assertEqual(worker.nstarts, 2)
+        self.assertEqual(worker.nevals, 1)
+        self.assertAlmostEqual(np.sum(netNRG) / sim_energy(self.xy), 1.0, 6)
+
+    def test_worker_all_fail(self):
+
+        worker = self.worker(2, 'crash')
+        with self.assertRaises(owAcademicUtils.OWRunError) as cm:
+            worker.evaluate(self.xy)
+        self.assertEqual([a[0] for a in cm.exception.attempts], ['exited', 'exited'])
+        self.assertEqual([a[2] for a in cm.exception.attempts], [3, 3])
+        self.assertTrue(cm.exception.elapsed >= worker.backoff)
+        self.assertEqual(worker.nevals, 0)
+        self.assertFalse(worker.alive())
+
+class TestOWcompCache(unittest.TestCase):
+
+    def setUp(self):
+
+        self.tmpdir = tempfile.mkdtemp()
+        self.owExe = owSimulator.makeFakeInstall(os.path.join(self.tmpdir, 'ow'), external=True, delay=0.1)
+        self.scriptFile = write_ow_case(os.path.join(self.tmpdir, 'case'))
+        self.cache = owLayoutCache.LayoutCache()
+        self.xy = row_layouts(1, nturb=4)[0]
+
+    def tearDown(self):
+
+        owAcademicUtils.sharedWatcher().stop()
+        shutil.rmtree(self.tmpdir)
+
+    def owcomp(self):
+
+        ow = OWcomp(self.owExe, scriptFile=self.scriptFile, cache=self.cache)
+        ow.wt_layout.wt_positions = self.xy
+        ow.launchOW = failing_launches(ow.launchOW, 0, 'hang') # counts the launches
+        return ow
+
+    def test_hit_skips_launch(self):
+
+        ow = self.owcomp()
+        ow.execute()
+        self.assertEqual(len(ow.launchOW.launches), 1)
+        self.assertEqual(len(self.cache), 1)
+        net_aep, netNRG = ow.net_aep, list(ow.netNRGturb)
+        self.assertAlmostEqual(net_aep / sim_energy(self.xy), 1.0, 6)
+
+        ow.net_aep = 0.0
+        run = ow.execute_async()
+        self.assertTrue(isinstance(run, owAcademicUtils.CachedRun))
+        self.assertEqual(list(owAcademicUtils.as_completed([run], timeout=1.0)), [run])
+        ow.finish_execute(run)
+        ow.execute()
+        self.assertEqual(len(ow.launchOW.launches), 1) # no more OpenWind runs
+        self.assertAlmostEqual(ow.net_aep, net_aep, 3)
+        self.assertEqual(ow.netNRGturb, netNRG)
+        self.assertEqual(self.cache.hits, 2)
+
+    def test_set_results_from_cache(self):
+
+        ow = self.owcomp()
+        self.cache.put(ow.cache_key(self.xy), 1234.0, [300.0, 300.0, 300.0, 334.0], [400.0] * 4)
+        ow.execute()
+        self.assertEqual(len(ow.launchOW.launches), 0)
+        self.assertEqual(ow.nTurbs, 4)
+        self.assertEqual(ow.net_aep, 1234.0)
+        self.assertEqual(ow.gross_aep, 1600.0)
+
+    def test_pool_cache(self):
+
+        layouts = row_layouts(3)
+        with owWorkerPool.OWWorkerPool(self.owExe, self.scriptFile, nworkers=2, cache=self.cache) as pool:
+            first = pool.map(layouts)
+            second = pool.map(layouts)
+            self.assertEqual(sum(worker.nevals for worker in pool.workers), len(layouts))
+        self.assertEqual([r[0] for r in first], [r[0] for r in second])
+        self.assertEqual(self.cache.hits, len(layouts))
+
+        # OWcomp and the pool share keys for the same script
+        ow = self.owcomp()
+        ow.wt_layout.wt_positions = layouts[0]
+        ow.execute()
+        self.assertEqual(len(ow.launchOW.launches), 0)
+        self.assertAlmostEqual(ow.net_aep, first[0][0], 3)
+
+class TestOWcompConstraints(unittest.TestCase):
+
+    def setUp(self):
+
+        self.tmpdir = tempfile.mkdtemp()
+        self.owExe = owSimulator.makeFakeInstall(os.path.join(self.tmpdir, 'ow'), external=True, delay=0.1)
+        self.casedir = os.path.join(self.tmpdir, 'case')
+        site = [[-100.0, -500.0], [3000.0, -500.0], [3000.0, 500.0], [-100.0, 500.0]]
+        self.lc = owConstraints.LayoutConstraints(min_spacing=400.0, boundary=site)
+        self.ow = OWcomp(self.owExe, scriptFile=write_ow_case(self.casedir), constraints=self.lc)
+        self.ow.launchOW = failing_launches(self.ow.launchOW, 0, 'hang') # counts the launches
+        self.xy = np.array([[0.0, 0.0], [100.0, 0.0], [1000.0, 0.0]]) # the first two are too close
+
+    def tearDown(self):
+
+        self.ow.terminateOW()
+        owAcademicUtils.sharedWatcher().stop()
+        shutil.rmtree(self.tmpdir)
+
+    def test_rejected(self):
+
+        self.ow.wt_layout.wt_positions = self.xy
+        self.assertRaises(owConstraints.LayoutConstraintError, self.ow.execute)
+        self.assertEqual(len(self.ow.launchOW.launches), 0)
+        for fname in ('positions.txt', 'notifyOW.txt'):
+            self.assertFalse(os.path.exists(os.path.join(self.casedir, fname)))
+
+    def test_terminate_debug(self):
+
+        # terminateOW() writes the pid in debug mode, also before OpenWind has been started
+        scriptFile = write_ow_case(os.path.join(self.tmpdir, 'debug'))
+        for cls in (OWcomp, OWACcomp):
+            stderr, sys.stderr = sys.stderr, StringIO()
+            try:
+                ow = cls(self.owExe, scriptFile=scriptFile, debug=True)
+                ow.terminateOW()
+            finally:
+                sys.stderr = stderr
+            self.assertTrue(ow.pid is None)
+
+    def test_repaired(self):
+
+        self.ow.repair = True
+        self.ow.wt_layout.wt_positions = self.xy
+        self.ow.execute()
+        xy = np.asarray(self.ow.wt_layout.wt_positions)
+        self.assertEqual(xy.shape, (3, 2))
+        self.assertFalse(np.allclose(xy, self.xy))
+        self.assertEqual(self.lc.violations(xy), [])
+        self.assertEqual(len(self.ow.launchOW.launches), 1)
+        self.assertAlmostEqual(self.ow.net_aep / sim_energy(xy), 1.0, 6)
+
 if __name__ == "__main__":
     unittest.main()